@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,13 +47,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'users.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.idempotency.IdempotencyMiddleware',
+    'users.db_routing.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so its render timing covers only the response rendering
+    'users.instrumentation.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'attendance_app.urls'
@@ -88,6 +95,75 @@ DATABASES = {
     }
 }
 
+# Read replicas: set DB_REPLICA_HOSTS to a comma-separated list of hosts that
+# replicate the default database, or DB_REPLICA_NAMES to database names (file
+# paths on SQLite) for replicas on the same server, e.g. a second local database
+# for development. Safe GETs on listing/report views read from them; writes and
+# anything a user reads right after writing stay on default.
+DATABASE_REPLICAS = []
+_replicas = [{'HOST': host.strip()} for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+_replicas += [{'NAME': name.strip()} for name in os.environ.get('DB_REPLICA_NAMES', '').split(',') if name.strip()]
+for index, replica in enumerate(_replicas, start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {**DATABASES['default'], **replica, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['users.db_routing.PrimaryReplicaRouter']
+
+# Seconds a user keeps reading from the primary after a successful write
+REPLICA_PIN_SECONDS = 5
+
+
+# Caches
+# CACHE_BACKEND picks the backend for every cache alias: 'locmem' (default,
+# in-process LRU with TTL), 'file' (shared by workers on one host) or 'redis'
+# (CACHE_LOCATION, e.g. redis://127.0.0.1:6379/1; needs the redis package).
+# The 'reference' alias holds subjects, class groups and faculty assignments,
+# see users/reference_cache.py.
+# locmem is per process: invalidations, rate limits, idempotency keys and
+# replica pins then only apply within one worker. Use file or redis whenever
+# more than one worker serves requests.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+
+def _cache(name, timeout=300, max_entries=5000):
+    if CACHE_BACKEND == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': name,
+            'TIMEOUT': timeout,
+        }
+    if CACHE_BACKEND == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(os.environ.get('CACHE_LOCATION', BASE_DIR / '.cache'), name),
+            'TIMEOUT': timeout,
+            'OPTIONS': {'MAX_ENTRIES': max_entries},
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': name,
+        'TIMEOUT': timeout,
+        'OPTIONS': {'MAX_ENTRIES': max_entries},
+    }
+
+
+# Responses kept for replaying retries that carry an Idempotency-Key header
+# (users/idempotency.py)
+IDEMPOTENCY_TTL_SECONDS = 3600
+# How long a key stays "in progress" (409 to retries); keep it near the worker
+# timeout so a killed request does not block retries for the full TTL
+IDEMPOTENCY_IN_PROGRESS_SECONDS = 30
+
+CACHES = {
+    'default': _cache('default'),
+    # In-process copies are only invalidated in the worker that made the change,
+    # so keep them briefly; shared backends are invalidated everywhere
+    'reference': _cache('reference', timeout=60 if CACHE_BACKEND == 'locmem' else 600),
+    'idempotency': _cache('idempotency', timeout=IDEMPOTENCY_TTL_SECONDS, max_entries=20000),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -136,8 +212,24 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    # orjson for JSON; MessagePack when msgpack is installed and the client
+    # sends Accept: application/msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'users.renderers.ORJSONRenderer',
+        *(['users.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'users.renderers.ORJSONParser',
+        *(['users.renderers.MessagePackParser'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = 1024
+
 # CORS Configuration
 # Allow all origins during development (change this in production!)
 CORS_ALLOW_ALL_ORIGINS = True
@@ -150,9 +242,11 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
+    'x-request-id',
     'x-requested-with',
 ]
 
@@ -200,3 +294,88 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+
+# Academic terms and attendance partitioning
+# Terms start on the 1st of these months. On PostgreSQL the attendance table can
+# be range-partitioned by session_date (see `manage.py attendance_partitions`);
+# old terms live on in the bitmap archive (`manage.py compact_attendance`).
+ATTENDANCE_TERM_START_MONTHS = [1, 7]
+ATTENDANCE_PARTITION_BY = 'term'  # 'term' or 'month'
+
+# Students below this attendance percentage in a subject are reported as
+# defaulters (attendance/defaulters/, refreshed by `manage.py refresh_attendance_summary`)
+ATTENDANCE_DEFAULTER_THRESHOLD = 75
+
+# Weekly grid used by `manage.py generate_timetable` (weekdays: 0 = Monday)
+TIMETABLE_WEEKDAYS = [0, 1, 2, 3, 4]
+TIMETABLE_SLOTS = [
+    ('09:00', '10:00'), ('10:00', '11:00'), ('11:15', '12:15'),
+    ('12:15', '13:15'), ('14:00', '15:00'), ('15:00', '16:00'),
+]
+TIMETABLE_LECTURES_PER_WEEK = 3
+
+# Largest batch accepted by sessions/bulk-create/
+SESSION_BULK_CREATE_MAX = 1000
+
+# Per-request timing (Server-Timing header + a JSON line on the users.metrics
+# logger) for this fraction of requests; 0 turns it off completely. Of the
+# sampled requests, REQUEST_METRICS_MEMORY_RATE also trace peak memory.
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get('REQUEST_METRICS_SAMPLE_RATE', '0'))
+REQUEST_METRICS_MEMORY_RATE = 0.05
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'users.metrics': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Addresses allowed to scrape /metrics ('*' for any). Set PROMETHEUS_MULTIPROC_DIR
+# in the environment when running several worker processes (see users/metrics.py).
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Statements taking at least this many milliseconds are logged (with an EXPLAIN
+# of the first of each kind) to SLOW_QUERY_LOG; see `manage.py slow_queries`.
+# Unset: no timing at all.
+SLOW_QUERY_THRESHOLD_MS = float(os.environ['SLOW_QUERY_THRESHOLD_MS']) if os.environ.get('SLOW_QUERY_THRESHOLD_MS') else None
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', str(BASE_DIR / 'slow_queries.log'))
+if SLOW_QUERY_THRESHOLD_MS is not None:
+    LOGGING['handlers']['slow_queries'] = {'class': 'logging.handlers.WatchedFileHandler', 'filename': SLOW_QUERY_LOG}
+    LOGGING['loggers']['users.slow_queries'] = {'handlers': ['slow_queries'], 'level': 'INFO', 'propagate': False}
+
+# Load the URLconf and fill the reference caches when a worker starts, before it
+# serves its first request (see users/boot.py and `manage.py boot_profile`)
+WARMUP_ON_BOOT = os.environ.get('WARMUP_ON_BOOT', '').lower() in ('1', 'true', 'yes')
+
+# Event projections (`manage.py project_events`) leave events younger than this
+# alone so transactions that got lower ids have committed before they are passed
+EVENT_PROJECTION_LAG_SECONDS = 5
+
+# `manage.py refresh_attendance_summary` also rechecks attendance and events
+# stamped this long before its previous run, for transactions that committed
+# below the checkpoint it took then (users/reports.py)
+ATTENDANCE_SUMMARY_LAG_SECONDS = 60
+
+# Sessions open for check-in at start_time and close this many minutes after
+# end_time (users/scheduler.py). Run the scheduler with `manage.py
+# run_session_scheduler`, or set SESSION_SCHEDULER_IN_PROCESS=1 to run it on a
+# background thread of each web worker.
+SESSION_AUTO_CLOSE_GRACE_MINUTES = 10
+SESSION_SCHEDULER_RELOAD_SECONDS = 60
+SESSION_SCHEDULER_IN_PROCESS = os.environ.get('SESSION_SCHEDULER_IN_PROCESS', '').lower() in ('1', 'true', 'yes')
+
+# Check-in admission control (users/admission.py): per-session rate with
+# bursts, in-flight limits per session and overall, and how long/how many
+# requests may wait for a slot before getting 429 (waiting holds a worker
+# thread, so it is off by default). 0 disables a limit. The counters live in
+# the default cache: set CACHE_BACKEND=redis for limits across all workers.
+CHECK_IN_RATE_PER_SECOND = 50
+CHECK_IN_BURST = 100
+CHECK_IN_SESSION_CONCURRENCY = 20
+CHECK_IN_GLOBAL_CONCURRENCY = 100
+CHECK_IN_QUEUE_SIZE = 50
+CHECK_IN_QUEUE_TIMEOUT_SECONDS = 0
@@ -14,3 +14,17 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'attendance_app.settings')
 
 application = get_wsgi_application()
+
+# Fill the reference caches before taking traffic (WARMUP_ON_BOOT) and run the
+# session scheduler on a background thread (SESSION_SCHEDULER_IN_PROCESS)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_BOOT:
+    from users.boot import warmup
+
+    warmup()
+
+if settings.SESSION_SCHEDULER_IN_PROCESS:
+    from users.scheduler import start_background
+
+    start_background()
@@ -0,0 +1,13 @@
+"""Gunicorn settings: ``gunicorn -c gunicorn.conf.py attendance_app.wsgi``"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', '4'))
+timeout = 30  # IDEMPOTENCY_IN_PROGRESS_SECONDS should stay close to this
+
+
+def child_exit(server, worker):
+    # Drop the exited worker's metric files (PROMETHEUS_MULTIPROC_DIR, users/metrics.py)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import User, Student, Faculty, Subject, ClassGroup, Session, Attendance
+from django.db import transaction
+from . import events
+from .models import AttendanceEvent, User, Student, Faculty, Subject, ClassGroup, Session, Attendance, ArchivedSessionAttendance
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -25,6 +27,53 @@ class ClassGroupAdmin(admin.ModelAdmin):
 class SessionAdmin(admin.ModelAdmin):
     list_display = ('teacher', 'subject', 'class_group', 'date', 'start_time', 'end_time', 'active')
 
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'active' in form.changed_data:
+            kind = AttendanceEvent.SESSION_STARTED if obj.active else AttendanceEvent.SESSION_STOPPED
+            events.append(kind, obj, actor=request.user)
+
 @admin.register(Attendance)
 class AttendanceAdmin(admin.ModelAdmin):
-    list_display = ('student', 'session', 'marked_at')
+    list_display = ('student', 'session', 'subject', 'session_date', 'marked_at')
+
+    # Edits here are corrections and go into the event log
+
+    @transaction.atomic
+    def save_model(self, request, obj, form, change):
+        if change and {'student', 'session'} & set(form.changed_data):
+            old = Attendance.objects.select_related('session').get(pk=obj.pk)
+            events.append(AttendanceEvent.UNMARKED, old.session, old.student_id, request.user)
+        super().save_model(request, obj, form, change)
+        if not change or {'student', 'session'} & set(form.changed_data):
+            events.append(AttendanceEvent.MARKED, obj.session, obj.student_id, request.user)
+
+    @transaction.atomic
+    def delete_model(self, request, obj):
+        events.append(AttendanceEvent.UNMARKED, obj.session, obj.student_id, request.user)
+        super().delete_model(request, obj)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        for record in queryset.select_related('session'):
+            events.append(AttendanceEvent.UNMARKED, record.session, record.student_id, request.user)
+        super().delete_queryset(request, queryset)
+
+@admin.register(ArchivedSessionAttendance)
+class ArchivedSessionAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('session', 'subject', 'class_group', 'session_date', 'present_count', 'archived_at')
+
+@admin.register(AttendanceEvent)
+class AttendanceEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'session_id', 'student_id', 'actor_id', 'occurred_at')
+    list_filter = ('kind',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,142 @@
+"""Admission control for check-ins.
+
+When a full hall scans at once, check-ins are let through at a pace the
+database can take instead of all at once:
+
+* per session, at most ``CHECK_IN_BURST`` check-ins per
+  ``CHECK_IN_BURST / CHECK_IN_RATE_PER_SECOND`` seconds, counted over a
+  sliding window (this window's counter plus a weighted share of the last)
+* at most ``CHECK_IN_SESSION_CONCURRENCY`` check-ins in flight per session
+  and ``CHECK_IN_GLOBAL_CONCURRENCY`` overall
+
+Anything over those limits is turned away with 429 and ``Retry-After``. By
+default nothing waits for a slot: a worker thread spent sleeping is one not
+serving requests. ``CHECK_IN_QUEUE_TIMEOUT_SECONDS`` lets up to
+``CHECK_IN_QUEUE_SIZE`` requests poll for a slot instead, which only pays
+off with threaded workers and short timeouts.
+
+All state is counters in the default cache changed only with add, incr and
+decr. On Redis those are atomic and shared by every worker, so the limits
+hold across the deployment; the file backend has no atomic increments, so
+limits there are approximate; with the default in-process cache each worker
+enforces the limits on its own. Counters expire, so slots held by a crashed
+worker come back after ``SLOT_TTL`` seconds.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+SLOT_TTL = 60
+POLL_SECONDS = 0.02
+GLOBAL_KEY = 'admission:check-in:inflight'
+QUEUE_KEY = 'admission:check-in:queued'
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _incr(key, ttl=SLOT_TTL):
+    cache.add(key, 0, ttl)
+    try:
+        return cache.incr(key)
+    except ValueError:  # Expired in between
+        cache.add(key, 0, ttl)
+        return cache.incr(key)
+
+
+def _decr(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass
+
+
+def _acquire(key, limit):
+    if not limit:
+        return True
+    if _incr(key) <= limit:
+        return True
+    _decr(key)
+    return False
+
+
+def take_token(key, rate, burst, now=None):
+    """0 when a request may go ahead now, else the seconds until it may"""
+    if not rate:
+        return 0
+    now = time.time() if now is None else now
+    burst = max(burst, 1)
+    window = burst / rate
+    index, offset = divmod(now, window)
+    current = f'{key}:{int(index)}'
+    count = _incr(current, math.ceil(2 * window) + 1)
+    # The previous window still counts for the part of it inside the last ``window`` seconds
+    previous = cache.get(f'{key}:{int(index) - 1}') or 0
+    if previous * (1 - offset / window) + count <= burst:
+        return 0
+    _decr(current)
+    return window - offset
+
+
+class Ticket:
+    def __init__(self, keys=(), retry_after=None):
+        self.keys = keys
+        self.retry_after = retry_after
+
+    @property
+    def rejected(self):
+        return self.retry_after is not None
+
+    def release(self):
+        for key in self.keys:
+            _decr(key)
+        self.keys = ()
+
+
+def _reject(decision, retry_after):
+    metrics.ADMISSION.labels(decision).inc()
+    return Ticket(retry_after=max(1, math.ceil(retry_after)))
+
+
+def admit(session_id):
+    """A Ticket to release when done, or a rejected one carrying ``retry_after`` seconds"""
+    session_key = f'admission:check-in:session:{str(session_id)[:32]}'
+    wait = take_token(f'{session_key}:bucket', _setting('CHECK_IN_RATE_PER_SECOND', 50),
+                      _setting('CHECK_IN_BURST', 100))
+    if wait:
+        return _reject('rejected_rate', wait)
+
+    global_limit = _setting('CHECK_IN_GLOBAL_CONCURRENCY', 100)
+    session_limit = _setting('CHECK_IN_SESSION_CONCURRENCY', 20)
+    timeout = _setting('CHECK_IN_QUEUE_TIMEOUT_SECONDS', 0)
+    started = time.monotonic()
+    deadline = started + timeout
+    queued = False
+    try:
+        while True:
+            if _acquire(GLOBAL_KEY, global_limit):
+                if _acquire(session_key, session_limit):
+                    keys = [key for key, limit in ((GLOBAL_KEY, global_limit), (session_key, session_limit)) if limit]
+                    metrics.ADMISSION.labels('admitted_after_queue' if queued else 'admitted').inc()
+                    metrics.ADMISSION_WAIT.observe(time.monotonic() - started)
+                    return Ticket(keys)
+                if global_limit:
+                    _decr(GLOBAL_KEY)
+            if not timeout:
+                return _reject('rejected_busy', 1)
+            if not queued:
+                if _incr(QUEUE_KEY) > _setting('CHECK_IN_QUEUE_SIZE', 50):
+                    _decr(QUEUE_KEY)
+                    return _reject('rejected_queue_full', 1)
+                queued = True
+            if time.monotonic() >= deadline:
+                return _reject('rejected_timeout', 1)
+            time.sleep(POLL_SECONDS)
+    finally:
+        if queued:
+            _decr(QUEUE_KEY)
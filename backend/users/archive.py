@@ -0,0 +1,280 @@
+"""Bitmap archive of final attendance for closed sessions.
+
+Each archived session keeps one row holding a compressed bitmap of the
+students who attended. Bit ``i`` is the student at ``RosterPosition`` ``i``
+of the session's class group: positions are handed out per class group in
+student id order when its sessions are first archived and appended for
+newcomers, so a bitmap is as long as the group's roster rather than the
+whole student table, and compresses well.
+Queries decode the bitmaps into NumPy arrays and answer with bitwise ops and
+popcounts instead of reading one Attendance row per student.
+
+Compaction locks the sessions it archives and reads their attendance in the
+transaction that deletes it, so a correction committed meanwhile is either
+archived with the rest or waits and then finds the session archived.
+"""
+import zlib
+from datetime import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .boot import lazy_import
+from .models import Attendance, ArchivedSessionAttendance, RosterPosition, Session, Student
+
+np = lazy_import('numpy')
+
+
+def encode(positions):
+    """Compress a collection of roster positions into a bitmap blob"""
+    positions = np.fromiter(positions, dtype=np.int64)
+    bits = np.zeros(int(positions.max()) + 1 if positions.size else 0, dtype=bool)
+    bits[positions] = True
+    return zlib.compress(np.packbits(bits, bitorder='little').tobytes())
+
+
+def decode(blob, nbytes=None):
+    """Packed uint8 array for a bitmap blob, zero-padded to ``nbytes``"""
+    packed = np.frombuffer(zlib.decompress(bytes(blob)), dtype=np.uint8)
+    if nbytes is not None and packed.size < nbytes:
+        packed = np.concatenate([packed, np.zeros(nbytes - packed.size, dtype=np.uint8)])
+    return packed
+
+
+def decode_positions(blob):
+    """Roster positions set in a bitmap blob"""
+    return np.flatnonzero(np.unpackbits(decode(blob), bitorder='little'))
+
+
+def roster_positions(class_group_ids, student_ids=None):
+    """{class_group_id: {student_id: position}}"""
+    positions = {class_group_id: {} for class_group_id in class_group_ids}
+    rows = RosterPosition.objects.filter(class_group_id__in=positions)
+    if student_ids is not None:
+        rows = rows.filter(student_id__in=student_ids)
+    for class_group_id, student_id, position in rows.values_list('class_group_id', 'student_id', 'position'):
+        positions[class_group_id][student_id] = position
+    return positions
+
+
+def assign_positions(class_group_id, student_ids):
+    """{student_id: position} for the whole class group, after giving ``student_ids`` without one the next ones"""
+    known = dict(RosterPosition.objects.filter(class_group_id=class_group_id).values_list('student_id', 'position'))
+    first = max(known.values(), default=-1) + 1
+    new = [RosterPosition(class_group_id=class_group_id, student_id=student_id, position=first + offset)
+           for offset, student_id in enumerate(sorted(set(student_ids) - known.keys()))]
+    RosterPosition.objects.bulk_create(new)
+    known.update((row.student_id, row.position) for row in new)
+    return known
+
+
+def _position_of(class_group_id, student_id):
+    return (RosterPosition.objects.filter(class_group_id=class_group_id, student_id=student_id)
+            .values_list('position', flat=True).first())
+
+
+def _stack(blobs):
+    """Decode blobs into one (sessions x bytes) packed matrix"""
+    packed = [decode(blob) for blob in blobs]
+    width = max((p.size for p in packed), default=0)
+    matrix = np.zeros((len(packed), width), dtype=np.uint8)
+    for row, p in enumerate(packed):
+        matrix[row, :p.size] = p
+    return matrix
+
+
+def _has_bit(packed, position):
+    if position is None:
+        return False
+    byte, bit = divmod(position, 8)
+    return byte < packed.size and bool(packed[byte] >> bit & 1)
+
+
+def did_attend(student_id, session_id):
+    row = (ArchivedSessionAttendance.objects
+           .filter(session_id=session_id).values_list('class_group_id', 'bitmap').first())
+    return row is not None and _has_bit(decode(row[1]), _position_of(row[0], student_id))
+
+
+def attended_sessions(student, **filters):
+    """Archived session ids the student attended, limited to their subjects"""
+    positions = dict(RosterPosition.objects.filter(student_id=student.id).values_list('class_group_id', 'position'))
+    if not positions:
+        return []
+    rows = (ArchivedSessionAttendance.objects
+            .filter(subject__in=student.subjects.all(), class_group_id__in=positions, **filters)
+            .values_list('session_id', 'class_group_id', 'bitmap'))
+    return [session_id for session_id, class_group_id, blob in rows
+            if _has_bit(decode(blob), positions[class_group_id])]
+
+
+def subject_percentages(student):
+    """{subject_id: (held, attended)} over the student's class group's archived sessions"""
+    rows = list(ArchivedSessionAttendance.objects
+                .filter(class_group_id=student.class_group_id)
+                .values_list('subject_id', 'bitmap'))
+    if not rows:
+        return {}
+    subject_ids = np.array([subject_id for subject_id, _ in rows])
+    position = _position_of(student.class_group_id, student.id)
+    byte, bit = divmod(position, 8) if position is not None else (None, 0)
+    matrix = _stack(blob for _, blob in rows)
+    if byte is not None and byte < matrix.shape[1]:
+        present = matrix[:, byte] >> bit & 1
+    else:
+        present = np.zeros(len(rows), np.uint8)
+    result = {}
+    for subject_id in np.unique(subject_ids):
+        mask = subject_ids == subject_id
+        result[int(subject_id)] = (int(mask.sum()), int(present[mask].sum()))
+    return result
+
+
+def session_headcounts(**filters):
+    """{session_id: present} recomputed from the bitmaps by popcount"""
+    rows = list(ArchivedSessionAttendance.objects.filter(**filters).values_list('session_id', 'bitmap'))
+    if not rows:
+        return {}
+    counts = np.bitwise_count(_stack(blob for _, blob in rows)).sum(axis=1)
+    return {session_id: int(count) for (session_id, _), count in zip(rows, counts)}
+
+
+def roster_arrays(class_group_ids):
+    """{class_group_id: (student ids, positions)} as int64 arrays"""
+    return {
+        class_group_id: (np.fromiter(positions.keys(), dtype=np.int64, count=len(positions)),
+                         np.fromiter(positions.values(), dtype=np.int64, count=len(positions)))
+        for class_group_id, positions in roster_positions(class_group_ids).items()
+    }
+
+
+def student_columns(bits, student_ids, positions):
+    """Columns of unpacked ``bits`` for students at ``positions``; zeros where the bitmaps are shorter"""
+    columns = np.zeros((bits.shape[0], student_ids.size), dtype=bits.dtype)
+    known = positions < bits.shape[1]
+    columns[:, known] = bits[:, positions[known]]
+    return columns
+
+
+def attended_counts_by_subject(subject_ids=None):
+    """{subject_id: counts} where ``counts[student_id]`` is how many archived sessions they attended"""
+    archives = ArchivedSessionAttendance.objects.order_by('subject_id', 'class_group_id')
+    if subject_ids is not None:
+        archives = archives.filter(subject_id__in=subject_ids)
+    blobs = {}
+    for subject_id, class_group_id, blob in archives.values_list('subject_id', 'class_group_id', 'bitmap'):
+        blobs.setdefault((subject_id, class_group_id), []).append(blob)
+    rosters = roster_arrays({class_group_id for _, class_group_id in blobs})
+
+    per_subject = {}
+    for (subject_id, class_group_id), group_blobs in blobs.items():
+        student_ids, positions = rosters[class_group_id]
+        bits = np.unpackbits(_stack(group_blobs), axis=1, bitorder='little')
+        per_subject.setdefault(subject_id, []).append(
+            (student_ids, student_columns(bits, student_ids, positions).sum(axis=0, dtype=np.int64)))
+    result = {}
+    for subject_id, parts in per_subject.items():
+        counts = np.zeros(max((int(ids.max()) + 1 for ids, _ in parts if ids.size), default=0), dtype=np.int64)
+        for student_ids, attended in parts:
+            np.add.at(counts, student_ids, attended)
+        result[subject_id] = counts
+    return result
+
+
+def class_group_matrix(class_group, subject=None):
+    """Attendance matrix for a class group's archived sessions.
+
+    Returns (session_ids, student_ids, matrix) where ``matrix[i, j]`` is True
+    when student ``student_ids[j]`` attended session ``session_ids[i]``.
+    """
+    archives = ArchivedSessionAttendance.objects.filter(class_group=class_group)
+    if subject is not None:
+        archives = archives.filter(subject=subject)
+    rows = list(archives.order_by('session_date', 'session_id').values_list('session_id', 'bitmap'))
+    student_ids = np.array(sorted(Student.objects.filter(class_group=class_group).values_list('id', flat=True)),
+                           dtype=np.int64)
+    if not rows or not student_ids.size:
+        return [r[0] for r in rows], student_ids, np.zeros((len(rows), student_ids.size), dtype=bool)
+
+    known = roster_positions([class_group.id], student_ids.tolist())[class_group.id]
+    # Members never archived in this group have no position and no bits
+    positions = np.array([known.get(int(student_id), -1) for student_id in student_ids], dtype=np.int64)
+    bits = np.unpackbits(_stack(blob for _, blob in rows), axis=1, bitorder='little')
+    matrix = np.zeros((len(rows), student_ids.size), dtype=bool)
+    has = positions >= 0
+    matrix[:, has] = student_columns(bits, student_ids[has], positions[has]).astype(bool)
+    return [r[0] for r in rows], student_ids, matrix
+
+
+def archived_attendance_for(student, **filters):
+    """Unsaved Attendance instances standing in for the student's archived rows.
+
+    The archive does not keep check-in times, so ``marked_at`` is the start of
+    the session.
+    """
+    session_ids = attended_sessions(student, **filters)
+    sessions = Session.objects.filter(id__in=session_ids)
+    records = []
+    for session in sessions:
+        marked_at = timezone.make_aware(datetime.combine(session.date, session.start_time))
+        record = Attendance(student=student, session=session, marked_at=marked_at)
+        record.copy_session_facts(session)
+        records.append(record)
+    return records
+
+
+def compact(before, batch_size=500, dry_run=False):
+    """Move final attendance of closed sessions dated before ``before`` into the archive.
+
+    Returns (sessions archived, attendance rows removed).
+    """
+    session_ids = list(Session.objects
+                       .filter(active=False, date__lt=before, archived_attendance__isnull=True)
+                       .order_by('id').values_list('id', flat=True))
+    archived = removed = 0
+    for start in range(0, len(session_ids), batch_size):
+        a, r = _compact_batch(session_ids[start:start + batch_size], dry_run)
+        archived, removed = archived + a, removed + r
+    return archived, removed
+
+
+def _compact_batch(session_ids, dry_run):
+    if dry_run:
+        return len(session_ids), Attendance.objects.filter(session_id__in=session_ids).count()
+
+    with transaction.atomic():
+        # Locked until commit, and rechecked in case one was reopened or archived meanwhile
+        batch = list(Session.objects.select_for_update()
+                     .filter(id__in=session_ids, active=False)
+                     .exclude(id__in=ArchivedSessionAttendance.objects.values('session_id'))
+                     .order_by('id')
+                     .values_list('id', 'subject_id', 'class_group_id', 'teacher_id', 'date'))
+        present = {row[0]: [] for row in batch}
+        rows = Attendance.objects.filter(session_id__in=present).values_list('session_id', 'student_id')
+        for session_id, student_id in rows:
+            present[session_id].append(student_id)
+
+        # The whole current roster gets positions, not only those present, to keep them in id order
+        rosters = {class_group_id: set() for _, _, class_group_id, _, _ in batch}
+        for session_id, _, class_group_id, _, _ in batch:
+            rosters[class_group_id].update(present[session_id])
+        for class_group_id, student_id in Student.objects.filter(
+                class_group_id__in=rosters).values_list('class_group_id', 'id'):
+            rosters[class_group_id].add(student_id)
+        positions = {class_group_id: assign_positions(class_group_id, student_ids)
+                     for class_group_id, student_ids in rosters.items()}
+
+        ArchivedSessionAttendance.objects.bulk_create([
+            ArchivedSessionAttendance(
+                session_id=session_id,
+                subject_id=subject_id,
+                class_group_id=class_group_id,
+                teacher_id=teacher_id,
+                session_date=session_date,
+                present_count=len(present[session_id]),
+                bitmap=encode(positions[class_group_id][student_id] for student_id in present[session_id]),
+            )
+            for session_id, subject_id, class_group_id, teacher_id, session_date in batch
+        ])
+        Attendance.objects.filter(session_id__in=present).delete()
+    return len(batch), sum(len(ids) for ids in present.values())
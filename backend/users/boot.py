@@ -0,0 +1,128 @@
+"""Worker start-up: deferred imports, cache warmup and boot measurements.
+
+NumPy and qrcode/PIL are only needed by a few endpoints, so the modules
+using them bind ``lazy_import(...)`` placeholders that import the real
+module on first attribute access. ``warmup`` (run from wsgi.py/asgi.py when
+``WARMUP_ON_BOOT`` is set) loads the URLconf and fills the reference caches
+before the worker takes traffic. ``import_profile`` and ``measure_boot``
+back ``manage.py boot_profile``.
+"""
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.db import connections
+
+# Deferred until first use; reported by the boot benchmark when they load anyway
+DEFERRED_MODULES = ('numpy', 'qrcode', 'PIL')
+
+_IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+# {step: seconds} of the last warmup in this process
+last_warmup = {}
+
+
+class LazyModule:
+    """Placeholder for a module, imported when one of its attributes is first used"""
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__dict__['_lazy_name'])
+        # Later lookups are plain instance attribute hits
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+    def __repr__(self):
+        return f"<lazy module {self.__dict__['_lazy_name']!r}>"
+
+
+def lazy_import(name):
+    """The module itself when it is already loaded, else a LazyModule"""
+    return sys.modules.get(name) or LazyModule(name)
+
+
+def warmup():
+    """Load the URLconf and fill the reference caches; returns {step: seconds}"""
+    from django.urls import get_resolver
+
+    from . import reference_cache
+
+    timings = {}
+    started = time.perf_counter()
+    get_resolver().url_patterns
+    timings['urls'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reference_cache.warm()
+    timings['reference_cache'] = time.perf_counter() - started
+    # A pre-forking server may run this in the parent; never hand an open connection to the children
+    connections.close_all()
+    last_warmup.update(timings)
+    return timings
+
+
+def import_profile(target='django.setup(); from django.urls import get_resolver; get_resolver().url_patterns'):
+    """[(module, self ms, cumulative ms, depth)] for a fresh interpreter running ``target``"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import django; {target}'],
+        capture_output=True, text=True, cwd=settings.BASE_DIR, env=os.environ.copy(),
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            rows.append((module, int(own) / 1000, int(cumulative) / 1000, len(indent) // 2))
+    return rows
+
+
+_CHILD = '''
+import json, resource, sys, time, io
+started = time.perf_counter()
+from attendance_app.wsgi import application
+booted = time.perf_counter()
+from users import boot
+from wsgiref.util import setup_testing_defaults
+environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO()}
+setup_testing_defaults(environ)
+statuses = []
+body = b''.join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+done = time.perf_counter()
+print(json.dumps({
+    'boot': booted - started, 'warmup': sum(boot.last_warmup.values()), 'first_request': done - booted,
+    'finished_at': time.time(), 'status': statuses[0],
+    'bytes': len(body), 'modules': len(sys.modules),
+    'deferred_loaded': [name for name in boot.DEFERRED_MODULES if name in sys.modules],
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+
+def measure_boot(workers=4, path='/api/subjects/', warm=False):
+    """Start ``workers`` fresh worker processes at once and time each to its first response"""
+    env = {**os.environ, 'WARMUP_ON_BOOT': '1' if warm else ''}
+    spawned_at = time.time()
+    processes = [
+        subprocess.Popen([sys.executable, '-c', _CHILD, path], cwd=settings.BASE_DIR, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(workers)
+    ]
+    results = []
+    for process in processes:
+        out, err = process.communicate()
+        if process.returncode:
+            raise RuntimeError(err.strip().splitlines()[-1])
+        result = json.loads(out.strip().splitlines()[-1])
+        # Includes interpreter start-up, which the worker cannot time itself
+        result['time_to_first_request'] = result.pop('finished_at') - spawned_at
+        results.append(result)
+    return results
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZip responses above ``RESPONSE_COMPRESSION_MIN_BYTES``.
+
+    Small payloads are not worth the CPU and header overhead. Streaming
+    responses have no known size, so they are always compressed chunk by
+    chunk as they are sent (Django's GZipMiddleware does the streaming part).
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming:
+            threshold = getattr(settings, 'RESPONSE_COMPRESSION_MIN_BYTES', 1024)
+            if len(response.content) < threshold:
+                return response
+        return super().process_response(request, response)
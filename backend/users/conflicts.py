@@ -0,0 +1,142 @@
+"""Overlap detection for sessions sharing a teacher or a class group.
+
+A recurring session repeats weekly from its date until the end of that term.
+Two sessions conflict when they share a teacher or a class group, fall on the
+same day and their [start_time, end_time) intervals overlap.
+
+``find_conflicts`` checks one new session with a single query on the
+(teacher|class_group, date, start_time) indexes. ``SlotIndex`` holds
+sessions in memory for checking a batch. ``term_conflicts`` expands
+every session of a term into dated occurrences and sweeps each
+(resource, day) list in start-time order, which is O(n log n) plus the
+number of conflicts found.
+"""
+import heapq
+import itertools
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+
+from .models import Session
+from .terms import term_bounds
+
+COLUMNS = ('id', 'teacher_id', 'class_group_id', 'subject_id', 'date', 'start_time', 'end_time', 'recurring')
+
+
+def occurrences(day, recurring, window_start, window_end):
+    """Dates in [window_start, window_end) on which a session starting on ``day`` takes place"""
+    if not recurring:
+        return [day] if window_start <= day < window_end else []
+    end = min(window_end, term_bounds(day)[1])
+    first = max(day, window_start)
+    first += timedelta(days=(day.weekday() - first.weekday()) % 7)
+    return [first + timedelta(days=offset) for offset in range(0, (end - first).days, 7)]
+
+
+def _same_slot(day, recurring):
+    """Sessions that can share at least one date with a session on ``day``"""
+    term_start, term_end = term_bounds(day)
+    weekday = Q(date__iso_week_day=day.isoweekday(), date__gte=term_start, date__lt=term_end)
+    if recurring:
+        # Every later session on this weekday, and recurring ones that started earlier
+        return weekday & (Q(date__gte=day) | Q(recurring=True))
+    return Q(date=day) | (weekday & Q(recurring=True, date__lte=day))
+
+
+def find_conflicts(teacher_id, class_group_id, day, start_time, end_time, recurring=False, exclude_id=None):
+    """Sessions clashing with the given slot, as (resource, session row dict) pairs"""
+    candidates = (Session.objects
+                  .filter(Q(teacher_id=teacher_id) | Q(class_group_id=class_group_id))
+                  .filter(_same_slot(day, recurring), start_time__lt=end_time, end_time__gt=start_time)
+                  .order_by('date', 'start_time'))
+    if exclude_id is not None:
+        candidates = candidates.exclude(id=exclude_id)
+    clashes = []
+    for row in candidates.values(*COLUMNS):
+        if row['teacher_id'] == teacher_id:
+            clashes.append(('teacher', row))
+        if row['class_group_id'] == class_group_id:
+            clashes.append(('class_group', row))
+    return clashes
+
+
+class SlotIndex:
+    """Dated occurrences per (resource, id, day) kept sorted by start time.
+
+    For checking many candidate sessions against the same set of sessions,
+    and against each other as they are added.
+    """
+
+    def __init__(self, window_start, window_end):
+        self.window = (window_start, window_end)
+        self._slots = defaultdict(list)
+        self._sequence = itertools.count()
+
+    def _keys(self, row):
+        for day in occurrences(row['date'], row['recurring'], *self.window):
+            yield 'teacher', (row['teacher_id'], day)
+            yield 'class_group', (row['class_group_id'], day)
+
+    def add(self, row):
+        entry = (row['start_time'], row['end_time'], next(self._sequence), row)
+        for resource, key in self._keys(row):
+            insort(self._slots[(resource, *key)], entry)
+
+    def clashes(self, row):
+        """(resource, other row) for every indexed session overlapping ``row``"""
+        found = {}
+        for resource, key in self._keys(row):
+            intervals = self._slots.get((resource, *key), ())
+            # Only intervals starting before this one ends can overlap it
+            for _, end, sequence, other in intervals[:bisect_left(intervals, (row['end_time'],))]:
+                if end > row['start_time']:
+                    found.setdefault((resource, sequence), other)
+        return [(resource, other) for (resource, _), other in found.items()]
+
+
+def term_conflicts(day=None, **filters):
+    """Every clash in the term holding ``day``.
+
+    Returns dicts with the resource, its id, the two session ids, the first
+    date they clash on and how many dates they clash on.
+    """
+    term_start, term_end = term_bounds(day)
+    sessions = (Session.objects
+                .filter(date__gte=term_start, date__lt=term_end, **filters)
+                .values_list(*COLUMNS))
+
+    # (resource, resource id, date) -> [(start, end, session id)]
+    slots = defaultdict(list)
+    for session_id, teacher_id, class_group_id, _, date, start, end, recurring in sessions:
+        for occurrence in occurrences(date, recurring, term_start, term_end):
+            slots[('teacher', teacher_id, occurrence)].append((start, end, session_id))
+            slots[('class_group', class_group_id, occurrence)].append((start, end, session_id))
+
+    clashes = {}
+    for (resource, resource_id, date), intervals in slots.items():
+        if len(intervals) < 2:
+            continue
+        intervals.sort()
+        active = []  # Heap of (end, session id) still running at the current start
+        for start, end, session_id in intervals:
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            for _, other_id in active:
+                key = (resource, resource_id, min(session_id, other_id), max(session_id, other_id))
+                if key in clashes:
+                    clashes[key]['dates'] += 1
+                    clashes[key]['first_date'] = min(clashes[key]['first_date'], date)
+                else:
+                    clashes[key] = {'resource': resource, 'resource_id': resource_id,
+                                    'sessions': list(key[2:]), 'first_date': date, 'dates': 1}
+            heapq.heappush(active, (end, session_id))
+    return sorted(clashes.values(), key=lambda c: (c['first_date'], c['resource'], c['sessions']))
+
+
+def describe(resource, row):
+    who = 'You already teach' if resource == 'teacher' else 'This class group already has'
+    repeat = ' (weekly)' if row['recurring'] else ''
+    return (f"{who} a session on {row['date']}{repeat} "
+            f"{row['start_time']:%H:%M}-{row['end_time']:%H:%M} that overlaps this slot")
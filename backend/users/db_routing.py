@@ -0,0 +1,86 @@
+"""Primary/replica database routing.
+
+Writes always go to ``default``. Safe requests handled by views that opt in
+with ``ReplicaReadMixin`` read from one of ``settings.DATABASE_REPLICAS``.
+After a user makes a successful write they are pinned to the primary for
+``settings.REPLICA_PIN_SECONDS`` so they read their own writes even while the
+replicas lag behind.
+
+The pin lives in the default cache, so it is shared across workers only when
+that cache is (file or Redis backend); with an in-process cache each worker
+pins independently.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    cache.set(_pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(_pin_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or not _read_from_replica.get():
+            return 'default'
+        # Reads inside a transaction must see that transaction's writes
+        if connections['default'].in_atomic_block:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaReadMixin:
+    """Serve safe requests from a replica unless the user was pinned to the primary"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request.user.pk):
+            self._replica_token = _read_from_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _read_from_replica.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryPinMiddleware:
+    """Pin users to the primary for a short window after a successful write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF copies the token-authenticated user back onto the Django request
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
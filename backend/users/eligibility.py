@@ -0,0 +1,186 @@
+"""Term-end attendance eligibility computed in bulk with NumPy.
+
+Students are split into partitions (by department or year). For each
+partition the enrollment, session and attendance columns are streamed from
+the database into integer arrays and turned into (students x subjects)
+matrices:
+
+* ``held``     sessions of the subject held for the student's class group
+* ``attended`` live attendance rows plus archived bitmap bits
+* ``percentage`` / ``eligible`` derived from the two
+
+Pairs whose subject has held no session for the student's class group yet
+cannot be assessed; they are counted but not written.
+
+Partitions are independent, so they can be computed in a process pool. The
+parent process writes all results to ``TermEligibility`` in one transaction.
+"""
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+import numpy as np
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import archive
+from .models import ArchivedSessionAttendance, Attendance, Session, Student, TermEligibility
+from .reports import Enrollment
+
+PARTITION_FIELDS = ('department', 'year')
+# Archived sessions are unpacked this many at a time to bound memory
+ARCHIVE_CHUNK = 256
+
+
+def _stream_pairs(queryset, columns, chunk_size):
+    """Stream a two-column values_list into an (n, 2) int64 array"""
+    rows = queryset.values_list(*columns).iterator(chunk_size=chunk_size)
+    return np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+
+
+def partitions(partition_by):
+    return list(Student.objects.order_by(partition_by).values_list(partition_by, flat=True).distinct())
+
+
+def compute_partition(partition_by, value, term_start, term_end, threshold, chunk_size=5000):
+    """Eligibility arrays for the students with ``partition_by == value``"""
+    started = time.perf_counter()
+    held_until = min(term_end, timezone.localdate() + timedelta(days=1))
+    in_partition = {f'student__{partition_by}': value}
+
+    students = list(Student.objects.filter(**{partition_by: value}).order_by('id')
+                    .values_list('id', 'class_group_id', 'department', 'year'))
+    enrollments = _stream_pairs(Enrollment.objects.filter(**in_partition), ['student_id', 'subject_id'], chunk_size)
+    student_ids = np.array([s[0] for s in students], dtype=np.int64)
+    subject_ids = np.unique(enrollments[:, 1])
+    group_of_student = np.array([-1 if s[1] is None else s[1] for s in students], dtype=np.int64)
+    group_ids = np.unique(group_of_student[group_of_student >= 0])
+
+    sessions = _stream_pairs(
+        Session.objects.filter(class_group_id__in=group_ids.tolist(), subject_id__in=subject_ids.tolist(),
+                               date__gte=term_start, date__lt=held_until),
+        ['class_group_id', 'subject_id'], chunk_size,
+    )
+    attendance = _stream_pairs(
+        Attendance.objects.filter(session_date__gte=term_start, session_date__lt=term_end,
+                                  subject_id__in=subject_ids.tolist(), **in_partition),
+        ['student_id', 'subject_id'], chunk_size,
+    )
+    archived = list(ArchivedSessionAttendance.objects.filter(
+        session_date__gte=term_start, session_date__lt=term_end,
+        class_group_id__in=group_ids.tolist(), subject_id__in=subject_ids.tolist(),
+    ).values_list('subject_id', 'class_group_id', 'bitmap').iterator(chunk_size=ARCHIVE_CHUNK))
+    rosters = archive.roster_arrays(group_ids.tolist())
+    loaded = time.perf_counter()
+
+    n_students, n_subjects = student_ids.size, subject_ids.size
+    enrolled = np.zeros((n_students, n_subjects), dtype=bool)
+    enrolled[np.searchsorted(student_ids, enrollments[:, 0]), np.searchsorted(subject_ids, enrollments[:, 1])] = True
+
+    # Held per class group; students without a group map to the trailing zero row
+    group_held = np.zeros((group_ids.size + 1, n_subjects), dtype=np.int64)
+    np.add.at(group_held, (np.searchsorted(group_ids, sessions[:, 0]), np.searchsorted(subject_ids, sessions[:, 1])), 1)
+    group_index = np.where(group_of_student >= 0, np.searchsorted(group_ids, group_of_student), group_ids.size)
+    held = group_held[group_index]
+
+    cells = np.searchsorted(student_ids, attendance[:, 0]) * n_subjects + np.searchsorted(subject_ids, attendance[:, 1])
+    attended = np.bincount(cells, minlength=n_students * n_subjects).reshape(n_students, n_subjects)
+
+    # Bitmaps are indexed by roster position: (row in student_ids, position) per class group
+    roster = {}
+    for class_group_id, (ids, positions) in rosters.items():
+        index = np.searchsorted(student_ids, ids)
+        ours = index < n_students
+        ours[ours] = student_ids[index[ours]] == ids[ours]
+        roster[class_group_id] = (index[ours], positions[ours])
+    for start in range(0, len(archived), ARCHIVE_CHUNK):
+        chunk = archived[start:start + ARCHIVE_CHUNK]
+        bits = np.unpackbits(archive._stack(blob for _, _, blob in chunk), axis=1, bitorder='little')
+        for row, (subject_id, class_group_id, _) in enumerate(chunk):
+            index, positions = roster[class_group_id]
+            known = positions < bits.shape[1]
+            attended[index[known], np.searchsorted(subject_ids, subject_id)] += bits[row, positions[known]]
+
+    attended = np.minimum(attended * enrolled, held)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentage = np.where(held > 0, np.round(attended * 100 / held, 2), 100.0)
+    eligible = percentage >= threshold
+
+    assessable = enrolled & (held > 0)
+    rows, cols = np.nonzero(assessable)
+    departments = np.array([s[2] for s in students], dtype=object)
+    years = np.array([s[3] for s in students], dtype=np.int64)
+    return {
+        'partition': value,
+        'student_id': student_ids[rows],
+        'subject_id': subject_ids[cols],
+        'class_group_id': group_of_student[rows],
+        'department': departments[rows],
+        'year': years[rows],
+        'held': held[rows, cols],
+        'attended': attended[rows, cols],
+        'percentage': percentage[rows, cols],
+        'eligible': eligible[rows, cols],
+        'unassessed': int(enrolled.sum() - assessable.sum()),
+        'load_seconds': loaded - started,
+        'compute_seconds': time.perf_counter() - loaded,
+    }
+
+
+def _init_worker():
+    django.setup()
+    connections.close_all()
+
+
+def _compute(args):
+    try:
+        return compute_partition(*args)
+    finally:
+        connections.close_all()
+
+
+def compute(term_start, term_end, threshold, partition_by='department', workers=1, chunk_size=5000):
+    """Compute every partition, in a process pool when ``workers > 1``"""
+    if partition_by not in PARTITION_FIELDS:
+        raise ValueError(f'partition_by must be one of {", ".join(PARTITION_FIELDS)}')
+    jobs = [(partition_by, value, term_start, term_end, threshold, chunk_size) for value in partitions(partition_by)]
+    if workers <= 1 or len(jobs) <= 1:
+        return [compute_partition(*job) for job in jobs]
+
+    # Children must not share the parent's database connections
+    connections.close_all()
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                             initializer=_init_worker) as pool:
+        return list(pool.map(_compute, jobs))
+
+
+def write(term_start, results, batch_size=2000):
+    """Replace the term's TermEligibility rows with ``results``; returns rows written"""
+    now = timezone.now()
+    objects = [
+        TermEligibility(
+            term_start=term_start, student_id=int(student_id), subject_id=int(subject_id),
+            class_group_id=None if class_group_id < 0 else int(class_group_id),
+            department=department, year=int(year), held=int(held), attended=int(attended),
+            percentage=float(percentage), eligible=bool(eligible), computed_at=now,
+        )
+        for result in results
+        for student_id, subject_id, class_group_id, department, year, held, attended, percentage, eligible in zip(
+            result['student_id'], result['subject_id'], result['class_group_id'], result['department'],
+            result['year'], result['held'], result['attended'], result['percentage'], result['eligible'],
+        )
+    ]
+    with transaction.atomic():
+        TermEligibility.objects.bulk_create(
+            objects, batch_size=batch_size, update_conflicts=True,
+            unique_fields=['term_start', 'student', 'subject'],
+            update_fields=['class_group', 'department', 'year', 'held', 'attended', 'percentage', 'eligible',
+                           'computed_at'],
+        )
+        # Drop pairs that are no longer enrolled
+        TermEligibility.objects.filter(term_start=term_start, computed_at__lt=now).delete()
+    return len(objects)
@@ -0,0 +1,158 @@
+"""Append-only attendance event log and the projections built from it.
+
+Every check-in, staff correction and session start/stop is appended to
+``AttendanceEvent`` (a table only ever inserted into). Projections replay the
+log in id order into derived tables. Each keeps its position in a
+``RefreshCheckpoint``, and a batch is applied in the same transaction that
+advances it, so rerunning resumes where the last run stopped and never
+applies an event twice. ``rebuild`` empties a projection and replays the log
+from the start.
+
+Ids are allocated before commit, so a slow transaction can commit an event
+below ids already visible. Runs therefore stop at events younger than
+``EVENT_PROJECTION_LAG_SECONDS`` so those have committed before they are
+passed.
+"""
+from abc import ABC, abstractmethod
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Attendance, AttendanceEvent, RefreshCheckpoint, SessionHeadcount
+
+CHECKPOINT_PREFIX = 'projection.'
+
+
+def _event(kind, session, student_id=None, actor=None, occurred_at=None):
+    return AttendanceEvent(
+        kind=kind, session_id=session.id, subject_id=session.subject_id, class_group_id=session.class_group_id,
+        session_date=session.date, student_id=student_id, actor_id=getattr(actor, 'pk', actor),
+        occurred_at=occurred_at or timezone.now(),
+    )
+
+
+def append(kind, session, student_id=None, actor=None):
+    """Record one event; ``actor`` is the User (or user id) who caused it"""
+    return _event(kind, session, student_id, actor).save()
+
+
+def append_many(kind, session, student_ids, actor=None):
+    now = timezone.now()
+    return AttendanceEvent.objects.bulk_create(
+        [_event(kind, session, student_id, actor, now) for student_id in student_ids], batch_size=1000)
+
+
+class Projection(ABC):
+    """Folds events into a derived table; subclasses set ``name`` and implement both methods"""
+    name = None
+
+    @abstractmethod
+    def reset(self):
+        """Remove everything the projection has written"""
+
+    @abstractmethod
+    def apply(self, events):
+        """Fold a batch of events (in id order) into the derived table"""
+
+    @property
+    def checkpoint(self):
+        return CHECKPOINT_PREFIX + self.name
+
+
+class SessionHeadcounts(Projection):
+    name = 'session-headcounts'
+
+    def reset(self):
+        SessionHeadcount.objects.all().delete()
+
+    def apply(self, events):
+        rows = SessionHeadcount.objects.in_bulk({event.session_id for event in events})
+        created = {}
+        for event in events:
+            row = rows.get(event.session_id) or created.get(event.session_id)
+            if row is None:
+                row = created[event.session_id] = SessionHeadcount(
+                    session_id=event.session_id, subject_id=event.subject_id,
+                    class_group_id=event.class_group_id, session_date=event.session_date)
+            if event.kind == AttendanceEvent.CHECK_IN:
+                row.present += 1
+                row.check_ins += 1
+                row.first_check_in = min(filter(None, [row.first_check_in, event.occurred_at]))
+                row.last_check_in = max(filter(None, [row.last_check_in, event.occurred_at]))
+            elif event.kind in (AttendanceEvent.MARKED, AttendanceEvent.UNMARKED):
+                row.present += 1 if event.kind == AttendanceEvent.MARKED else -1
+                row.corrections += 1
+            elif event.kind == AttendanceEvent.SESSION_STARTED:
+                row.started_at = row.started_at or event.occurred_at
+            elif event.kind == AttendanceEvent.SESSION_STOPPED:
+                row.stopped_at = event.occurred_at
+        SessionHeadcount.objects.bulk_create(created.values())
+        SessionHeadcount.objects.bulk_update(rows.values(), [
+            'present', 'check_ins', 'corrections', 'first_check_in', 'last_check_in', 'started_at', 'stopped_at'])
+
+
+PROJECTIONS = {projection.name: projection for projection in [SessionHeadcounts()]}
+
+
+def _lag():
+    return timedelta(seconds=getattr(settings, 'EVENT_PROJECTION_LAG_SECONDS', 5))
+
+
+def run(projection, batch_size=5000):
+    """Apply the events after the projection's checkpoint; returns how many were applied"""
+    applied = 0
+    while True:
+        cutoff = timezone.now() - _lag()
+        with transaction.atomic():
+            # Locking the checkpoint keeps concurrent runs of one projection in line
+            checkpoint, _ = RefreshCheckpoint.objects.select_for_update().get_or_create(name=projection.checkpoint)
+            events = list(AttendanceEvent.objects.filter(id__gt=checkpoint.position).order_by('id')[:batch_size])
+            fetched = len(events)
+            settled = next((n for n, event in enumerate(events) if event.occurred_at >= cutoff), fetched)
+            events = events[:settled]
+            if not events:
+                return applied
+            projection.apply(events)
+            checkpoint.position = events[-1].id
+            checkpoint.save(update_fields=['position', 'updated_at'])
+        applied += len(events)
+        if settled < fetched or fetched < batch_size:
+            return applied
+
+
+def rebuild(projection, batch_size=5000):
+    with transaction.atomic():
+        projection.reset()
+        RefreshCheckpoint.put(projection.checkpoint, 0)
+    return run(projection, batch_size)
+
+
+def pending(projection):
+    """Events not applied yet"""
+    return AttendanceEvent.objects.filter(id__gt=RefreshCheckpoint.get(projection.checkpoint)).count()
+
+
+def backfill(batch_size=5000):
+    """Seed an empty log with a check-in per live Attendance row; returns the number of events written.
+
+    Archived attendance (users/archive.py) has no per-student rows and is not included.
+    """
+    if AttendanceEvent.objects.exists():
+        raise ValueError('The event log is not empty')
+    written = 0
+    rows = (Attendance.objects.order_by('id')
+            .values_list('session_id', 'subject_id', 'class_group_id', 'session_date', 'student_id', 'marked_at')
+            .iterator(chunk_size=batch_size))
+    batch = []
+    for session_id, subject_id, class_group_id, session_date, student_id, marked_at in rows:
+        batch.append(AttendanceEvent(kind=AttendanceEvent.CHECK_IN, session_id=session_id, subject_id=subject_id,
+                                     class_group_id=class_group_id, session_date=session_date,
+                                     student_id=student_id, occurred_at=marked_at))
+        if len(batch) >= batch_size:
+            written += len(AttendanceEvent.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        written += len(AttendanceEvent.objects.bulk_create(batch))
+    return written
@@ -0,0 +1,121 @@
+"""Idempotency keys for unsafe requests.
+
+A client that may retry a POST/PUT/PATCH/DELETE sends an ``Idempotency-Key``
+(or ``X-Request-ID``) header. The first response for a key is stored in the
+``idempotency`` cache alias (bounded, entries expire after
+``IDEMPOTENCY_TTL_SECONDS``), and a retry with the same key gets that
+response replayed, marked with ``Idempotent-Replayed: true``, without
+reaching the view or the database.
+
+Keys are scoped to the caller's credentials and the path. Reusing a key with
+a different body is rejected with 422. A retry arriving while the first
+request is still running gets 409 with ``Retry-After``; that marker only
+lives for ``IDEMPOTENCY_IN_PROGRESS_SECONDS`` (about the worker timeout), so
+a worker killed mid-request does not block the key. Only successes and
+client errors that a retry of the same request would get again are stored;
+anything else (404 "session not active", 409, 429, 5xx) can change once
+the situation does, so those requests can be retried for real.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+HEADERS = ('HTTP_IDEMPOTENCY_KEY', 'HTTP_X_REQUEST_ID')
+METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# Response headers kept with a stored response
+REPLAYED_HEADERS = ('Content-Type', 'Location', 'Retry-After')
+# Client errors that do not depend on the state of the server
+STORED_CLIENT_ERRORS = (400, 403, 405, 413, 415, 422)
+
+_IN_PROGRESS = 'in-progress'
+
+
+def _cache():
+    return caches['idempotency']
+
+
+def ttl():
+    return getattr(settings, 'IDEMPOTENCY_TTL_SECONDS', 3600)
+
+
+def in_progress_ttl():
+    return getattr(settings, 'IDEMPOTENCY_IN_PROGRESS_SECONDS', 30)
+
+
+def request_key(request):
+    """Cache key for an unsafe request carrying an idempotency key, else None"""
+    if request.method not in METHODS:
+        return None
+    client_key = next((request.META[header] for header in HEADERS if request.META.get(header)), None)
+    if not client_key:
+        return None
+    # The credentials stand in for the user, who is only known once DRF authenticates
+    caller = (request.META.get('HTTP_AUTHORIZATION') or request.session.session_key
+              or request.META.get('REMOTE_ADDR', ''))
+    scope = '\n'.join([caller, request.method, request.path, client_key[:200]])
+    return 'idem:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def storable(response):
+    if response.streaming:
+        return False
+    return 200 <= response.status_code < 300 or response.status_code in STORED_CLIENT_ERRORS
+
+
+def _body_hash(request):
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def _replay(stored):
+    response = HttpResponse(stored['content'], status=stored['status'])
+    for header, value in stored['headers'].items():
+        response[header] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request_key(request)
+        if key is None:
+            return self.get_response(request)
+
+        cache = _cache()
+        body_hash = _body_hash(request)
+        if not cache.add(key, _IN_PROGRESS, in_progress_ttl()):
+            stored = cache.get(key)
+            if stored == _IN_PROGRESS:
+                response = JsonResponse({'error': 'A request with this idempotency key is still being processed'},
+                                        status=409)
+                response['Retry-After'] = '1'
+                return response
+            if stored is not None:
+                if stored['body_hash'] != body_hash:
+                    return JsonResponse({'error': 'Idempotency key was already used for a different request'},
+                                        status=422)
+                return _replay(stored)
+            # Expired or evicted in between: handle it as a new request
+            cache.add(key, _IN_PROGRESS, in_progress_ttl())
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            cache.delete(key)
+            raise
+        # Nothing to replay for answers that may change on a retry
+        if not storable(response):
+            cache.delete(key)
+            return response
+        stored = {
+            'body_hash': body_hash,
+            'status': response.status_code,
+            'content': response.content,
+            'headers': {header: response[header] for header in REPLAYED_HEADERS if response.has_header(header)},
+        }
+        cache.set(key, stored, ttl())
+        return response
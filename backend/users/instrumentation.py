@@ -0,0 +1,159 @@
+"""Per-request timing: SQL, serialization, rendering and peak memory.
+
+``RequestMetricsMiddleware`` measures a random ``REQUEST_METRICS_SAMPLE_RATE``
+fraction of requests and reports them in a ``Server-Timing`` header and one
+JSON log line on the ``users.metrics`` logger. With the rate at 0 the
+middleware removes itself at startup and the serializer hook is never
+installed, so unsampled workers pay nothing.
+
+* db: every query on every connection, through ``execute_wrapper``
+* serialize: outermost DRF ``to_representation`` calls; queries made while
+  serializing (lazy relations) are counted in both db and serialize
+* render: from ``process_template_response`` until the rendered response
+  comes back, so keep the middleware last in ``MIDDLEWARE``
+* mem: tracemalloc peak for ``REQUEST_METRICS_MEMORY_RATE`` of the sampled
+  requests. Tracing is process wide and slows everything down while it
+  runs, so only one request per process is traced at a time.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('users.metrics')
+
+_current = ContextVar('request_metrics', default=None)
+_memory_lock = threading.Lock()
+
+
+def sample_rate():
+    return getattr(settings, 'REQUEST_METRICS_SAMPLE_RATE', 0)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+        self.render = 0.0
+        self.render_started = None
+        self.peak_memory = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+def _timed_representation(to_representation):
+    def wrapper(self, instance):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return to_representation(self, instance)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return to_representation(self, instance)
+        finally:
+            metrics.serialize += time.perf_counter() - started
+            metrics.serializing = False
+    wrapper.__wrapped__ = to_representation
+    return wrapper
+
+
+def install_serializer_timing():
+    """Time DRF serialization; called from AppConfig.ready when sampling is on"""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not hasattr(cls.to_representation, '__wrapped__'):
+            cls.to_representation = _timed_representation(cls.to_representation)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not sample_rate():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.memory_rate = getattr(settings, 'REQUEST_METRICS_MEMORY_RATE', 0)
+
+    def __call__(self, request):
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        # Only one traced request at a time, and never if something else is tracing
+        trace_memory = (random.random() < self.memory_rate and not tracemalloc.is_tracing()
+                        and _memory_lock.acquire(blocking=False))
+        started = time.perf_counter()
+        try:
+            if trace_memory:
+                tracemalloc.start()
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(metrics))
+                response = self.get_response(request)
+            if metrics.render_started is not None:
+                metrics.render = time.perf_counter() - metrics.render_started
+        finally:
+            if trace_memory:
+                metrics.peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                _memory_lock.release()
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        response['Server-Timing'] = self.server_timing(metrics, total)
+        self.log(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_started = time.perf_counter()
+        return response
+
+    @staticmethod
+    def server_timing(metrics, total):
+        entries = [
+            f'db;dur={metrics.db * 1000:.1f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialize * 1000:.1f}',
+            f'render;dur={metrics.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if metrics.peak_memory is not None:
+            entries.append(f'mem;desc="{metrics.peak_memory // 1024} KiB peak"')
+        return ', '.join(entries)
+
+    @staticmethod
+    def log(request, response, metrics, total):
+        match = getattr(request, 'resolver_match', None)
+        user = getattr(request, 'user', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user': user.pk if user is not None and user.is_authenticated else None,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db * 1000, 2),
+            'serialize_ms': round(metrics.serialize * 1000, 2),
+            'render_ms': round(metrics.render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'peak_memory_bytes': metrics.peak_memory,
+        }, separators=(',', ':')))
@@ -0,0 +1,184 @@
+"""Data integrity checks, one query per rule (two for the subjects_hash rules).
+
+Each check returns the number of offending rows and a sample of them.
+The checks are independent and read-only, so ``run`` executes them on a
+thread pool (one database connection per thread).
+"""
+import hashlib
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Count, Exists, F, OuterRef, Q
+
+from .models import Attendance, ClassGroup, Faculty, Session, Student, Subject
+
+SUBJECTS_PER_STUDENT = 7
+
+
+def _rows(queryset, sample):
+    return queryset.count(), list(queryset[:sample])
+
+
+def students_subject_count(sample):
+    return _rows(Student.objects.annotate(subject_count=Count('subjects'))
+                 .exclude(subject_count=SUBJECTS_PER_STUDENT)
+                 .order_by('id').values('id', 'user__username', 'subject_count'), sample)
+
+
+def class_groups_subject_count(sample):
+    return _rows(ClassGroup.objects.annotate(subject_count=Count('subjects'))
+                 .exclude(subject_count=SUBJECTS_PER_STUDENT)
+                 .order_by('id').values('id', 'department', 'year', 'section', 'subject_count'), sample)
+
+
+def student_subject_year(sample):
+    return _rows(Student.subjects.through.objects.exclude(subject__year=F('student__year'))
+                 .order_by('student_id', 'subject_id')
+                 .values('student_id', 'student__user__username', 'student__year', 'subject__code', 'subject__year'),
+                 sample)
+
+
+def class_group_subject_year(sample):
+    return _rows(ClassGroup.subjects.through.objects.exclude(subject__year=F('classgroup__year'))
+                 .order_by('classgroup_id', 'subject_id')
+                 .values('classgroup_id', 'classgroup__year', 'subject__code', 'subject__year'), sample)
+
+
+def _subjects_hash(subject_ids):
+    """Model.generate_subjects_hash for these subject ids"""
+    return hashlib.sha256('-'.join(sorted(str(subject_id) for subject_id in subject_ids)).encode()).hexdigest()
+
+
+def _hash_mismatches(through, owner_column, model, sample):
+    """Owners whose stored subjects_hash differs from the hash of their current subjects
+
+    The hash has to be computed in Python (SHA-256 over the sorted ids), so
+    this streams two ordered queries, owners and links, and merges them.
+    Owners without subjects keep the blank hash save() leaves them with.
+    """
+    owners = model.objects.order_by('id').values_list('id', 'subjects_hash').iterator(chunk_size=5000)
+    links = through.objects.order_by(owner_column).values_list(owner_column, 'subject_id').iterator(chunk_size=5000)
+    linked = itertools.groupby(links, key=lambda link: link[0])
+    next_linked = next(linked, None)
+    no_subjects = ('', _subjects_hash([]))
+    count, bad = 0, []
+    for owner_id, stored in owners:
+        # Links of owners that no longer exist are skipped
+        while next_linked is not None and next_linked[0] < owner_id:
+            next_linked = next(linked, None)
+        if next_linked is not None and next_linked[0] == owner_id:
+            expected = _subjects_hash(subject_id for _, subject_id in next_linked[1])
+            matches = stored == expected
+        else:
+            expected = ''
+            matches = stored in no_subjects
+        if not matches:
+            count += 1
+            if len(bad) < sample:
+                bad.append({'id': owner_id, 'stored': stored, 'expected': expected})
+    return count, bad
+
+
+def class_group_hash(sample):
+    return _hash_mismatches(ClassGroup.subjects.through, 'classgroup_id', ClassGroup, sample)
+
+
+def student_hash(sample):
+    return _hash_mismatches(Student.subjects.through, 'student_id', Student, sample)
+
+
+def student_class_group_mismatch(sample):
+    return _rows(Student.objects.filter(class_group__isnull=False).filter(
+        ~Q(subjects_hash=F('class_group__subjects_hash')) | ~Q(department=F('class_group__department'))
+        | ~Q(year=F('class_group__year')) | ~Q(section=F('class_group__section'))
+    ).order_by('id').values('id', 'user__username', 'department', 'year', 'section', 'class_group_id'), sample)
+
+
+def students_without_class_group(sample):
+    return _rows(Student.objects.filter(class_group__isnull=True)
+                 .order_by('id').values('id', 'user__username'), sample)
+
+
+def duplicate_class_groups(sample):
+    return _rows(ClassGroup.objects.order_by().values('department', 'year', 'section', 'subjects_hash')
+                 .annotate(groups=Count('id')).filter(groups__gt=1), sample)
+
+
+def unassigned_subjects(sample):
+    teachers = Faculty.subjects.through.objects.filter(subject_id=OuterRef('id'))
+    return _rows(Subject.objects.filter(~Exists(teachers)).order_by('year', 'code')
+                 .values('id', 'code', 'name', 'year'), sample)
+
+
+def orphaned_sessions(sample):
+    in_curriculum = ClassGroup.subjects.through.objects.filter(
+        classgroup_id=OuterRef('class_group_id'), subject_id=OuterRef('subject_id'))
+    taught = Faculty.subjects.through.objects.filter(
+        faculty_id=OuterRef('teacher_id'), subject_id=OuterRef('subject_id'))
+    return _rows(Session.objects.filter(
+        ~Exists(in_curriculum) | ~Exists(taught) | ~Q(subject__year=F('class_group__year'))
+    ).order_by('id').values('id', 'date', 'teacher_id', 'subject__code', 'class_group_id'), sample)
+
+
+def duplicate_attendance(sample):
+    return _rows(Attendance.objects.order_by().values('student_id', 'session_id')
+                 .annotate(rows=Count('id')).filter(rows__gt=1), sample)
+
+
+def stale_attendance_facts(sample):
+    return _rows(Attendance.stale_facts().order_by('id').values('id', 'session_id'), sample)
+
+
+CHECKS = [
+    ('students_subject_count', f'Students without exactly {SUBJECTS_PER_STUDENT} subjects', students_subject_count),
+    ('class_groups_subject_count', f'Class groups without exactly {SUBJECTS_PER_STUDENT} subjects',
+     class_groups_subject_count),
+    ('student_subject_year', 'Student subjects from another year', student_subject_year),
+    ('class_group_subject_year', 'Class group subjects from another year', class_group_subject_year),
+    ('class_group_hash', 'Class groups whose subjects_hash does not match their subjects', class_group_hash),
+    ('student_hash', 'Students whose subjects_hash does not match their subjects', student_hash),
+    ('student_class_group_mismatch', 'Students whose class group has other subjects or placement',
+     student_class_group_mismatch),
+    ('students_without_class_group', 'Students not assigned to a class group', students_without_class_group),
+    ('duplicate_class_groups', 'Class groups sharing department, year, section and subjects',
+     duplicate_class_groups),
+    ('unassigned_subjects', 'Subjects no faculty teaches', unassigned_subjects),
+    ('orphaned_sessions', 'Sessions outside the class group curriculum, the teacher\'s subjects or the year',
+     orphaned_sessions),
+    ('duplicate_attendance', 'Students marked twice for one session', duplicate_attendance),
+    ('stale_attendance_facts', 'Attendance rows whose copied session columns disagree with the session',
+     stale_attendance_facts),
+]
+
+
+def _run_check(check, sample):
+    name, description, function = check
+    started = time.perf_counter()
+    count, rows = function(sample)
+    return {
+        'name': name,
+        'description': description,
+        'ok': count == 0,
+        'count': count,
+        'samples': rows,
+        'seconds': round(time.perf_counter() - started, 4),
+    }
+
+
+def run(names=None, sample=20, workers=4):
+    """Results of the selected checks (all by default), in CHECKS order"""
+    checks = [check for check in CHECKS if not names or check[0] in names]
+    if workers <= 1:
+        return [_run_check(check, sample) for check in checks]
+
+    def in_thread(check):
+        try:
+            return _run_check(check, sample)
+        finally:
+            # Each worker thread opens its own connection
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(in_thread, checks))
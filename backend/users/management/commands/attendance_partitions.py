@@ -0,0 +1,60 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from users import partitioning
+from users.terms import partition_bounds
+
+
+class Command(BaseCommand):
+    help = 'Manage PostgreSQL range partitions of the attendance table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='One-time conversion of the plain table into a partitioned one')
+        parser.add_argument('--keep-legacy', action='store_true',
+                            help='With --convert, keep the old table as <table>_legacy')
+        parser.add_argument('--ahead', type=int, default=2,
+                            help='Number of future partitions to create (default 2)')
+        parser.add_argument('--detach-before', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Drop partitions ending on or before this date '
+                                 '(compact_attendance must have emptied them)')
+        parser.add_argument('--keep', type=int, metavar='N',
+                            help='Keep the current and N-1 previous partitions, drop the rest')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_supported():
+            self.stdout.write(f'Partitioning needs PostgreSQL; attendance stays a single table on {connection.vendor}')
+            return
+
+        try:
+            if options['convert']:
+                created = partitioning.convert_to_partitioned(options['ahead'], options['keep_legacy'])
+                self.stdout.write(self.style.SUCCESS(f'Converted {partitioning.TABLE} to a partitioned table'))
+            elif not partitioning.is_partitioned():
+                raise CommandError(f'{partitioning.TABLE} is not partitioned yet; run with --convert first')
+            else:
+                created = partitioning.create_partitions(ahead=options['ahead'])
+        except partitioning.PartitioningError as e:
+            raise CommandError(str(e))
+
+        for name in created:
+            self.stdout.write(f'   + {name}')
+
+        before = options['detach_before']
+        if options['keep']:
+            start, _ = partition_bounds()
+            for _ in range(options['keep'] - 1):
+                start, _ = partition_bounds(date.fromordinal(start.toordinal() - 1))
+            before = start
+        if before:
+            try:
+                detached = partitioning.detach_partitions(before)
+            except partitioning.PartitioningError as e:
+                raise CommandError(str(e))
+            for name in detached:
+                self.stdout.write(f'   - {name}')
+
+        for name, start, end in partitioning.list_partitions():
+            self.stdout.write(f'   {name}: {start} .. {end}')
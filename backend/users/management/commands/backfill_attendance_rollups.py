@@ -0,0 +1,26 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from users import rollups
+from users.terms import term_bounds
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily and weekly attendance rollups for a date range'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='First day to rebuild, rounded down to its week (default: start of the current term)')
+        parser.add_argument('--until', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Last day to rebuild (default: today)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = options['since'] or term_bounds()[0]
+        start = time.perf_counter()
+        rows = rollups.backfill(since, options['until'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {rows} rollup rows since {rollups.bucket_start(since, "week")} in {time.perf_counter() - start:.2f}s'
+        ))
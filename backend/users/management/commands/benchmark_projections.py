@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users import read_serializers
+from users.models import User, Subject, Session, Attendance
+from users.serializers import UserSerializer, SubjectSerializer, SessionSerializer, AttendanceSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare per-row cost of the ModelSerializers and the values() projections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help='Rows per endpoint')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        cases = [
+            ('subjects/', Subject.objects.order_by('year', 'code')[:limit],
+             SubjectSerializer, read_serializers.subject_rows),
+            ('sessions/', Session.objects.order_by('-date', '-start_time')[:limit],
+             SessionSerializer, read_serializers.session_rows),
+            ('attendance/my-attendance/', Attendance.objects.order_by('-session_date', '-session__start_time')[:limit],
+             AttendanceSerializer, read_serializers.attendance_rows),
+            ('users/', User.objects.all()[:limit], UserSerializer, read_serializers.user_rows),
+        ]
+        for path, queryset, serializer_class, project in cases:
+            rows = queryset.count()
+            if not rows:
+                self.stdout.write(f'{path}: no rows, skipped')
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{path} ({rows} rows)'))
+            for name, run in (
+                ('serializer', lambda: serializer_class(queryset.all(), many=True).data),
+                ('projection', lambda: project(queryset.all())),
+            ):
+                best, queries = self._measure(run, options['repeat'])
+                self.stdout.write(
+                    f'   {name:<10} {best * 1000:9.1f} ms   {best / rows * 1e6:8.1f} us/row   {queries:>5} queries'
+                )
+
+    def _measure(self, run, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                run()
+                best = min(best, time.perf_counter() - start)
+        return best, len(captured)
@@ -0,0 +1,67 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import User
+from users.renderers import ORJSONRenderer, MessagePackRenderer, msgpack
+from users.views import TimetableView, AttendanceReportView, SessionListView
+
+ENDPOINTS = [
+    ('timetable/', TimetableView, 'faculty'),
+    ('attendance/report/', AttendanceReportView, 'admin'),
+    ('sessions/', SessionListView, 'faculty'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare serialization/render time and bytes on the wire for the largest list endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to call every endpoint as (default: first user of the needed role)')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        renderers = [('drf-json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        factory = APIRequestFactory()
+        for path, view_class, role in ENDPOINTS:
+            user = self._user(options['user'], role)
+            view = view_class.as_view()
+
+            # Serialization: the view builds response.data; rendering happens later
+            timings = []
+            for _ in range(options['repeat']):
+                request = factory.get(f'/api/{path}')
+                force_authenticate(request, user=user)
+                start = time.perf_counter()
+                response = view(request)
+                timings.append(time.perf_counter() - start)
+            data = response.data
+            rows = len(data) if isinstance(data, list) else 1
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{path} as {user.username}: {rows} rows, view+serialize {min(timings) * 1000:.1f} ms'
+            ))
+
+            for name, renderer in renderers:
+                render_times = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = renderer.render(data, renderer.media_type, {})
+                    render_times.append(time.perf_counter() - start)
+                compressed = gzip.compress(body, compresslevel=6)
+                self.stdout.write(
+                    f'   {name:<9} render {min(render_times) * 1000:8.2f} ms   '
+                    f'{len(body):>10,} B   gzip {len(compressed):>9,} B'
+                )
+
+    def _user(self, username, role):
+        users = User.objects.filter(username=username) if username else User.objects.filter(role=role)
+        user = users.order_by('id').first()
+        if user is None:
+            raise CommandError(f'No {"user " + username if username else role + " user"} to benchmark with')
+        return user
@@ -0,0 +1,54 @@
+from statistics import median
+
+from django.core.management.base import BaseCommand
+
+from users import boot
+
+
+class Command(BaseCommand):
+    help = 'Import-time profile of a worker and time-to-first-request of fresh workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--workers', type=int, default=4, help='Workers started at once per benchmark run')
+        parser.add_argument('--path', default='/api/subjects/', help='GET path each worker serves first')
+        parser.add_argument('--skip-imports', action='store_true', help='Only run the boot benchmark')
+        parser.add_argument('--skip-benchmark', action='store_true', help='Only print the import profile')
+
+    def handle(self, *args, **options):
+        if not options['skip_imports']:
+            self.imports(options['top'])
+        if not options['skip_benchmark']:
+            for warm in (False, True):
+                self.benchmark(options['workers'], options['path'], warm)
+
+    def imports(self, top):
+        rows = boot.import_profile()
+        loaded = {module for module, _, _, _ in rows}
+        total = sum(own for _, own, _, _ in rows)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Imports up to a loaded URLconf: {len(rows)} modules, {total:.0f} ms'))
+        # Outermost import of each package, slowest first
+        outer = sorted((row for row in rows if row[3] == 0), key=lambda row: -row[2])
+        for module, own, cumulative, _ in outer[:top]:
+            self.stdout.write(f'   {module:<45} {cumulative:8.1f} ms   (own {own:.1f} ms)')
+        for module in boot.DEFERRED_MODULES:
+            state = self.style.WARNING('imported at boot') if module in loaded else 'deferred'
+            self.stdout.write(f'   {module:<45} {state}')
+
+    def benchmark(self, workers, path, warm):
+        results = boot.measure_boot(workers, path, warm)
+        label = 'with warmup' if warm else 'without warmup'
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{workers} workers {label}, first request GET {path}'))
+        for n, result in enumerate(results, start=1):
+            deferred = ', '.join(result['deferred_loaded']) or '-'
+            self.stdout.write(
+                f'   worker {n}: ready in {result["time_to_first_request"] * 1000:7.0f} ms   '
+                f'(boot {result["boot"] * 1000:.0f} ms incl. warmup {result["warmup"] * 1000:.0f} ms, '
+                f'first request {result["first_request"] * 1000:.1f} ms, {result["status"]})   '
+                f'{result["modules"]} modules, {result["max_rss_kb"] / 1024:.0f} MiB, heavy loaded: {deferred}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'   median time to first request {median(r["time_to_first_request"] for r in results) * 1000:.0f} ms, '
+            f'median first request {median(r["first_request"] for r in results) * 1000:.1f} ms'
+        ))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Attendance
+
+
+class Command(BaseCommand):
+    help = 'Check that the denormalized session columns on Attendance match their sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Rewrite stale rows from Session')
+        parser.add_argument('--limit', type=int, default=10, help='How many stale rows to list')
+
+    def handle(self, *args, **options):
+        stale = Attendance.stale_facts()
+        count = stale.count()
+        if not count:
+            self.stdout.write(self.style.SUCCESS('All attendance rows match their sessions'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{count} attendance rows have stale session columns'))
+        columns = ['id', 'session_id', *Attendance.SESSION_FACT_FIELDS]
+        for row in stale.order_by('id').values(*columns)[:options['limit']]:
+            self.stdout.write('   ' + ', '.join(f'{key}={row[key]}' for key in columns))
+
+        if options['fix']:
+            updated = Attendance.sync_facts(stale)
+            self.stdout.write(self.style.SUCCESS(f'Rewrote {updated} rows'))
@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from users import integrity
+
+
+class Command(BaseCommand):
+    help = 'Check business rules (subject counts, years, group hashes, assignments, sessions) with one query each'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='append', dest='checks', choices=[c[0] for c in integrity.CHECKS],
+                            help='Only run this check (repeatable)')
+        parser.add_argument('--sample', type=int, default=20, help='Offending rows to include per check')
+        parser.add_argument('--workers', type=int, default=4, help='Checks run in parallel')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--fail-on-issues', action='store_true', help='Exit with an error if any check fails')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        results = integrity.run(options['checks'], options['sample'], options['workers'])
+        report = {
+            'generated_at': timezone.now(),
+            'seconds': round(time.perf_counter() - start, 4),
+            'ok': all(result['ok'] for result in results),
+            'checks': results,
+        }
+
+        for result in results:
+            mark = self.style.SUCCESS('ok  ') if result['ok'] else self.style.ERROR('FAIL')
+            self.stdout.write(f'   {mark} {result["name"]:<30} {result["count"]:>8}   {result["seconds"] * 1000:8.1f} ms')
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, cls=DjangoJSONEncoder, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        failed = [result['name'] for result in results if not result['ok']]
+        if failed and options['fail_on_issues']:
+            raise CommandError(f'{len(failed)} checks failed: {", ".join(failed)}')
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(f'{len(results) - len(failed)}/{len(results)} checks passed in {report["seconds"]:.2f}s'))
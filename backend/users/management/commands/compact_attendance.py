@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from users import archive
+from users.terms import term_bounds
+
+
+class Command(BaseCommand):
+    help = 'Compact attendance of closed sessions from finished terms into per-session bitmaps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Archive sessions dated before this day (default: start of the current term)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        before = options['before'] or term_bounds()[0]
+        sessions, rows = archive.compact(before, options['batch_size'], options['dry_run'])
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {sessions} sessions before {before} ({rows} attendance rows)'
+        ))
@@ -0,0 +1,59 @@
+import os
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from users import eligibility, reports
+from users.terms import term_bounds
+
+
+class Command(BaseCommand):
+    help = 'Compute term-end attendance eligibility for every (student, subject) pair'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Any day in the term to compute (default: the current term)')
+        parser.add_argument('--threshold', type=float, help='Minimum percentage (default: ATTENDANCE_DEFAULTER_THRESHOLD)')
+        parser.add_argument('--partition-by', choices=eligibility.PARTITION_FIELDS, default='department')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per cursor round trip')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Compute and report without writing')
+
+    def handle(self, *args, **options):
+        term_start, term_end = term_bounds(options['term'])
+        threshold = reports.default_threshold() if options['threshold'] is None else options['threshold']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Term {term_start} - {term_end}, threshold {threshold}%, '
+            f'partitioned by {options["partition_by"]}, {options["workers"]} workers'
+        ))
+
+        start = time.perf_counter()
+        results = eligibility.compute(term_start, term_end, threshold, options['partition_by'],
+                                      options['workers'], options['chunk_size'])
+        computed = time.perf_counter()
+
+        for result in results:
+            pairs = result['eligible'].size
+            self.stdout.write(
+                f'   {str(result["partition"]):<6} {pairs:>8} pairs {pairs - int(result["eligible"].sum()):>7} ineligible '
+                f'{result["unassessed"]:>7} not held yet   '
+                f'load {result["load_seconds"] * 1000:8.1f} ms   compute {result["compute_seconds"] * 1000:7.1f} ms'
+            )
+
+        total = sum(result['eligible'].size for result in results)
+        ineligible = total - sum(int(result['eligible'].sum()) for result in results)
+        unassessed = sum(result['unassessed'] for result in results)
+        if unassessed:
+            self.stdout.write(f'{unassessed} pairs skipped: no session of the subject held yet')
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Would write {total} rows ({ineligible} ineligible); computed in {computed - start:.2f}s'
+            ))
+            return
+        written = eligibility.write(term_start, results, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} rows ({ineligible} ineligible); computed in {computed - start:.2f}s, '
+            f'written in {time.perf_counter() - computed:.2f}s'
+        ))
@@ -0,0 +1,64 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible institution-scale dataset with bulk inserts'
+
+    def add_arguments(self, parser):
+        defaults = synthetic.Config()
+        parser.add_argument('--seed', type=int, default=defaults.seed)
+        parser.add_argument('--prefix', default=defaults.prefix,
+                            help='Prefix of every generated username, user id and subject code')
+        parser.add_argument('--students', type=int, default=defaults.students)
+        parser.add_argument('--faculty', type=int, default=defaults.faculty)
+        parser.add_argument('--subjects-per-year', type=int, default=defaults.subjects_per_year)
+        parser.add_argument('--group-size', type=int, default=defaults.group_size)
+        parser.add_argument('--term', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Any day in the term to fill with sessions (default: the previous term)')
+        parser.add_argument('--weeks', type=int, help='Only generate this many weeks of sessions')
+        parser.add_argument('--attendance-rate', type=float, default=defaults.attendance_rate)
+        parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+        parser.add_argument('--solve-attempts', type=int, default=defaults.solve_attempts,
+                            help='Timetable search passes (a fixed count, so the plan depends only on the seed)')
+        parser.add_argument('--replace', action='store_true', help='Delete an existing dataset with this prefix first')
+        parser.add_argument('--delete', action='store_true', help='Only delete the dataset with this prefix')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if options['delete'] or options['replace']:
+            self.stdout.write(f'Deleted {synthetic.delete(prefix)} generated users')
+            if options['delete']:
+                return
+        elif synthetic.exists(prefix):
+            raise CommandError(f'A dataset with prefix "{prefix}" exists; use --replace or another --prefix')
+        if options['subjects_per_year'] < synthetic.CORE_SUBJECTS + synthetic.ELECTIVES:
+            raise CommandError(f'--subjects-per-year must be at least {synthetic.CORE_SUBJECTS + synthetic.ELECTIVES}')
+
+        config = synthetic.Config(
+            seed=options['seed'], prefix=prefix, students=options['students'], faculty=options['faculty'],
+            subjects_per_year=options['subjects_per_year'], group_size=options['group_size'],
+            term_start=options['term'], weeks=options['weeks'], attendance_rate=options['attendance_rate'],
+            batch_size=options['batch_size'], solve_attempts=options['solve_attempts'],
+        )
+        start = time.perf_counter()
+        generator = synthetic.Generator(config, report=self._report)
+        counts = generator.run()
+        elapsed = time.perf_counter() - start
+
+        term_start, term_end = generator.term
+        if generator.unplaced:
+            self.stdout.write(self.style.WARNING(f'{generator.unplaced} weekly lectures did not fit the grid'))
+        rows = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {rows:,} rows for term {term_start} - {term_end} in {elapsed:.1f}s '
+            f'({rows / elapsed:,.0f} rows/s, seed {config.seed})'
+        ))
+
+    def _report(self, step, rows, seconds):
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(f'   {step:<13} {rows:>11,} rows   {seconds:8.2f}s   {rate:>11,.0f} rows/s')
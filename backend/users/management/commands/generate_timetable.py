@@ -0,0 +1,52 @@
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users import timetable
+from users.models import ClassGroup, Faculty, Subject
+
+
+class Command(BaseCommand):
+    help = 'Plan weekly recurring sessions for every class group and subject without teacher or group clashes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='First day the timetable applies from (default: today)')
+        parser.add_argument('--department', action='append', dest='departments',
+                            help='Only plan this department (repeatable)')
+        parser.add_argument('--budget', type=float, default=10.0, help='Search time per department, in seconds')
+        parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--accept', action='store_true', help='Create the planned sessions')
+
+    def handle(self, *args, **options):
+        start = options['start'] or timezone.localdate()
+        plan = timetable.generate(start, options['departments'], options['budget'], options['workers'],
+                                  options['seed'])
+
+        for result in plan['departments']:
+            self.stdout.write(
+                f'   {result["department"]:<4} {len(result["placed"]):>5} placed {len(result["unplaced"]):>4} unplaced   '
+                f'{result["attempts"]:>6} attempts in {result["seconds"] * 1000:8.1f} ms'
+            )
+        if plan['moved']:
+            self.stdout.write(f'   {plan["moved"]} lectures moved to resolve teacher clashes between departments')
+
+        if plan['unplaced']:
+            groups = {g.id: g.name for g in ClassGroup.objects.all()}
+            subjects = dict(Subject.objects.values_list('id', 'code'))
+            teachers = dict(Faculty.objects.values_list('id', 'user__username'))
+            self.stdout.write(self.style.WARNING('Unplaced:'))
+            for group, subject, teacher, missing in plan['unplaced']:
+                who = teachers.get(teacher) if teacher else 'no faculty teaches this subject'
+                self.stdout.write(f'   {groups.get(group)} {subjects.get(subject)} x{missing} ({who})')
+
+        summary = (f'{len(plan["placed"])} lectures planned from {start}, '
+                   f'{sum(u[3] for u in plan["unplaced"])} unplaced, solved in {plan["seconds"]:.2f}s')
+        if not options['accept']:
+            self.stdout.write(self.style.SUCCESS(f'{summary}; run with --accept to create the sessions'))
+            return
+        created = timetable.accept(plan)
+        self.stdout.write(self.style.SUCCESS(f'{summary}; created {created} recurring sessions'))
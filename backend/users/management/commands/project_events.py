@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users import events
+
+
+class Command(BaseCommand):
+    help = 'Apply new attendance events to the projections (or rebuild them from the whole log)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projection', action='append', choices=sorted(events.PROJECTIONS),
+                            help='Projection to run (repeatable; default: all)')
+        parser.add_argument('--rebuild', action='store_true', help='Empty the projections and replay the whole log')
+        parser.add_argument('--backfill', action='store_true',
+                            help='Seed an empty event log from the existing attendance rows first')
+        parser.add_argument('--follow', type=float, metavar='SECONDS',
+                            help='Keep running, polling for new events every SECONDS')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            try:
+                written = events.backfill(options['batch_size'])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f'Backfilled {written} check-in events')
+
+        projections = [events.PROJECTIONS[name] for name in options['projection'] or sorted(events.PROJECTIONS)]
+        rebuild = options['rebuild']
+        while True:
+            for projection in projections:
+                start = time.perf_counter()
+                if rebuild:
+                    applied = events.rebuild(projection, options['batch_size'])
+                else:
+                    applied = events.run(projection, options['batch_size'])
+                if applied or not options['follow']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'{projection.name}: applied {applied} events in {time.perf_counter() - start:.2f}s '
+                        f'({events.pending(projection)} pending)'
+                    ))
+            if not options['follow']:
+                return
+            rebuild = False
+            time.sleep(options['follow'])
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import reports
+
+
+class Command(BaseCommand):
+    help = 'Refresh per-subject attendance totals used by the defaulters report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every enrollment (needed after enrollment or class group changes)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        rows = reports.refresh(full=options['full'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {rows} summary rows in {time.perf_counter() - start:.2f}s'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Open sessions for check-in at their start time and close them after their end time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Carry out the actions due now and exit (for cron)')
+
+    def handle(self, *args, **options):
+        runner = scheduler.Scheduler()
+        if options['once']:
+            now = timezone.now()
+            queued = runner.load(now)
+            done = runner.run_due(now)
+            for action, session_id, changed in done:
+                self.report(action, session_id, changed)
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(done)} actions due, {queued - len(done)} queued (next at {runner.next_at()})'
+            ))
+            return
+
+        self.stdout.write(f'Scheduling sessions (grace {scheduler.grace()}); Ctrl-C to stop')
+        try:
+            runner.serve(on_fire=self.report)
+        except KeyboardInterrupt:
+            pass
+
+    def report(self, action, session_id, changed):
+        state = 'done' if changed else 'nothing to do'
+        self.stdout.write(f'{timezone.now():%Y-%m-%d %H:%M:%S}  {action:<8} session {session_id}: {state}')
@@ -0,0 +1,38 @@
+import json
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from users import conflicts
+from users.terms import term_bounds
+
+
+class Command(BaseCommand):
+    help = 'List overlapping sessions of the same teacher or class group in a term'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Any day in the term to check (default: the current term)')
+        parser.add_argument('--json', action='store_true', help='Print the conflicts as JSON')
+
+    def handle(self, *args, **options):
+        term_start, term_end = term_bounds(options['term'])
+        start = time.perf_counter()
+        clashes = conflicts.term_conflicts(options['term'])
+        elapsed = time.perf_counter() - start
+
+        if options['json']:
+            self.stdout.write(json.dumps(clashes, cls=DjangoJSONEncoder, indent=2))
+            return
+        for clash in clashes:
+            first, second = clash['sessions']
+            self.stdout.write(
+                f'   {clash["resource"]:<11} {clash["resource_id"]:>5}   sessions {first} and {second}   '
+                f'from {clash["first_date"]} ({clash["dates"]} dates)'
+            )
+        style = self.style.WARNING if clashes else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{len(clashes)} conflicts in term {term_start} - {term_end} (checked in {elapsed * 1000:.1f} ms)'
+        ))
@@ -0,0 +1,51 @@
+import json
+import os
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from users import slow_queries
+
+
+class Command(BaseCommand):
+    help = 'Most expensive statements in the slow-query log, grouped by fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=getattr(settings, 'SLOW_QUERY_LOG', None),
+                            help='Log file to read (default: SLOW_QUERY_LOG)')
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument('--sort', choices=['total', 'count', 'max', 'mean'], default='total')
+        parser.add_argument('--since', type=datetime.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Only entries logged from this day on')
+        parser.add_argument('--explain', action='store_true', help='Print the captured EXPLAIN plans')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        path = options['log']
+        if not path or not os.path.exists(path):
+            raise CommandError(f'No slow-query log at {path} (is SLOW_QUERY_THRESHOLD_MS set?)')
+        since = options['since']
+        if since is not None and timezone.is_naive(since):
+            since = timezone.make_aware(datetime.combine(since.date(), time.min) if since.time() == time.min
+                                        else since)
+        rows = slow_queries.report(slow_queries.read(path, since), options['top'], options['sort'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        for rank, row in enumerate(rows, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{rank:>3}. {row["fingerprint"]}   {row["count"]} times   total {row["total_ms"]:,.0f} ms   '
+                f'mean {row["mean_ms"]:,.1f} ms   max {row["max_ms"]:,.1f} ms'
+            ))
+            self.stdout.write(f'     {row["sql"][:300]}')
+            for label, frames in (('view', row['views']), ('serializer', row['serializers'])):
+                for frame, count in frames[:3]:
+                    if frame:
+                        self.stdout.write(f'     {label}: {frame} ({count})')
+            if options['explain'] and row['explain']:
+                for line in row['explain'].splitlines():
+                    self.stdout.write(f'       | {line}')
+        self.stdout.write(self.style.SUCCESS(f'{len(rows)} fingerprints from {path}'))
@@ -0,0 +1,110 @@
+"""Prometheus metrics for the hot paths, served at /metrics.
+
+Counters and histograms are recorded in each worker process. With several
+workers on one host, set ``PROMETHEUS_MULTIPROC_DIR`` to an empty directory
+before the workers start (and clear it on every deploy): prometheus_client
+then keeps each process's values in memory-mapped files there and a scrape
+of any worker adds them all up. Without it the values are per process. The
+server must call ``prometheus_client.multiprocess.mark_process_dead`` when a
+worker exits, or dead workers' files pile up there (gunicorn.conf.py does).
+
+There are no per-process gauges: active sessions and cache hit ratios are
+computed when scraped, so they need no ``multiprocess_mode``. A ``Gauge``
+added here must set one.
+"""
+import os
+
+from django.conf import settings
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LOGIN_SECONDS = Histogram('attendance_login_seconds', 'Login (token obtain) latency', ['outcome'])
+CHECK_IN_SECONDS = Histogram('attendance_check_in_seconds', 'mark-attendance/ latency by outcome', ['outcome'])
+QR_SECONDS = Histogram('attendance_qr_generation_seconds', 'Time to render a session QR code image',
+                       buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+CACHE_REQUESTS = Counter('attendance_reference_cache_requests', 'Reference cache lookups', ['family', 'result'])
+ADMISSION = Counter('attendance_check_in_admission', 'Check-in admission decisions (users/admission.py)',
+                    ['decision'])
+ADMISSION_WAIT = Histogram('attendance_check_in_admission_wait_seconds', 'Time admitted check-ins spent queued',
+                           buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+# mark-attendance/ error message -> outcome label
+CHECK_IN_ERRORS = {
+    'Invalid QR code': 'invalid_qr',
+    'Subject not enrolled': 'not_enrolled',
+    'Year mismatch': 'not_enrolled',
+    'Attendance already marked': 'duplicate',
+    'Session not found or not active': 'session_not_active',
+    'Too many check-ins right now, please retry shortly': 'throttled',
+}
+
+
+def check_in_outcome(response):
+    if response.status_code < 400:
+        return 'success'
+    error = (response.data or {}).get('error') if isinstance(response.data, dict) else None
+    if isinstance(error, dict):
+        error = error.get('error')
+    if isinstance(error, list) and error:
+        error = error[0]
+    return CHECK_IN_ERRORS.get(str(error), 'rejected')
+
+
+def record_check_in(response, seconds):
+    CHECK_IN_SECONDS.labels(check_in_outcome(response)).observe(seconds)
+
+
+def record_login(succeeded, seconds):
+    LOGIN_SECONDS.labels('success' if succeeded else 'failure').observe(seconds)
+
+
+def _recorded():
+    """Metric families recorded by every worker process (or just this one)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return list(MultiProcessCollector(None).collect())
+    return list(REGISTRY.collect())
+
+
+def _computed(families):
+    from .models import Session
+
+    active = GaugeMetricFamily('attendance_active_sessions', 'Sessions currently accepting check-ins')
+    active.add_metric([], Session.objects.filter(active=True).count())
+    yield active
+
+    counts = {}
+    for family in families:
+        if family.name != CACHE_REQUESTS._name:
+            continue
+        for sample in family.samples:
+            if sample.name.endswith('_total'):
+                key = sample.labels['family']
+                counts.setdefault(key, {'hits': 0, 'misses': 0})
+                counts[key][sample.labels['result']] += sample.value
+    ratio = GaugeMetricFamily('attendance_reference_cache_hit_ratio',
+                              'Reference cache hits / lookups since the workers started', labels=['family'])
+    for key, count in sorted(counts.items()):
+        total = count['hits'] + count['misses']
+        if total:
+            ratio.add_metric([key], count['hits'] / total)
+    yield ratio
+
+
+class _Snapshot:
+    def __init__(self, families):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+def exposition():
+    """(body, content type) in the Prometheus text format"""
+    families = _recorded()
+    return generate_latest(_Snapshot(families + list(_computed(families)))), CONTENT_TYPE_LATEST
+
+
+def allowed(request):
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+    return '*' in allowed_ips or request.META.get('REMOTE_ADDR') in allowed_ips
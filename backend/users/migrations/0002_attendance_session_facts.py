@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_session_facts(apps, schema_editor):
+    """Copy subject/class_group/teacher/date from each row's session"""
+    Attendance = apps.get_model('users', 'Attendance')
+    Session = apps.get_model('users', 'Session')
+    session = Session.objects.filter(pk=models.OuterRef('session_id'))
+    Attendance.objects.filter(session_date__isnull=True).update(
+        subject_id=models.Subquery(session.values('subject_id')[:1]),
+        class_group_id=models.Subquery(session.values('class_group_id')[:1]),
+        teacher_id=models.Subquery(session.values('teacher_id')[:1]),
+        session_date=models.Subquery(session.values('date')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='class_group',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='users.classgroup'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='session_date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='subject',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='users.subject'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='teacher',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='users.faculty'),
+        ),
+        migrations.RunPython(backfill_session_facts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['subject', 'session_date'], name='attendance_subject_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['class_group', 'session_date'], name='attendance_group_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['teacher', 'session_date'], name='attendance_teacher_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['session_date'], name='attendance_date_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:32
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_attendance_session_facts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSessionAttendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_date', models.DateField()),
+                ('present_count', models.PositiveIntegerField()),
+                ('bitmap', models.BinaryField()),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('class_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.classgroup')),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='archived_attendance', to='users.session')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.subject')),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.faculty')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', 'session_date'], name='archive_subject_date_idx'), models.Index(fields=['class_group', 'session_date'], name='archive_group_date_idx')],
+            },
+        ),
+    ]
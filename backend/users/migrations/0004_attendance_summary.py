@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_archivedsessionattendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SubjectAttendanceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=3)),
+                ('year', models.IntegerField()),
+                ('held', models.PositiveIntegerField()),
+                ('attended', models.PositiveIntegerField()),
+                ('percentage', models.FloatField()),
+                ('refreshed_at', models.DateTimeField()),
+                ('class_group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='users.classgroup')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['subject', 'percentage'], name='summary_subject_pct_idx'), models.Index(fields=['department', 'year', 'percentage'], name='summary_dept_year_pct_idx')],
+                'unique_together': {('student', 'subject')},
+            },
+        ),
+    ]
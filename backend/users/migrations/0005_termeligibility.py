@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_attendance_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermEligibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term_start', models.DateField()),
+                ('department', models.CharField(max_length=3)),
+                ('year', models.IntegerField()),
+                ('held', models.PositiveIntegerField()),
+                ('attended', models.PositiveIntegerField()),
+                ('percentage', models.FloatField()),
+                ('eligible', models.BooleanField()),
+                ('computed_at', models.DateTimeField()),
+                ('class_group', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='users.classgroup')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term_start', 'eligible'], name='eligibility_term_idx'), models.Index(fields=['term_start', 'department', 'year'], name='eligibility_term_dept_idx')],
+                'unique_together': {('term_start', 'student', 'subject')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_termeligibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('bucket_start', models.DateField()),
+                ('department', models.CharField(max_length=3)),
+                ('sessions', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('roster', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.classgroup')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.subject')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket_start'], name='rollup_period_idx'), models.Index(fields=['department', 'period', 'bucket_start'], name='rollup_dept_period_idx')],
+                'unique_together': {('period', 'bucket_start', 'subject', 'class_group')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_attendancerollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['teacher', 'date', 'start_time'], name='session_teacher_slot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['class_group', 'date', 'start_time'], name='session_group_slot_idx'),
+        ),
+    ]
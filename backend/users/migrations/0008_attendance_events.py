@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_session_slot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionHeadcount',
+            fields=[
+                ('session_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('subject_id', models.BigIntegerField()),
+                ('class_group_id', models.BigIntegerField()),
+                ('session_date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('check_ins', models.PositiveIntegerField(default=0)),
+                ('corrections', models.PositiveIntegerField(default=0)),
+                ('first_check_in', models.DateTimeField(null=True)),
+                ('last_check_in', models.DateTimeField(null=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('stopped_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttendanceEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Check-in'), (2, 'Marked present'), (3, 'Marked absent'), (4, 'Session started'), (5, 'Session stopped')])),
+                ('session_id', models.BigIntegerField()),
+                ('subject_id', models.BigIntegerField()),
+                ('class_group_id', models.BigIntegerField()),
+                ('session_date', models.DateField()),
+                ('student_id', models.BigIntegerField(null=True)),
+                ('actor_id', models.BigIntegerField(null=True)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['session_id'], name='event_session_idx')],
+            },
+        ),
+    ]
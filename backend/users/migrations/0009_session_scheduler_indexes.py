@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_attendance_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['date', 'start_time'], name='session_date_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(condition=models.Q(('active', True)), fields=['id'], name='session_active_idx'),
+        ),
+    ]
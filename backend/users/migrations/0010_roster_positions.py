@@ -0,0 +1,79 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:17
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def _positions(blob):
+    """Set bits of a compressed little-endian bitmap"""
+    return [byte_index * 8 + bit for byte_index, byte in enumerate(zlib.decompress(bytes(blob)))
+            for bit in range(8) if byte >> bit & 1]
+
+
+def _encode(positions):
+    packed = bytearray(max(positions) // 8 + 1 if positions else 0)
+    for position in positions:
+        packed[position // 8] |= 1 << position % 8
+    return zlib.compress(bytes(packed))
+
+
+def reindex_bitmaps(apps, schema_editor):
+    """Re-encode archived bitmaps from student ids to per-class-group roster positions"""
+    Archive = apps.get_model('users', 'ArchivedSessionAttendance')
+    RosterPosition = apps.get_model('users', 'RosterPosition')
+    Student = apps.get_model('users', 'Student')
+    attended = {}
+    for archive_id, class_group_id, blob in Archive.objects.values_list('id', 'class_group_id', 'bitmap'):
+        attended[archive_id] = (class_group_id, _positions(blob))
+    rosters = {}
+    for class_group_id, student_ids in attended.values():
+        rosters.setdefault(class_group_id, set()).update(student_ids)
+    for class_group_id, student_id in Student.objects.filter(
+            class_group_id__in=rosters).values_list('class_group_id', 'id'):
+        rosters[class_group_id].add(student_id)
+    positions = {}
+    for class_group_id, student_ids in rosters.items():
+        positions[class_group_id] = {student_id: n for n, student_id in enumerate(sorted(student_ids))}
+        RosterPosition.objects.bulk_create([
+            RosterPosition(class_group_id=class_group_id, student_id=student_id, position=n)
+            for student_id, n in positions[class_group_id].items()])
+    for archive_id, (class_group_id, student_ids) in attended.items():
+        Archive.objects.filter(id=archive_id).update(
+            bitmap=_encode([positions[class_group_id][student_id] for student_id in student_ids]))
+
+
+def student_id_bitmaps(apps, schema_editor):
+    Archive = apps.get_model('users', 'ArchivedSessionAttendance')
+    RosterPosition = apps.get_model('users', 'RosterPosition')
+    students = {}
+    for class_group_id, student_id, position in RosterPosition.objects.values_list(
+            'class_group_id', 'student_id', 'position'):
+        students[class_group_id, position] = student_id
+    for archive_id, class_group_id, blob in Archive.objects.values_list('id', 'class_group_id', 'bitmap'):
+        Archive.objects.filter(id=archive_id).update(
+            bitmap=_encode([students[class_group_id, position] for position in _positions(blob)]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_session_scheduler_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterPosition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_id', models.BigIntegerField()),
+                ('position', models.PositiveIntegerField()),
+                ('class_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.classgroup')),
+            ],
+            options={
+                'unique_together': {('class_group', 'position'), ('class_group', 'student_id')},
+            },
+        ),
+        migrations.RunPython(reindex_bitmaps, student_id_bitmaps),
+    ]
@@ -4,6 +4,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 import uuid
 import hashlib
+from .terms import term_bounds
 
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -168,10 +169,262 @@ class Session(models.Model):
     qr_code = models.CharField(max_length=255, blank=True)  # Generated QR data
     active = models.BooleanField(default=False)  # For attendance marking
 
+    class Meta:
+        # Slot lookups for conflict detection (users/conflicts.py)
+        indexes = [
+            models.Index(fields=['teacher', 'date', 'start_time'], name='session_teacher_slot_idx'),
+            models.Index(fields=['class_group', 'date', 'start_time'], name='session_group_slot_idx'),
+            # The session scheduler's day window and its sweep of open sessions (users/scheduler.py)
+            models.Index(fields=['date', 'start_time'], name='session_date_start_idx'),
+            models.Index(fields=['id'], condition=models.Q(active=True), name='session_active_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # Keep the denormalized attendance columns in step with this session.
+        # Saves that only touch qr_code/active skip this entirely.
+        update_fields = kwargs.get('update_fields')
+        fact_fields = {'subject', 'subject_id', 'class_group', 'class_group_id', 'teacher', 'teacher_id', 'date'}
+        if update_fields is None or fact_fields & set(update_fields):
+            Attendance.objects.filter(session=self).exclude(
+                subject_id=self.subject_id,
+                class_group_id=self.class_group_id,
+                teacher_id=self.teacher_id,
+                session_date=self.date,
+            ).update(
+                subject_id=self.subject_id,
+                class_group_id=self.class_group_id,
+                teacher_id=self.teacher_id,
+                session_date=self.date,
+            )
+
+class AttendanceQuerySet(models.QuerySet):
+    def in_term(self, day=None):
+        """Restrict to one term so a partitioned table only scans that partition"""
+        start, end = term_bounds(day)
+        return self.filter(session_date__gte=start, session_date__lt=end)
+
 class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     session = models.ForeignKey(Session, on_delete=models.CASCADE)
     marked_at = models.DateTimeField(default=timezone.now)
-    
+
+    # Denormalized copies of the session's facts so reports and per-subject /
+    # per-date aggregations can run on this table alone without joining Session
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, editable=False)
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.CASCADE, null=True, editable=False)
+    teacher = models.ForeignKey(Faculty, on_delete=models.CASCADE, null=True, editable=False)
+    session_date = models.DateField(null=True, editable=False)
+
+    objects = AttendanceQuerySet.as_manager()
+
+    # Attendance column -> Session column
+    SESSION_FACT_FIELDS = {
+        'subject_id': 'subject_id',
+        'class_group_id': 'class_group_id',
+        'teacher_id': 'teacher_id',
+        'session_date': 'date',
+    }
+
     class Meta:
         unique_together = [['student', 'session']]  # Prevent duplicate attendance
+        indexes = [
+            models.Index(fields=['subject', 'session_date'], name='attendance_subject_date_idx'),
+            models.Index(fields=['class_group', 'session_date'], name='attendance_group_date_idx'),
+            models.Index(fields=['teacher', 'session_date'], name='attendance_teacher_date_idx'),
+            models.Index(fields=['session_date'], name='attendance_date_idx'),
+        ]
+
+    def copy_session_facts(self, session=None):
+        """Fill the denormalized columns from the (already loaded) session"""
+        session = session or self.session
+        for field, session_field in self.SESSION_FACT_FIELDS.items():
+            setattr(self, field, getattr(session, session_field))
+
+    def save(self, *args, **kwargs):
+        if self.session_id:
+            self.copy_session_facts()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def stale_facts(cls):
+        """Rows whose denormalized columns are missing or disagree with their session"""
+        condition = models.Q()
+        for field, session_field in cls.SESSION_FACT_FIELDS.items():
+            condition |= models.Q(**{f'{field}__isnull': True})
+            condition |= ~models.Q(**{field: models.F(f'session__{session_field}')})
+        return cls.objects.filter(condition)
+
+    @classmethod
+    def sync_facts(cls, queryset=None):
+        """Rewrite the denormalized columns from Session in a single UPDATE"""
+        queryset = cls.stale_facts() if queryset is None else queryset
+        session = Session.objects.filter(pk=models.OuterRef('session_id'))
+        return cls.objects.filter(pk__in=queryset.values('pk')).update(**{
+            field: models.Subquery(session.values(session_field)[:1])
+            for field, session_field in cls.SESSION_FACT_FIELDS.items()
+        })
+
+class ArchivedSessionAttendance(models.Model):
+    """Final attendance of a closed session, compacted into one row.
+
+    ``bitmap`` is a zlib-compressed, little-endian packed bit array where bit
+    ``i`` is set when the student at ``RosterPosition`` ``i`` of the class group
+    attended. See users/archive.py.
+    """
+    session = models.OneToOneField(Session, on_delete=models.CASCADE, related_name='archived_attendance')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.CASCADE)
+    teacher = models.ForeignKey(Faculty, on_delete=models.CASCADE)
+    session_date = models.DateField()
+    present_count = models.PositiveIntegerField()
+    bitmap = models.BinaryField()
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['subject', 'session_date'], name='archive_subject_date_idx'),
+            models.Index(fields=['class_group', 'session_date'], name='archive_group_date_idx'),
+        ]
+
+class RosterPosition(models.Model):
+    """Bit position of a student in their class group's archive bitmaps.
+
+    Positions count up from 0 per class group and are never reused, so old
+    bitmaps stay readable after students leave or join.
+    """
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.CASCADE)
+    # A plain id: the position must stay taken after the student is deleted
+    student_id = models.BigIntegerField()
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = [['class_group', 'student_id'], ['class_group', 'position']]
+
+class RefreshCheckpoint(models.Model):
+    """Progress marker (last processed id, date ordinal, ...) of an incremental refresh job"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def get(cls, name):
+        return cls.objects.filter(name=name).values_list('position', flat=True).first() or 0
+
+    @classmethod
+    def put(cls, name, position):
+        cls.objects.update_or_create(name=name, defaults={'position': position})
+
+class SubjectAttendanceSummary(models.Model):
+    """Attendance totals per (student, subject), kept by refresh_attendance_summary"""
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    # Copies of the student's placement so reports can filter without joins
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.SET_NULL, null=True)
+    department = models.CharField(max_length=3)
+    year = models.IntegerField()
+    held = models.PositiveIntegerField()  # Sessions of the subject held for the student's class group
+    attended = models.PositiveIntegerField()
+    percentage = models.FloatField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [['student', 'subject']]
+        indexes = [
+            models.Index(fields=['subject', 'percentage'], name='summary_subject_pct_idx'),
+            models.Index(fields=['department', 'year', 'percentage'], name='summary_dept_year_pct_idx'),
+        ]
+
+class TermEligibility(models.Model):
+    """Term-end eligibility per (student, subject), written by compute_eligibility"""
+    term_start = models.DateField()
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.SET_NULL, null=True)
+    department = models.CharField(max_length=3)
+    year = models.IntegerField()
+    held = models.PositiveIntegerField()
+    attended = models.PositiveIntegerField()
+    percentage = models.FloatField()
+    eligible = models.BooleanField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = [['term_start', 'student', 'subject']]
+        indexes = [
+            models.Index(fields=['term_start', 'eligible'], name='eligibility_term_idx'),
+            models.Index(fields=['term_start', 'department', 'year'], name='eligibility_term_dept_idx'),
+        ]
+
+class AttendanceRollup(models.Model):
+    """Daily and weekly attendance totals per (subject, class group), kept by users/rollups.py"""
+    PERIOD_CHOICES = (
+        ('day', 'Day'),
+        ('week', 'Week'),  # Buckets start on Monday
+    )
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateField()
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    class_group = models.ForeignKey(ClassGroup, on_delete=models.CASCADE)
+    department = models.CharField(max_length=3)  # Copy of class_group.department
+    sessions = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    roster = models.PositiveIntegerField(default=0)  # Sum of eligible students over the sessions
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [['period', 'bucket_start', 'subject', 'class_group']]
+        indexes = [
+            models.Index(fields=['period', 'bucket_start'], name='rollup_period_idx'),
+            models.Index(fields=['department', 'period', 'bucket_start'], name='rollup_dept_period_idx'),
+        ]
+
+class AttendanceEvent(models.Model):
+    """Append-only history of check-ins, corrections and session starts/stops (users/events.py)"""
+    CHECK_IN = 1
+    MARKED = 2
+    UNMARKED = 3
+    SESSION_STARTED = 4
+    SESSION_STOPPED = 5
+    KIND_CHOICES = (
+        (CHECK_IN, 'Check-in'),
+        (MARKED, 'Marked present'),
+        (UNMARKED, 'Marked absent'),
+        (SESSION_STARTED, 'Session started'),
+        (SESSION_STOPPED, 'Session stopped'),
+    )
+    id = models.BigAutoField(primary_key=True)
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    # Plain ids rather than foreign keys: the history outlives the rows it mentions
+    session_id = models.BigIntegerField()
+    subject_id = models.BigIntegerField()
+    class_group_id = models.BigIntegerField()
+    session_date = models.DateField()
+    student_id = models.BigIntegerField(null=True)  # Only for check-ins and corrections
+    actor_id = models.BigIntegerField(null=True)  # User who did it; None for automatic changes
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['session_id'], name='event_session_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Attendance events are append-only')
+        super().save(*args, **kwargs)
+
+class SessionHeadcount(models.Model):
+    """Per-session counters projected from the event log"""
+    session_id = models.BigIntegerField(primary_key=True)
+    subject_id = models.BigIntegerField()
+    class_group_id = models.BigIntegerField()
+    session_date = models.DateField()
+    present = models.IntegerField(default=0)
+    check_ins = models.PositiveIntegerField(default=0)  # Students' own scans
+    corrections = models.PositiveIntegerField(default=0)  # Marked present or absent by staff
+    first_check_in = models.DateTimeField(null=True)
+    last_check_in = models.DateTimeField(null=True)
+    started_at = models.DateTimeField(null=True)  # First time attendance was opened
+    stopped_at = models.DateTimeField(null=True)  # Last time it was closed
@@ -0,0 +1,204 @@
+"""PostgreSQL range partitioning of the attendance table by session_date.
+
+The Django model is unchanged: Postgres routes rows to the right partition on
+insert and prunes partitions for queries that filter on ``session_date``
+(``Attendance.objects.in_term()``; the attendance list endpoints take
+``?term=current`` or ``?term=YYYY-MM-DD``). Old terms are archived by
+``compact_attendance``, which moves their rows into per-session bitmaps
+(``ArchivedSessionAttendance``) that every report and ``my-attendance`` keep
+reading. The partitions it leaves empty are then detached and dropped; there
+is no second, row-level archive.
+
+After ``--convert`` the table's primary key is (id, session_date), which the
+migration state does not know about. Migrations that alter ``Attendance``
+are refused (see ``guard_migrations``) and must be applied by hand.
+
+Nothing here runs on SQLite; local development keeps a single plain table.
+"""
+import re
+from datetime import date
+
+from django.db import connection, connections, transaction
+
+from .models import Attendance
+from .terms import partition_bounds, upcoming_partitions
+
+TABLE = Attendance._meta.db_table
+LEGACY_TABLE = f'{TABLE}_legacy'
+SEQUENCE = f'{TABLE}_partitioned_id_seq'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+BOUND_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})'\) TO \('(\d{4}-\d{2}-\d{2})'\)")
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y%m%d}'
+
+
+def is_partitioned(using='default'):
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)', [TABLE])
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """[(name, start, end)] for every attached range partition, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = BOUND_RE.search(bound)
+            if match:  # skips the DEFAULT partition
+                start, end = (date.fromisoformat(value) for value in match.groups())
+                partitions.append((name, start, end))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def create_partitions(day=None, ahead=2):
+    """Create the partition for ``day`` and the next ``ahead`` ones if missing.
+
+    Rows that already landed in the default partition for a new range are
+    moved into it before it is attached, so this is safe to run late.
+    """
+    created = []
+    existing = {name for name, _, _ in list_partitions()}
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start, end in upcoming_partitions(day, ahead):
+            name = partition_name(start)
+            if name in existing:
+                continue
+            cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+                f'WHERE session_date >= %s AND session_date < %s RETURNING *) '
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                [start, end],
+            )
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+            created.append(name)
+    return created
+
+
+def detach_partitions(before):
+    """Detach and drop the partitions ending on or before ``before``.
+
+    Raises PartitioningError, dropping nothing, while any of them still has
+    rows: those terms must be compacted into the bitmap archive first.
+    """
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        old = [(name, end) for name, _, end in list_partitions() if end <= before]
+        for name, end in old:
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{name}")')
+            if cursor.fetchone()[0]:
+                raise PartitioningError(
+                    f'{name} still has attendance rows; run compact_attendance --before {end} first'
+                )
+        for name, _ in old:
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+            detached.append(name)
+    return detached
+
+
+def convert_to_partitioned(ahead=2, keep_legacy=False):
+    """One-time conversion of the plain attendance table into a partitioned one.
+
+    Postgres requires the partition key in every unique constraint, so the
+    primary key becomes (id, session_date) and the duplicate guard becomes
+    (student, session, session_date), which is equivalent because the date
+    is a copy of the session's date. Django's migration state still describes
+    the plain table, so later migrations touching Attendance have to be
+    applied to the partitioned table by hand (``guard_migrations``).
+    """
+    if is_partitioned():
+        raise PartitioningError(f'{TABLE} is already partitioned')
+    if Attendance.objects.filter(session_date__isnull=True).exists():
+        raise PartitioningError(
+            'Some attendance rows have no session_date; run check_attendance_facts --fix first'
+        )
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        for index in Attendance._meta.indexes:
+            cursor.execute(f'ALTER INDEX "{index.name}" RENAME TO "{index.name}_legacy"')
+
+        cursor.execute(
+            f'CREATE TABLE "{TABLE}" (LIKE "{LEGACY_TABLE}" INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (session_date)'
+        )
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}".id')
+        cursor.execute(f"ALTER TABLE \"{TABLE}\" ALTER COLUMN id SET DEFAULT nextval('\"{SEQUENCE}\"')")
+        cursor.execute(f'ALTER TABLE "{TABLE}" ALTER COLUMN session_date SET NOT NULL')
+        cursor.execute(f'ALTER TABLE "{TABLE}" ADD PRIMARY KEY (id, session_date)')
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ADD CONSTRAINT "{TABLE}_student_session_uniq" '
+            f'UNIQUE (student_id, session_id, session_date)'
+        )
+        for field in ('student', 'session', 'subject', 'class_group', 'teacher'):
+            field = Attendance._meta.get_field(field)
+            cursor.execute(
+                f'ALTER TABLE "{TABLE}" ADD FOREIGN KEY ("{field.column}") '
+                f'REFERENCES "{field.related_model._meta.db_table}" (id) '
+                f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED'
+            )
+        cursor.execute(f'CREATE INDEX ON "{TABLE}" (session_id)')
+        cursor.execute(f'CREATE INDEX ON "{TABLE}" (student_id, session_date)')
+        for index in Attendance._meta.indexes:
+            columns = ', '.join(Attendance._meta.get_field(name).column for name in index.fields)
+            cursor.execute(f'CREATE INDEX "{index.name}" ON "{TABLE}" ({columns})')
+        cursor.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "{TABLE}" DEFAULT')
+
+        # Partitions for everything already recorded, then the upcoming ones
+        cursor.execute(f'SELECT MIN(session_date) FROM "{LEGACY_TABLE}"')
+        day = cursor.fetchone()[0]
+        current_start, _ = partition_bounds()
+        while day is not None and day < current_start:
+            created += create_partitions(day, ahead=0)
+            _, day = partition_bounds(day)
+        created += create_partitions(ahead=ahead)
+
+        cursor.execute(f'INSERT INTO "{TABLE}" SELECT * FROM "{LEGACY_TABLE}"')
+        cursor.execute(
+            f"SELECT setval('\"{SEQUENCE}\"', COALESCE((SELECT MAX(id) FROM \"{TABLE}\"), 0) + 1, false)"
+        )
+        if not keep_legacy:
+            cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+    return created
+
+
+def guard_migrations(plan, using='default'):
+    """Refuse to run migrations that alter Attendance once the table is partitioned"""
+    if connections[using].vendor != 'postgresql':
+        return
+    touching = [
+        f'{migration.app_label}.{migration.name}'
+        for migration, _ in plan
+        if migration.app_label == Attendance._meta.app_label and any(
+            (getattr(operation, 'model_name', None) or getattr(operation, 'name', '')).lower()
+            == Attendance._meta.model_name
+            for operation in migration.operations
+        )
+    ]
+    if touching and is_partitioned(using):
+        raise PartitioningError(
+            f'Migrations altering {TABLE}: {", ".join(touching)}. The table is partitioned, with a primary key '
+            f'of (id, session_date) that Django does not know about. Apply the SQL from sqlmigrate to the '
+            f'partitioned table (and its unique constraints) by hand, then migrate --fake.'
+        )
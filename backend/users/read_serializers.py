@@ -0,0 +1,187 @@
+"""Read-only projections for the hot list endpoints.
+
+These produce exactly what the ModelSerializers in users/serializers.py
+produce, but from ``values_list()`` rows instead of model instances. Each
+row-to-dict function is generated once at import time. Nested objects are
+loaded with one query per related table and shared between rows.
+
+users/tests.py checks that the rendered output matches the ModelSerializers
+byte for byte. Any field added to those serializers must be added here too.
+"""
+from rest_framework import serializers
+
+from .models import User, Subject, Faculty, ClassGroup, Student, Session
+
+HELPERS = {
+    'time_repr': serializers.TimeField().to_representation,
+    'date_repr': serializers.DateField().to_representation,
+    'datetime_repr': serializers.DateTimeField().to_representation,
+}
+
+
+def compile_projection(columns, fields, params=()):
+    """Build ``project(row, *params) -> dict`` from column names and field expressions.
+
+    ``fields`` is a list of (output key, Python expression over the column
+    names, the params and HELPERS).
+    """
+    unpack = ', '.join(columns) + (',' if len(columns) == 1 else '')
+    body = ', '.join(f'{key!r}: {expression}' for key, expression in fields)
+    source = (
+        f"def project(row{''.join(', ' + p for p in params)}):\n"
+        f"    {unpack} = row\n"
+        f"    return {{{body}}}\n"
+    )
+    namespace = dict(HELPERS)
+    exec(compile(source, f'<projection {", ".join(columns)}>', 'exec'), namespace)
+    return namespace['project']
+
+
+class Projection:
+    def __init__(self, columns, fields, params=()):
+        self.columns = tuple(columns)
+        self.project = compile_projection(self.columns, fields, params)
+
+    def rows(self, queryset, *params):
+        project = self.project
+        return [project(row, *params) for row in queryset.values_list(*self.columns)]
+
+
+SUBJECT = Projection(
+    ['id', 'name', 'code', 'year'],
+    [('id', 'id'), ('name', 'name'), ('code', 'code'), ('year', 'year'),
+     ('display_name', "f'{code} - {name}'")],
+)
+
+USER = Projection(
+    ['id', 'username', 'email', 'role', 'user_id', 'first_name', 'last_name'],
+    [(column, column) for column in ['id', 'username', 'email', 'role', 'user_id', 'first_name', 'last_name']],
+)
+
+FACULTY = Projection(
+    ['id', 'user_id', 'role'],
+    [('id', 'id'), ('user', 'users[user_id]'), ('role', 'role'),
+     ('subjects', 'faculty_subjects.get(id, [])')],
+    params=['users', 'faculty_subjects'],
+)
+
+CLASS_GROUP = Projection(
+    ['id', 'year', 'department', 'section', 'subjects_hash'],
+    [('id', 'id'), ('year', 'year'), ('department', 'department'), ('section', 'section'),
+     ('subjects', 'group_subjects.get(id, [])'), ('subjects_hash', 'subjects_hash'),
+     ('name', "f'{department} {year}-{section}'")],
+    params=['group_subjects'],
+)
+
+SESSION = Projection(
+    ['id', 'teacher_id', 'subject_id', 'class_group_id', 'start_time', 'end_time', 'date',
+     'recurring', 'qr_code', 'active'],
+    [('id', 'id'), ('teacher', 'teachers[teacher_id]'), ('subject', 'subjects[subject_id]'),
+     ('class_group', 'class_groups[class_group_id]'), ('start_time', 'time_repr(start_time)'),
+     ('end_time', 'time_repr(end_time)'), ('date', 'date_repr(date)'), ('recurring', 'recurring'),
+     ('qr_code', 'qr_code'), ('active', 'active')],
+    params=['teachers', 'subjects', 'class_groups'],
+)
+
+STUDENT = Projection(
+    ['id', 'user_id', 'department', 'section', 'year', 'subjects_hash', 'class_group_id'],
+    [('id', 'id'), ('user', 'users[user_id]'), ('department', 'department'), ('section', 'section'),
+     ('year', 'year'), ('subjects', 'student_subjects.get(id, [])'), ('subjects_hash', 'subjects_hash'),
+     ('class_group', 'None if class_group_id is None else class_groups[class_group_id]')],
+    params=['users', 'student_subjects', 'class_groups'],
+)
+
+ATTENDANCE = Projection(
+    ['id', 'student_id', 'session_id', 'marked_at'],
+    [('id', 'id'), ('student', 'students[student_id]'), ('session', 'sessions[session_id]'),
+     ('marked_at', 'datetime_repr(marked_at)')],
+    params=['students', 'sessions'],
+)
+
+
+def _by_id(rows):
+    return {row['id']: row for row in rows}
+
+
+def _subjects_by_owner(through, owner_column, owner_ids, subjects=None):
+    """{owner id: [subject dicts ordered like Subject.Meta.ordering]}"""
+    links = list(through.objects.filter(**{f'{owner_column}__in': owner_ids})
+                 .values_list(owner_column, 'subject_id'))
+    if subjects is None:
+        subjects = subject_map({subject_id for _, subject_id in links})
+    grouped = {}
+    for owner_id, subject_id in links:
+        grouped.setdefault(owner_id, []).append(subjects[subject_id])
+    for owned in grouped.values():
+        owned.sort(key=lambda s: (s['year'], s['code']))
+    return grouped
+
+
+def subject_rows(queryset):
+    return SUBJECT.rows(queryset)
+
+
+def subject_map(ids):
+    return _by_id(SUBJECT.rows(Subject.objects.filter(id__in=ids))) if ids else {}
+
+
+def user_rows(queryset):
+    return USER.rows(queryset)
+
+
+def user_map(ids):
+    return _by_id(USER.rows(User.objects.filter(id__in=ids))) if ids else {}
+
+
+def faculty_map(ids):
+    if not ids:
+        return {}
+    queryset = Faculty.objects.filter(id__in=ids)
+    users = user_map(set(queryset.values_list('user_id', flat=True)))
+    subjects = _subjects_by_owner(Faculty.subjects.through, 'faculty_id', ids)
+    return _by_id(FACULTY.rows(queryset, users, subjects))
+
+
+def class_group_map(ids):
+    if not ids:
+        return {}
+    subjects = _subjects_by_owner(ClassGroup.subjects.through, 'classgroup_id', ids)
+    return _by_id(CLASS_GROUP.rows(ClassGroup.objects.filter(id__in=ids), subjects))
+
+
+def session_rows(queryset):
+    """SessionSerializer output for every session in ``queryset``, in queryset order"""
+    rows = list(queryset.values_list(*SESSION.columns))
+    teachers = faculty_map({row[1] for row in rows})
+    subjects = subject_map({row[2] for row in rows})
+    class_groups = class_group_map({row[3] for row in rows})
+    project = SESSION.project
+    return [project(row, teachers, subjects, class_groups) for row in rows]
+
+
+def session_map(ids):
+    return _by_id(session_rows(Session.objects.filter(id__in=ids))) if ids else {}
+
+
+def student_map(ids):
+    if not ids:
+        return {}
+    queryset = Student.objects.filter(id__in=ids)
+    rows = list(queryset.values_list(*STUDENT.columns))
+    users = user_map({row[1] for row in rows})
+    class_groups = class_group_map({row[6] for row in rows if row[6] is not None})
+    student_subjects = {
+        student_id: [subject['id'] for subject in subjects]
+        for student_id, subjects in _subjects_by_owner(Student.subjects.through, 'student_id', ids).items()
+    }
+    project = STUDENT.project
+    return _by_id(project(row, users, student_subjects, class_groups) for row in rows)
+
+
+def attendance_rows(queryset):
+    """AttendanceSerializer output for every record in ``queryset``, in queryset order"""
+    rows = list(queryset.values_list(*ATTENDANCE.columns))
+    students = student_map({row[1] for row in rows})
+    sessions = session_map({row[2] for row in rows})
+    project = ATTENDANCE.project
+    return [project(row, students, sessions) for row in rows]
@@ -0,0 +1,256 @@
+"""Cache for reference data read on almost every request.
+
+Subjects, class groups (with their subjects) and faculty subject assignments
+change rarely but are looked up constantly. They are cached by id in the
+``reference`` cache alias and invalidated from model signals in
+users/signals.py. Loaders always read the primary, so a miss right after an
+invalidation never caches what a lagging replica still returns.
+
+With a shared backend (``CACHE_BACKEND`` file or Redis) an invalidation
+reaches every worker. With the default in-process LRU it only clears the
+worker that handled the write; the others keep serving the old value until
+it expires, so that alias has a short TTL (see settings.py). Run several
+workers with a shared backend.
+
+Hit/miss counters are kept per key family for the current process, and
+exported to Prometheus (users/metrics.py) for all of them.
+"""
+import threading
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.db.models import Prefetch
+
+from .metrics import CACHE_REQUESTS
+from .models import Subject, ClassGroup, Faculty
+from .read_serializers import subject_rows
+
+_MISSING = object()
+_lock = threading.Lock()
+_counters = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def _cache():
+    return caches['reference']
+
+
+def _primary_subjects():
+    # The router would send the prefetch query to a replica as well
+    return Prefetch('subjects', queryset=Subject.objects.using('default'))
+
+
+def _count(family, result, amount=1):
+    with _lock:
+        _counters[family][result] += amount
+    CACHE_REQUESTS.labels(family, result).inc(amount)
+
+
+def stats():
+    """{family: {'hits', 'misses', 'hit_ratio'}} for this process"""
+    with _lock:
+        snapshot = {family: dict(counts) for family, counts in _counters.items()}
+    for counts in snapshot.values():
+        total = counts['hits'] + counts['misses']
+        counts['hit_ratio'] = round(counts['hits'] / total, 4) if total else None
+    return snapshot
+
+
+def reset_stats():
+    with _lock:
+        _counters.clear()
+
+
+def _get(family, key, loader):
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(family, 'hits')
+        return value
+    _count(family, 'misses')
+    value = loader()
+    cache.set(key, value)
+    return value
+
+
+def _get_many(family, ids, key_for, loader):
+    """{id: value} for ``ids``; ``loader(missing_ids)`` returns {id: value}"""
+    ids = list(dict.fromkeys(ids))
+    keys = {key_for(i): i for i in ids}
+    found = _cache().get_many(keys)
+    result = {keys[key]: value for key, value in found.items()}
+    missing = [i for i in ids if i not in result]
+    _count(family, 'hits', len(result))
+    if missing:
+        _count(family, 'misses', len(missing))
+        loaded = loader(missing)
+        _cache().set_many({key_for(i): loaded.get(i) for i in missing})
+        result.update(loaded)
+    return result
+
+
+def _subject_key(subject_id):
+    return f'subject:{subject_id}'
+
+
+def _class_group_key(class_group_id):
+    return f'class-group:{class_group_id}'
+
+
+def _class_group_subjects_key(class_group_id):
+    return f'class-group-subjects:{class_group_id}'
+
+
+def _subject_class_groups_key(subject_id):
+    return f'subject-class-groups:{subject_id}'
+
+
+def _faculty_subjects_key(faculty_id):
+    return f'faculty-subjects:{faculty_id}'
+
+
+def _subject_faculty_key(subject_id):
+    return f'subject-faculty:{subject_id}'
+
+
+def _faculty_of_user_key(user_id):
+    return f'faculty-of-user:{user_id}'
+
+
+# Lookups
+
+def get_subject(subject_id):
+    return _get('subject', _subject_key(subject_id),
+                lambda: Subject.objects.using('default').filter(id=subject_id).first())
+
+
+def get_subjects(subject_ids):
+    """Subjects for ``subject_ids`` ordered by (year, code); unknown ids are skipped"""
+    found = _get_many('subject', subject_ids, _subject_key,
+                      lambda missing: {s.id: s for s in Subject.objects.using('default').filter(id__in=missing)})
+    return sorted((s for s in found.values() if s is not None), key=lambda s: (s.year, s.code))
+
+
+def all_subject_rows():
+    """SubjectSerializer output for every subject, ordered by (year, code)"""
+    return _get('subject-list', 'subject-rows', lambda: subject_rows(
+        Subject.objects.using('default').order_by('year', 'code')))
+
+
+def get_class_group(class_group_id):
+    """Class group with its subjects prefetched"""
+    return _get('class-group', _class_group_key(class_group_id),
+                lambda: ClassGroup.objects.using('default').prefetch_related(_primary_subjects())
+                .filter(id=class_group_id).first())
+
+
+def get_class_groups(class_group_ids):
+    found = _get_many('class-group', class_group_ids, _class_group_key,
+                      lambda missing: {g.id: g for g in ClassGroup.objects.using('default')
+                                       .prefetch_related(_primary_subjects()).filter(id__in=missing)})
+    return [g for g in found.values() if g is not None]
+
+
+def class_group_subject_ids(class_group_id):
+    through = ClassGroup.subjects.through
+    return _get('class-group-subjects', _class_group_subjects_key(class_group_id), lambda: frozenset(
+        through.objects.using('default').filter(classgroup_id=class_group_id).values_list('subject_id', flat=True)))
+
+
+def subject_class_group_ids(subject_ids):
+    """Ids of class groups having any of ``subject_ids``"""
+    through = ClassGroup.subjects.through
+
+    def load(missing):
+        groups = {subject_id: set() for subject_id in missing}
+        for class_group_id, subject_id in through.objects.using('default').filter(
+                subject_id__in=missing).values_list('classgroup_id', 'subject_id'):
+            groups[subject_id].add(class_group_id)
+        return {subject_id: frozenset(ids) for subject_id, ids in groups.items()}
+
+    found = _get_many('subject-class-groups', subject_ids, _subject_class_groups_key, load)
+    return frozenset().union(*found.values())
+
+
+def faculty_subject_ids(faculty_id):
+    through = Faculty.subjects.through
+    return _get('faculty-subjects', _faculty_subjects_key(faculty_id), lambda: frozenset(
+        through.objects.using('default').filter(faculty_id=faculty_id).values_list('subject_id', flat=True)))
+
+
+def subject_faculty_ids(subject_ids):
+    """Ids of faculty teaching any of ``subject_ids``"""
+    through = Faculty.subjects.through
+
+    def load(missing):
+        teachers = {subject_id: set() for subject_id in missing}
+        for faculty_id, subject_id in through.objects.using('default').filter(
+                subject_id__in=missing).values_list('faculty_id', 'subject_id'):
+            teachers[subject_id].add(faculty_id)
+        return {subject_id: frozenset(ids) for subject_id, ids in teachers.items()}
+
+    found = _get_many('subject-faculty', subject_ids, _subject_faculty_key, load)
+    return frozenset().union(*found.values())
+
+
+def faculty_id_for_user(user_id):
+    """Faculty profile id of a user, or None"""
+    return _get('faculty-of-user', _faculty_of_user_key(user_id), lambda: (
+        Faculty.objects.using('default').filter(user_id=user_id).values_list('id', flat=True).first()))
+
+
+def warm():
+    """Load every subject, class group and faculty assignment; returns the number of keys set"""
+    subjects = {s.id: s for s in Subject.objects.all()}
+    groups = {g.id: g for g in ClassGroup.objects.prefetch_related('subjects')}
+    group_subjects = {group_id: set() for group_id in groups}
+    subject_groups = {subject_id: set() for subject_id in subjects}
+    for group_id, subject_id in ClassGroup.subjects.through.objects.values_list('classgroup_id', 'subject_id'):
+        group_subjects[group_id].add(subject_id)
+        subject_groups[subject_id].add(group_id)
+    faculty_users = dict(Faculty.objects.values_list('id', 'user_id'))
+    faculty_subjects = {faculty_id: set() for faculty_id in faculty_users}
+    subject_faculty = {subject_id: set() for subject_id in subjects}
+    for faculty_id, subject_id in Faculty.subjects.through.objects.values_list('faculty_id', 'subject_id'):
+        faculty_subjects[faculty_id].add(subject_id)
+        subject_faculty[subject_id].add(faculty_id)
+
+    values = {'subject-rows': subject_rows(Subject.objects.order_by('year', 'code'))}
+    for subject_id, subject in subjects.items():
+        values[_subject_key(subject_id)] = subject
+        values[_subject_class_groups_key(subject_id)] = frozenset(subject_groups[subject_id])
+        values[_subject_faculty_key(subject_id)] = frozenset(subject_faculty[subject_id])
+    for group_id, group in groups.items():
+        values[_class_group_key(group_id)] = group
+        values[_class_group_subjects_key(group_id)] = frozenset(group_subjects[group_id])
+    for faculty_id, user_id in faculty_users.items():
+        values[_faculty_subjects_key(faculty_id)] = frozenset(faculty_subjects[faculty_id])
+        values[_faculty_of_user_key(user_id)] = faculty_id
+    _cache().set_many(values)
+    return len(values)
+
+
+# Invalidation (called from users/signals.py)
+
+def _delete(*keys):
+    _cache().delete_many(keys)
+
+
+def invalidate_subject(subject_id, class_group_ids=()):
+    _delete(_subject_key(subject_id), 'subject-rows', _subject_class_groups_key(subject_id),
+            _subject_faculty_key(subject_id), *(_class_group_key(i) for i in class_group_ids))
+
+
+def invalidate_class_group(class_group_id, subject_ids=()):
+    _delete(_class_group_key(class_group_id), _class_group_subjects_key(class_group_id),
+            *(_subject_class_groups_key(i) for i in subject_ids))
+
+
+def invalidate_faculty(faculty_id, user_id=None, subject_ids=()):
+    keys = [_faculty_subjects_key(faculty_id), *(_subject_faculty_key(i) for i in subject_ids)]
+    if user_id is not None:
+        keys.append(_faculty_of_user_key(user_id))
+    _delete(*keys)
+
+
+def clear():
+    _cache().clear()
@@ -0,0 +1,154 @@
+"""Per-subject attendance summary and the defaulters report built on it.
+
+``SubjectAttendanceSummary`` holds one row per (student, enrolled subject):
+sessions held for the student's class group so far, sessions attended (live
+and archived) and the percentage. It is computed with a single grouped query
+over the enrollment table and refreshed incrementally: only pairs touched by
+new or removed attendance (removals come from UNMARKED events in the event
+log), new sessions or sessions whose date has arrived since the last run are
+recomputed. Ids are allocated before commit, so rows and events stamped
+within ``ATTENDANCE_SUMMARY_LAG_SECONDS`` before the last run are looked at
+again even if their id is below the checkpoint. Enrollment and class group
+changes and deleted sessions are only picked up by ``refresh(full=True)``,
+which rebuilds everything.
+"""
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import archive
+from .models import Attendance, AttendanceEvent, RefreshCheckpoint, Session, Student, SubjectAttendanceSummary
+
+Enrollment = Student.subjects.through
+
+ATTENDANCE_CHECKPOINT = 'subject-summary.attendance'
+SESSION_CHECKPOINT = 'subject-summary.session'
+DATE_CHECKPOINT = 'subject-summary.date'
+EVENT_CHECKPOINT = 'subject-summary.event'
+TIME_CHECKPOINT = 'subject-summary.time'  # Unix time the last run's marks were taken
+
+
+def default_threshold():
+    return getattr(settings, 'ATTENDANCE_DEFAULTER_THRESHOLD', 75)
+
+
+def percentage(held, attended):
+    if not held:
+        return 100.0
+    return round(min(attended, held) * 100 / held, 2)
+
+
+def _count(queryset, group_by):
+    return Subquery(
+        queryset.order_by().values(group_by).annotate(n=Count('id')).values('n'),
+        output_field=IntegerField(),
+    )
+
+
+def summary_rows(enrollments, today=None):
+    """(student, subject, class_group, department, year, held, attended) per enrollment, in one query"""
+    today = today or timezone.localdate()
+    held = Session.objects.filter(
+        class_group_id=OuterRef('student__class_group_id'), subject_id=OuterRef('subject_id'), date__lte=today,
+    )
+    attended = Attendance.objects.filter(student_id=OuterRef('student_id'), subject_id=OuterRef('subject_id'))
+    return enrollments.annotate(
+        held=Coalesce(_count(held, 'subject_id'), Value(0)),
+        attended=Coalesce(_count(attended, 'student_id'), Value(0)),
+    ).values_list(
+        'student_id', 'subject_id', 'student__class_group_id', 'student__department', 'student__year',
+        'held', 'attended',
+    )
+
+
+def _marks(today):
+    """Checkpoint positions covering everything visible right now"""
+    return {
+        ATTENDANCE_CHECKPOINT: Attendance.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+        SESSION_CHECKPOINT: Session.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+        DATE_CHECKPOINT: today.toordinal(),
+        EVENT_CHECKPOINT: AttendanceEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+        TIME_CHECKPOINT: int(timezone.now().timestamp()),
+    }
+
+
+def _dirty_enrollments(today, marks):
+    """Enrollments whose totals may have changed between the stored checkpoints and ``marks``"""
+    last_date = RefreshCheckpoint.get(DATE_CHECKPOINT)
+    lag = timedelta(seconds=getattr(settings, 'ATTENDANCE_SUMMARY_LAG_SECONDS', 60))
+    since = datetime.fromtimestamp(RefreshCheckpoint.get(TIME_CHECKPOINT), dt_timezone.utc) - lag
+    new_attendance = Attendance.objects.filter(
+        Q(id__gt=RefreshCheckpoint.get(ATTENDANCE_CHECKPOINT)) | Q(marked_at__gte=since),
+        id__lte=marks[ATTENDANCE_CHECKPOINT])
+    removed_attendance = AttendanceEvent.objects.filter(
+        Q(id__gt=RefreshCheckpoint.get(EVENT_CHECKPOINT)) | Q(occurred_at__gte=since),
+        id__lte=marks[EVENT_CHECKPOINT], kind=AttendanceEvent.UNMARKED)
+    # New sessions, and sessions that were in the future at the last refresh but have now been held
+    changed_sessions = Session.objects.filter(
+        Q(id__gt=RefreshCheckpoint.get(SESSION_CHECKPOINT), id__lte=marks[SESSION_CHECKPOINT])
+        | Q(date__gt=date.fromordinal(last_date) if last_date else date.min, date__lte=today)
+    )
+
+    # Correlated subqueries keep the statement the same size however much changed
+    pair = {'student_id': OuterRef('student_id'), 'subject_id': OuterRef('subject_id')}
+    return Enrollment.objects.filter(
+        Exists(new_attendance.filter(**pair))
+        | Exists(removed_attendance.filter(**pair))
+        | Exists(changed_sessions.filter(class_group_id=OuterRef('student__class_group_id'),
+                                         subject_id=OuterRef('subject_id')))
+    )
+
+
+def refresh(full=False, batch_size=2000):
+    """Recompute the summary; returns the number of rows written"""
+    today = timezone.localdate()
+    now = timezone.now()
+    marks = _marks(today)
+    enrollments = Enrollment.objects.all() if full else _dirty_enrollments(today, marks)
+
+    rows = list(summary_rows(enrollments, today))
+    archived = archive.attended_counts_by_subject({row[1] for row in rows}) if rows else {}
+
+    summaries = []
+    for student_id, subject_id, class_group_id, department, year, held, attended in rows:
+        counts = archived.get(subject_id)
+        if counts is not None and student_id < counts.size:
+            attended += int(counts[student_id])
+        summaries.append(SubjectAttendanceSummary(
+            student_id=student_id, subject_id=subject_id, class_group_id=class_group_id,
+            department=department, year=year, held=held, attended=attended,
+            percentage=percentage(held, attended), refreshed_at=now,
+        ))
+
+    with transaction.atomic():
+        if full:
+            # Drop summaries of enrollments that no longer exist
+            SubjectAttendanceSummary.objects.filter(refreshed_at__lt=now).delete()
+        SubjectAttendanceSummary.objects.bulk_create(
+            summaries, batch_size=batch_size, update_conflicts=True, unique_fields=['student', 'subject'],
+            update_fields=['class_group', 'department', 'year', 'held', 'attended', 'percentage', 'refreshed_at'],
+        )
+        for name, position in marks.items():
+            RefreshCheckpoint.put(name, position)
+    return len(summaries)
+
+
+def defaulters(threshold=None, subject_ids=None, **filters):
+    """Summary rows below ``threshold`` percent, lowest first"""
+    threshold = default_threshold() if threshold is None else threshold
+    summaries = SubjectAttendanceSummary.objects.filter(percentage__lt=threshold, held__gt=0, **filters)
+    if subject_ids is not None:
+        summaries = summaries.filter(subject_id__in=subject_ids)
+    return summaries.order_by('percentage', 'subject__code', 'student__user__username').values(
+        'student_id', 'student__user__user_id', 'student__user__username', 'student__user__first_name',
+        'student__user__last_name', 'department', 'year', 'class_group_id',
+        'subject_id', 'subject__code', 'subject__name', 'held', 'attended', 'percentage',
+    )
+
+
+def last_refreshed():
+    return RefreshCheckpoint.objects.filter(name=DATE_CHECKPOINT).values_list('updated_at', flat=True).first()
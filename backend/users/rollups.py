@@ -0,0 +1,203 @@
+"""Daily and weekly attendance rollups behind the trends endpoint.
+
+``AttendanceRollup`` keeps, per (period, bucket, subject, class group), the
+number of sessions held, attendance marked and the eligible roster summed
+over those sessions. Rows are kept current incrementally: a check-in bumps
+``present`` of its day and week buckets, and closing or deleting a session
+recomputes both buckets exactly. Both run after the transaction commits.
+``backfill`` rebuilds whole weeks from scratch with a few grouped queries.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from . import reference_cache
+from .models import ArchivedSessionAttendance, Attendance, AttendanceRollup, ClassGroup, Session, Student, Subject
+from .reports import Enrollment
+
+PERIODS = ('day', 'week')
+GROUP_BY_FIELDS = {'subject': 'subject_id', 'class_group': 'class_group_id', 'department': 'department'}
+
+
+def bucket_start(day, period):
+    return day if period == 'day' else day - timedelta(days=day.weekday())
+
+
+def bucket_bounds(day, period):
+    start = bucket_start(day, period)
+    return start, start + timedelta(days=1 if period == 'day' else 7)
+
+
+def _department(class_group_id):
+    class_group = reference_cache.get_class_group(class_group_id)
+    return class_group.department if class_group else ''
+
+
+def _refresh(period, subject_id, class_group_id, day, roster, department):
+    start, end = bucket_bounds(day, period)
+    in_bucket = {'subject_id': subject_id, 'class_group_id': class_group_id,
+                 'session_date__gte': start, 'session_date__lt': end}
+    sessions = Session.objects.filter(subject_id=subject_id, class_group_id=class_group_id,
+                                      date__gte=start, date__lt=end,
+                                      date__lte=max(timezone.localdate(), day)).count()
+    present = Attendance.objects.filter(**in_bucket).count()
+    present += ArchivedSessionAttendance.objects.filter(**in_bucket).aggregate(
+        n=Sum('present_count'))['n'] or 0
+    AttendanceRollup.objects.update_or_create(
+        period=period, bucket_start=start, subject_id=subject_id, class_group_id=class_group_id,
+        defaults={'department': department, 'sessions': sessions, 'present': present,
+                  'roster': sessions * roster},
+    )
+
+
+def _roster(subject_id, class_group_id):
+    return Student.objects.filter(class_group_id=class_group_id, subjects=subject_id).count()
+
+
+def refresh_bucket(subject_id, class_group_id, day):
+    """Recompute the day and week rollups holding ``day`` for one subject and class group"""
+    roster = _roster(subject_id, class_group_id)
+    department = _department(class_group_id)
+    for period in PERIODS:
+        _refresh(period, subject_id, class_group_id, day, roster, department)
+
+
+def refresh_buckets(days):
+    """Recompute the buckets holding each (subject, class group, day), each bucket once
+
+    Pairs whose subject or class group no longer exists are skipped: their
+    rollups were deleted with them.
+    """
+    days = set(days)
+    subject_ids = set(Subject.objects.filter(id__in={s for s, _, _ in days}).values_list('id', flat=True))
+    class_group_ids = set(ClassGroup.objects.filter(id__in={c for _, c, _ in days}).values_list('id', flat=True))
+    buckets = {}
+    for subject_id, class_group_id, day in days:
+        if subject_id in subject_ids and class_group_id in class_group_ids:
+            for period in PERIODS:
+                buckets.setdefault((period, bucket_start(day, period), subject_id, class_group_id), day)
+    pairs = {}
+    for (period, _, subject_id, class_group_id), day in sorted(buckets.items()):
+        if (subject_id, class_group_id) not in pairs:
+            pairs[(subject_id, class_group_id)] = (_roster(subject_id, class_group_id),
+                                                   _department(class_group_id))
+        _refresh(period, subject_id, class_group_id, day, *pairs[(subject_id, class_group_id)])
+    return len(buckets)
+
+
+_pending = threading.local()
+
+
+def refresh_after_commit(subject_id, class_group_id, day):
+    """Queue a bucket refresh for when the current transaction commits
+
+    Refreshes queued by one transaction (a cascade deleting many sessions)
+    run together, each bucket once.
+    """
+    pending = getattr(_pending, 'days', None)
+    if pending is None:
+        pending = _pending.days = set()
+    pending.add((subject_id, class_group_id, day))
+    transaction.on_commit(_flush_pending, robust=True)
+
+
+def _flush_pending():
+    days, _pending.days = getattr(_pending, 'days', None), None
+    if days:
+        refresh_buckets(days)
+
+
+def add_present(subject_id, class_group_id, day, delta):
+    """Adjust the day and week buckets holding ``day`` by ``delta`` attendance rows (already written)"""
+    for period in PERIODS:
+        updated = AttendanceRollup.objects.filter(
+            period=period, bucket_start=bucket_start(day, period),
+            subject_id=subject_id, class_group_id=class_group_id,
+        ).update(present=F('present') + delta, updated_at=timezone.now())
+        if not updated:
+            # First activity in this bucket: compute it from scratch (includes the change)
+            refresh_bucket(subject_id, class_group_id, day)
+            return
+
+
+def record_check_in(attendance):
+    """Count a new attendance row in its day and week buckets"""
+    if attendance.subject_id is None or attendance.class_group_id is None:
+        return
+    add_present(attendance.subject_id, attendance.class_group_id, attendance.session_date, 1)
+
+
+def record_session_closed(session):
+    refresh_bucket(session.subject_id, session.class_group_id, session.date)
+
+
+def backfill(since, until=None, batch_size=2000):
+    """Rebuild every rollup from the week holding ``since`` through the week holding ``until`` (today by default)"""
+    until = until or timezone.localdate()
+    # Whole weeks only: the buckets in range are deleted and rebuilt below
+    since = bucket_start(since, 'week')
+    end = bucket_bounds(until, 'week')[1]
+    held_until = max(timezone.localdate(), until)
+    days = defaultdict(lambda: [0, 0])  # (day, subject, class group) -> [sessions, present]
+
+    for subject_id, class_group_id, day, n in (
+            Session.objects.filter(date__gte=since, date__lt=end, date__lte=held_until).order_by()
+            .values_list('subject_id', 'class_group_id', 'date').annotate(n=Count('id'))):
+        days[(day, subject_id, class_group_id)][0] += n
+    for subject_id, class_group_id, day, n in (
+            Attendance.objects.filter(session_date__gte=since, session_date__lt=end, subject__isnull=False)
+            .order_by().values_list('subject_id', 'class_group_id', 'session_date').annotate(n=Count('id'))):
+        days[(day, subject_id, class_group_id)][1] += n
+    for subject_id, class_group_id, day, n in (
+            ArchivedSessionAttendance.objects.filter(session_date__gte=since, session_date__lt=end)
+            .order_by().values_list('subject_id', 'class_group_id', 'session_date')
+            .annotate(n=Sum('present_count'))):
+        days[(day, subject_id, class_group_id)][1] += n
+
+    rosters = {
+        (class_group_id, subject_id): n for class_group_id, subject_id, n in
+        Enrollment.objects.filter(student__class_group__isnull=False).order_by()
+        .values_list('student__class_group_id', 'subject_id').annotate(n=Count('id'))
+    }
+
+    buckets = defaultdict(lambda: [0, 0, 0])
+    for (day, subject_id, class_group_id), (sessions, present) in days.items():
+        roster = sessions * rosters.get((class_group_id, subject_id), 0)
+        for period in PERIODS:
+            totals = buckets[(period, bucket_start(day, period), subject_id, class_group_id)]
+            totals[0] += sessions
+            totals[1] += present
+            totals[2] += roster
+
+    departments = {}
+    rollups = []
+    for (period, start, subject_id, class_group_id), (sessions, present, roster) in buckets.items():
+        if class_group_id not in departments:
+            departments[class_group_id] = _department(class_group_id)
+        rollups.append(AttendanceRollup(
+            period=period, bucket_start=start, subject_id=subject_id, class_group_id=class_group_id,
+            department=departments[class_group_id], sessions=sessions, present=present, roster=roster,
+        ))
+
+    with transaction.atomic():
+        AttendanceRollup.objects.filter(bucket_start__gte=since, bucket_start__lt=end).delete()
+        AttendanceRollup.objects.bulk_create(rollups, batch_size=batch_size)
+    return len(rollups)
+
+
+def series(period, start, end, group_by=None, **filters):
+    """Summed rollups per bucket (and per ``group_by`` key) for buckets starting in [start, end)"""
+    keys = ['bucket_start']
+    if group_by:
+        keys.insert(0, GROUP_BY_FIELDS[group_by])
+    rows = (AttendanceRollup.objects
+            .filter(period=period, bucket_start__gte=start, bucket_start__lt=end, **filters)
+            .order_by(*keys).values(*keys)
+            .annotate(sessions=Sum('sessions'), present=Sum('present'), roster=Sum('roster')))
+    for row in rows:
+        row['percentage'] = round(row['present'] * 100 / row['roster'], 2) if row['roster'] else None
+        yield row
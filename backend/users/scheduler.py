@@ -0,0 +1,185 @@
+"""Automatic start and close of attendance for scheduled sessions.
+
+A session is opened for check-in at its ``start_time`` and closed
+``SESSION_AUTO_CLOSE_GRACE_MINUTES`` after its ``end_time``. Instead of
+polling the session table, the scheduler keeps a heap of (when, action,
+session) for the sessions dated yesterday to tomorrow plus any session still
+open, and sleeps until the earliest entry. It reloads that window every
+``SESSION_SCHEDULER_RELOAD_SECONDS`` and, when running inside a web worker,
+as soon as a session is saved there.
+
+A recurring session repeats weekly until the end of its term
+(``conflicts.occurrences``), and each of its dates in the window is opened
+and closed in turn. A session that faculty stopped by hand (a
+SESSION_STOPPED event that day) is not reopened that day. The scheduler's
+own saves do not wake it up again.
+
+Opening and closing are conditional updates, so a scheduler running in
+several processes at once does no harm beyond duplicate queries. Run it
+either with ``manage.py run_session_scheduler`` or inside the web workers
+(``SESSION_SCHEDULER_IN_PROCESS``).
+"""
+import heapq
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import events
+from .conflicts import occurrences
+from .models import ArchivedSessionAttendance, AttendanceEvent, Session
+from .terms import term_bounds
+
+logger = logging.getLogger(__name__)
+
+ACTIVATE = 'activate'
+CLOSE = 'close'
+
+_running = None
+
+
+def grace():
+    return timedelta(minutes=getattr(settings, 'SESSION_AUTO_CLOSE_GRACE_MINUTES', 10))
+
+
+def reload_interval():
+    return timedelta(seconds=getattr(settings, 'SESSION_SCHEDULER_RELOAD_SECONDS', 60))
+
+
+def _at(day, clock):
+    return timezone.make_aware(datetime.combine(day, clock))
+
+
+def activate(session_id):
+    """Open a session for check-in unless it is already open or archived; returns whether it was"""
+    with transaction.atomic():
+        session = (Session.objects.select_for_update()
+                   .filter(id=session_id, active=False)
+                   .exclude(id__in=ArchivedSessionAttendance.objects.values('session_id'))
+                   .first())
+        if session is None:
+            return False
+        session.qr_code = f"{session.id}-{timezone.now().timestamp()}"
+        session.active = True
+        session.saved_by_scheduler = True
+        session.save(update_fields=['qr_code', 'active'])
+        events.append(AttendanceEvent.SESSION_STARTED, session)
+    return True
+
+
+def close(session_id):
+    """Close an open session; returns whether it was open"""
+    with transaction.atomic():
+        session = Session.objects.select_for_update().filter(id=session_id, active=True).first()
+        if session is None:
+            return False
+        session.active = False
+        session.saved_by_scheduler = True
+        session.save(update_fields=['active'])
+        events.append(AttendanceEvent.SESSION_STOPPED, session)
+    return True
+
+
+ACTIONS = {ACTIVATE: activate, CLOSE: close}
+
+
+class Scheduler:
+    def __init__(self):
+        self._heap = []
+        self._sequence = itertools.count()
+        self.wake = threading.Event()
+
+    def _push(self, when, action, session_id):
+        heapq.heappush(self._heap, (when, next(self._sequence), action, session_id))
+
+    def load(self, now):
+        """Rebuild the queue from the sessions around today and every open session"""
+        self._heap = []
+        today = timezone.localdate(now)
+        first, last = today - timedelta(days=1), today + timedelta(days=1)
+        window = Session.objects.filter(
+            Q(date__gte=first) | Q(recurring=True, date__gte=term_bounds(first)[0]), date__lte=last)
+        stopped = defaultdict(set)  # session id -> days it was stopped on
+        for session_id, when in AttendanceEvent.objects.filter(
+                kind=AttendanceEvent.SESSION_STOPPED, session_id__in=window.values('id'),
+                occurred_at__gte=_at(first, datetime.min.time())).values_list('session_id', 'occurred_at'):
+            stopped[session_id].add(timezone.localdate(when))
+
+        queued = set()
+        for session_id, date, start, end, recurring, active in window.values_list(
+                'id', 'date', 'start_time', 'end_time', 'recurring', 'active'):
+            for day in occurrences(date, recurring, first, last + timedelta(days=1)):
+                closes_at = _at(day, end) + grace()
+                # A one-off session stays stopped; a recurring one only for that date
+                was_stopped = day in stopped[session_id] if recurring else bool(stopped[session_id])
+                if not active and now < closes_at and not was_stopped:
+                    # Also catches up on sessions that should have opened while the scheduler was down
+                    self._push(max(_at(day, start), now), ACTIVATE, session_id)
+                    active = True
+                if active:
+                    self._push(closes_at, CLOSE, session_id)
+                    queued.add(session_id)
+
+        # Opened by hand on another day, or left open while the scheduler was down
+        for session_id, date, end, recurring in Session.objects.filter(active=True).values_list(
+                'id', 'date', 'end_time', 'recurring'):
+            if session_id not in queued:
+                # A recurring session closes after its latest date so far
+                day = (occurrences(date, recurring, date, max(date, today) + timedelta(days=1)) or [date])[-1]
+                self._push(_at(day, end) + grace(), CLOSE, session_id)
+        return len(self._heap)
+
+    def next_at(self):
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now):
+        """Carry out every action due by ``now``; returns [(action, session id, changed)]"""
+        done = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, action, session_id = heapq.heappop(self._heap)
+            done.append((action, session_id, ACTIONS[action](session_id)))
+        return done
+
+    def serve(self, stop=None, on_fire=None):
+        """Run until ``stop`` (a threading.Event) is set"""
+        stop = stop or threading.Event()
+        next_load = None
+        while not stop.is_set():
+            try:
+                now = timezone.now()
+                if next_load is None or now >= next_load or self.wake.is_set():
+                    self.wake.clear()
+                    self.load(now)
+                    next_load = now + reload_interval()
+                for action, session_id, changed in self.run_due(now):
+                    if on_fire is not None:
+                        on_fire(action, session_id, changed)
+                wake_at = min(filter(None, [next_load, self.next_at()]))
+            except DatabaseError:
+                logger.exception('Session scheduler pass failed')
+                connection.close()
+                next_load = None
+                wake_at = timezone.now() + reload_interval()
+            self.wake.wait(max(0.0, (wake_at - timezone.now()).total_seconds()))
+        connection.close()
+
+
+def start_background():
+    """Run a scheduler on a daemon thread of this process (once)"""
+    global _running
+    if _running is None:
+        _running = Scheduler()
+        threading.Thread(target=_running.serve, name='session-scheduler', daemon=True).start()
+    return _running
+
+
+def notify():
+    """Have the in-process scheduler, if any, reload (sessions changed)"""
+    if _running is not None:
+        _running.wake.set()
@@ -1,5 +1,26 @@
 from rest_framework import serializers
 from .models import User, Student, Faculty, Subject, ClassGroup, Session, Attendance
+from . import conflicts, reference_cache
+
+class CachedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField that resolves ids through the reference cache"""
+
+    def __init__(self, **kwargs):
+        self.loader = kwargs.pop('loader')
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # int() would turn True and 1.5 into pk 1
+        if isinstance(data, bool) or (isinstance(data, float) and not data.is_integer()):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        obj = self.loader(pk)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -35,9 +56,10 @@ class ClassGroupSerializer(serializers.ModelSerializer):
 
 class StudentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    subjects = serializers.PrimaryKeyRelatedField(
+    subjects = CachedPrimaryKeyRelatedField(
         many=True,
         queryset=Subject.objects.all(),
+        loader=reference_cache.get_subject,
         required=False
     )
     class_group = ClassGroupSerializer(read_only=True)
@@ -145,14 +167,16 @@ class SessionSerializer(serializers.ModelSerializer):
     class_group = ClassGroupSerializer(read_only=True)
     
     # Write-only fields for creation
-    subject_id = serializers.PrimaryKeyRelatedField(
+    subject_id = CachedPrimaryKeyRelatedField(
         queryset=Subject.objects.all(),
+        loader=reference_cache.get_subject,
         write_only=True,
         required=False,
         source='subject'
     )
-    class_group_id = serializers.PrimaryKeyRelatedField(
+    class_group_id = CachedPrimaryKeyRelatedField(
         queryset=ClassGroup.objects.all(),
+        loader=reference_cache.get_class_group,
         write_only=True,
         required=False,
         source='class_group'
@@ -169,23 +193,22 @@ class SessionSerializer(serializers.ModelSerializer):
         if not request or not request.user:
             raise serializers.ValidationError("Authentication required")
         
-        try:
-            faculty = Faculty.objects.get(user=request.user)
-        except Faculty.DoesNotExist:
+        faculty_id = reference_cache.faculty_id_for_user(request.user.id)
+        if faculty_id is None:
             raise serializers.ValidationError("Only faculty can create sessions")
         
         subject = data.get('subject')
         class_group = data.get('class_group')
         
         # Validate faculty teaches this subject
-        if subject and not faculty.subjects.filter(id=subject.id).exists():
+        if subject and subject.id not in reference_cache.faculty_subject_ids(faculty_id):
             raise serializers.ValidationError(
                 f"You are not assigned to teach '{subject.code} - {subject.name}'"
             )
         
         # Validate class group contains this subject
         if subject and class_group:
-            if not class_group.subjects.filter(id=subject.id).exists():
+            if subject.id not in reference_cache.class_group_subject_ids(class_group.id):
                 raise serializers.ValidationError(
                     f"Class group '{class_group.name}' does not have subject '{subject.code} - {subject.name}' "
                     f"in their curriculum"
@@ -197,7 +220,24 @@ class SessionSerializer(serializers.ModelSerializer):
                     f"Subject '{subject.name}' is for year {subject.year}, "
                     f"but class group '{class_group.name}' is year {class_group.year}"
                 )
-        
+
+        # Validate the slot is free for both the teacher and the class group
+        instance = self.instance
+        slot = {
+            field: data.get(field, getattr(instance, field, None))
+            for field in ('class_group', 'date', 'start_time', 'end_time', 'recurring')
+        }
+        if slot['start_time'] and slot['end_time'] and slot['start_time'] >= slot['end_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        if all(slot[field] for field in ('class_group', 'date', 'start_time', 'end_time')):
+            clashes = conflicts.find_conflicts(
+                instance.teacher_id if instance else faculty_id, slot['class_group'].id, slot['date'],
+                slot['start_time'], slot['end_time'], bool(slot['recurring']),
+                exclude_id=instance.id if instance else None,
+            )
+            if clashes:
+                raise serializers.ValidationError(conflicts.describe(*clashes[0]))
+
         return data
     
     def create(self, validated_data):
@@ -208,6 +248,33 @@ class SessionSerializer(serializers.ModelSerializer):
         validated_data['teacher'] = faculty
         return super().create(validated_data)
 
+class SessionSpecSerializer(serializers.Serializer):
+    """One item of a bulk session creation request (field checks only; no queries)"""
+    subject_id = serializers.IntegerField()
+    class_group_id = serializers.IntegerField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    recurring = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        return data
+
+class AttendanceCorrectionSerializer(serializers.Serializer):
+    """Students (Student ids) to mark present or absent for one session (field checks only; no queries)"""
+    present = serializers.ListField(child=serializers.IntegerField(), default=list)
+    absent = serializers.ListField(child=serializers.IntegerField(), default=list)
+
+    def validate(self, data):
+        if not data['present'] and not data['absent']:
+            raise serializers.ValidationError("Nothing to correct: give present and/or absent student ids")
+        both = set(data['present']) & set(data['absent'])
+        if both:
+            raise serializers.ValidationError(f"Students both present and absent: {sorted(both)}")
+        return data
+
 class AttendanceSerializer(serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     session = SessionSerializer(read_only=True)
@@ -262,7 +329,8 @@ class AttendanceSerializer(serializers.ModelSerializer):
             })
         
         # Check for duplicate attendance
-        if Attendance.objects.filter(student=student, session=session).exists():
+        # session_date lets a partitioned table prune to the session's partition
+        if Attendance.objects.filter(student=student, session=session, session_date=session.date).exists():
             raise serializers.ValidationError({
                 'error': 'Attendance already marked',
                 'details': f"You have already marked attendance for this {session.subject.name} session.",
@@ -0,0 +1,121 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_migrate, m2m_changed
+from django.dispatch import receiver
+
+from . import partitioning, reference_cache, rollups, scheduler, slow_queries
+from .models import Subject, ClassGroup, Faculty, Session, Attendance
+
+
+# Reference cache invalidation
+
+@receiver(post_save, sender=Subject)
+def subject_saved(sender, instance, **kwargs):
+    # Cached class groups embed their subjects, so drop the ones holding this one
+    class_group_ids = ClassGroup.subjects.through.objects.filter(
+        subject_id=instance.id).values_list('classgroup_id', flat=True)
+    reference_cache.invalidate_subject(instance.id, class_group_ids)
+
+
+@receiver(pre_delete, sender=Subject)
+def subject_deleting(sender, instance, **kwargs):
+    # The class group links are gone by post_delete, so collect them here
+    instance._cached_class_group_ids = list(ClassGroup.subjects.through.objects.filter(
+        subject_id=instance.id).values_list('classgroup_id', flat=True))
+
+
+@receiver(post_delete, sender=Subject)
+def subject_deleted(sender, instance, **kwargs):
+    reference_cache.invalidate_subject(instance.id, getattr(instance, '_cached_class_group_ids', ()))
+
+
+@receiver(post_save, sender=ClassGroup)
+@receiver(post_delete, sender=ClassGroup)
+def class_group_changed(sender, instance, **kwargs):
+    reference_cache.invalidate_class_group(instance.id)
+
+
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Faculty)
+def faculty_changed(sender, instance, **kwargs):
+    reference_cache.invalidate_faculty(instance.id, instance.user_id)
+
+
+def _changed_pairs(instance, action, reverse, model, pk_set, field):
+    """(owner ids, subject ids) touched by an m2m change on ``<owner>.subjects``"""
+    if action == 'pre_clear':
+        # post_clear carries no pk_set, so remember what is about to go
+        if reverse:
+            instance._cleared_ids = set(getattr(instance, f'{field}_set').values_list('id', flat=True))
+        else:
+            instance._cleared_ids = set(instance.subjects.values_list('id', flat=True))
+        return None
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return None
+    ids = pk_set if pk_set is not None else getattr(instance, '_cleared_ids', set())
+    if reverse:
+        return ids, {instance.id}
+    return {instance.id}, ids
+
+
+@receiver(m2m_changed, sender=ClassGroup.subjects.through)
+def class_group_subjects_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    pairs = _changed_pairs(instance, action, reverse, model, pk_set, 'classgroup')
+    if pairs:
+        class_group_ids, subject_ids = pairs
+        for class_group_id in class_group_ids:
+            reference_cache.invalidate_class_group(class_group_id, subject_ids)
+
+
+@receiver(m2m_changed, sender=Faculty.subjects.through)
+def faculty_subjects_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    pairs = _changed_pairs(instance, action, reverse, model, pk_set, 'faculty')
+    if pairs:
+        faculty_ids, subject_ids = pairs
+        for faculty_id in faculty_ids:
+            reference_cache.invalidate_faculty(faculty_id, subject_ids=subject_ids)
+
+
+# Attendance rollups
+
+@receiver(post_save, sender=Attendance)
+def attendance_marked(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # After commit: check-ins of one session share a rollup row, and updating
+        # it inside each check-in transaction would queue them on its row lock.
+        # A failure is logged, not raised: the check-in is already committed and
+        # backfill_attendance_rollups repairs the rollups
+        transaction.on_commit(partial(rollups.record_check_in, instance), robust=True)
+
+
+@receiver(post_delete, sender=Session)
+def session_deleted(sender, instance, **kwargs):
+    rollups.refresh_after_commit(instance.subject_id, instance.class_group_id, instance.date)
+
+
+@receiver(post_save, sender=Session)
+def session_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Closing attendance settles the session's buckets
+    if not raw and not instance.active and update_fields and 'active' in update_fields:
+        rollups.record_session_closed(instance)
+    # New times or a manual start/stop change what the scheduler has queued;
+    # its own opening and closing do not
+    if not getattr(instance, 'saved_by_scheduler', False):
+        scheduler.notify()
+
+
+# Slow-query log (a no-op unless SLOW_QUERY_THRESHOLD_MS is set)
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    slow_queries.install(connection)
+
+
+# Partitioned attendance table (users/partitioning.py)
+
+@receiver(pre_migrate)
+def migrating(sender, plan=None, using='default', **kwargs):
+    if sender.name == 'users':
+        partitioning.guard_migrations(plan or [], using)
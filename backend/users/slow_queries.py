@@ -0,0 +1,173 @@
+"""Slow-query log.
+
+When ``SLOW_QUERY_THRESHOLD_MS`` is set, every database connection gets an
+execute wrapper that times each statement. Statements at or above the
+threshold are written as one JSON line to ``SLOW_QUERY_LOG`` with:
+
+* a fingerprint: the statement with literals, placeholders and IN/VALUES
+  lists collapsed, so the same ORM query with other ids groups together
+* the innermost calling frames in users/views.py and in a serializer module
+* the EXPLAIN plan, for the first occurrence of each fingerprint (shared
+  through the default cache, so across workers when that cache is)
+
+Parameters are never logged. ``manage.py slow_queries`` aggregates the log.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('users.slow_queries')
+
+_explaining = ContextVar('slow_query_explaining', default=False)
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s|\?')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_VALUES = re.compile(r'(\(\.\.\.\))(?:\s*,\s*\(\.\.\.\))+')
+_SPACES = re.compile(r'\s+')
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+
+
+def normalize(sql):
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _PLACEHOLDERS.sub('?', sql)
+    sql = _LISTS.sub('(...)', sql)
+    sql = _VALUES.sub(r'\1, ...', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    path = os.path.relpath(code.co_filename, os.path.dirname(PACKAGE_DIR))
+    return f"{path}:{frame.f_lineno} {getattr(code, 'co_qualname', code.co_name)}"
+
+
+def origin():
+    """(view frame, serializer frame) of the current call stack, innermost first"""
+    view = serializer = None
+    frame = sys._getframe(2)
+    while frame is not None and (view is None or serializer is None):
+        filename = frame.f_code.co_filename
+        if filename.startswith(PACKAGE_DIR):
+            name = os.path.basename(filename)
+            if view is None and name == 'views.py':
+                view = _frame_label(frame)
+            elif serializer is None and name in ('serializers.py', 'read_serializers.py'):
+                serializer = _frame_label(frame)
+        frame = frame.f_back
+    return view, serializer
+
+
+def explain(connection, sql, params):
+    token = _explaining.set(True)
+    try:
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+    except DatabaseError as e:
+        return f'EXPLAIN failed: {e}'
+    finally:
+        _explaining.reset(token)
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - started) * 1000
+    limit = threshold_ms()
+    if limit is not None and elapsed >= limit:
+        record(context['connection'], sql, params, many, elapsed)
+    return result
+
+
+def record(connection, sql, params, many, elapsed):
+    normalized = normalize(sql)
+    key = fingerprint(normalized)
+    view, serializer = origin()
+    plan = None
+    # EXPLAIN once per fingerprint, and only for reads
+    if (not many and normalized.lower().startswith(('select', 'with'))
+            and cache.add(f'slow-query-explained:{key}', True, None)):
+        plan = explain(connection, sql, params)
+    logger.warning(json.dumps({
+        'at': timezone.now().isoformat(),
+        'fingerprint': key,
+        'ms': round(elapsed, 2),
+        'database': connection.alias,
+        'sql': normalized,
+        'view': view,
+        'serializer': serializer,
+        'explain': plan,
+    }, separators=(',', ':')))
+
+
+def install(connection):
+    """Add the wrapper to a connection (connection_created receiver)"""
+    if threshold_ms() is not None and slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_wrapper)
+
+
+def read(path, since=None):
+    with open(path) as log:
+        for line in log:
+            line = line.strip()
+            if not line.startswith('{'):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Partly written line
+            if since is None or entry['at'] >= since.isoformat():
+                yield entry
+
+
+def report(entries, top=20, sort='total'):
+    """Fingerprints ranked by total/count/max/mean time, most expensive first"""
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': defaultdict(int),
+                                  'serializers': defaultdict(int), 'explain': None})
+    for entry in entries:
+        group = groups[entry['fingerprint']]
+        group['fingerprint'] = entry['fingerprint']
+        group['sql'] = entry['sql']
+        group['count'] += 1
+        group['total_ms'] += entry['ms']
+        group['max_ms'] = max(group['max_ms'], entry['ms'])
+        group['last_seen'] = max(group.get('last_seen', ''), entry['at'])
+        group['views'][entry['view']] += 1
+        group['serializers'][entry['serializer']] += 1
+        if entry.get('explain'):
+            group['explain'] = entry['explain']
+
+    rows = []
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+        group['views'] = sorted(group['views'].items(), key=lambda item: -item[1])
+        group['serializers'] = sorted(group['serializers'].items(), key=lambda item: -item[1])
+        rows.append(group)
+    rows.sort(key=lambda group: -group[f'{sort}_ms' if sort != 'count' else 'count'])
+    return rows[:top]
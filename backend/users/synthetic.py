@@ -0,0 +1,265 @@
+"""Reproducible institution-scale test data.
+
+Everything is derived from one seed and inserted with ``bulk_create``:
+
+* subjects per year, and per (department, year) a core of 5 subjects with
+  class groups adding 2 electives each, so curricula overlap the way real
+  departments do
+* faculty covering every subject
+* students in class groups of about ``group_size``
+* one term of dated sessions laid out on the weekly grid without teacher or
+  class group clashes (users/timetable.py)
+* attendance for every session, each student having their own attendance
+  rate so some of them end up below the defaulter threshold
+
+All usernames, user ids and subject codes start with ``prefix`` so a
+dataset can be told apart from real data and removed with ``delete``.
+"""
+import hashlib
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import timetable
+from .models import Attendance, ClassGroup, Faculty, Session, Student, Subject, User
+from .terms import term_bounds
+
+DEPARTMENTS = [code for code, _ in ClassGroup.DEPARTMENT_CHOICES]
+SECTIONS = [code for code, _ in ClassGroup.SECTION_CHOICES]
+YEARS = [year for year, _ in ClassGroup.YEAR_CHOICES]
+FACULTY_ROLES = [role for role, _ in Faculty.ROLE_CHOICES]
+CORE_SUBJECTS = 5
+ELECTIVES = 2
+
+
+@dataclass
+class Config:
+    seed: int = 0
+    prefix: str = 'syn'
+    students: int = 20000
+    faculty: int = 500
+    subjects_per_year: int = 16
+    group_size: int = 60
+    term_start: object = None  # Any day in the term; default: the previous term
+    weeks: int = None  # Default: the whole term
+    attendance_rate: float = 0.82
+    batch_size: int = 5000
+    solve_attempts: int = 200  # Timetable search passes when the first does not place every lecture
+    password: str = 'synthetic123'
+
+
+def subjects_hash(subject_ids):
+    """Same hash as ClassGroup/Student.generate_subjects_hash"""
+    return hashlib.sha256('-'.join(sorted(str(i) for i in subject_ids)).encode()).hexdigest()
+
+
+class Generator:
+    def __init__(self, config, report=None):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.numpy = np.random.default_rng(config.seed)
+        self.report = report or (lambda step, rows, seconds: None)
+        self.password = make_password(config.password)  # Hashed once, shared by every account
+
+    def _timed(self, step, build):
+        started = time.perf_counter()
+        rows = build()
+        self.report(step, rows, time.perf_counter() - started)
+        return rows
+
+    def _bulk(self, model, objects):
+        return model.objects.bulk_create(objects, batch_size=self.config.batch_size)
+
+    def _users(self, role, count, tag):
+        prefix = self.config.prefix
+        return self._bulk(User, [
+            User(username=f'{prefix}_{tag}{n:06d}', user_id=f'{prefix}{tag}{n:06d}'.upper(), role=role,
+                 first_name=f'{tag.upper()}{n}', last_name=prefix.capitalize(),
+                 email=f'{prefix}_{tag}{n:06d}@example.com', password=self.password)
+            for n in range(count)
+        ])
+
+    def subjects(self):
+        prefix = self.config.prefix.upper()
+        self.subjects_by_year = {}
+        for year in YEARS:
+            self.subjects_by_year[year] = [subject.id for subject in self._bulk(Subject, [
+                Subject(name=f'{prefix} Subject {year}.{n:02d}', code=f'{prefix}{year}{n:02d}', year=year)
+                for n in range(self.config.subjects_per_year)
+            ])]
+        return sum(len(ids) for ids in self.subjects_by_year.values())
+
+    def class_groups(self):
+        """Groups per (department, year, section): shared core plus distinct electives"""
+        groups_needed = max(1, -(-self.config.students // self.config.group_size))
+        placements = list(itertools.product(YEARS, DEPARTMENTS, SECTIONS))
+        curricula = []
+        for n in range(groups_needed):
+            year, department, section = placements[n % len(placements)]
+            curricula.append((year, department, section))
+
+        self.group_subjects = []
+        objects = []
+        used = set()
+        for year, department, section in curricula:
+            pool = self.subjects_by_year[year]
+            # Core subjects depend on the department only; departments overlap in the pool
+            offset = DEPARTMENTS.index(department) * 3
+            core = [pool[(offset + i) % len(pool)] for i in range(CORE_SUBJECTS)]
+            others = [s for s in pool if s not in core]
+            for _ in range(50):
+                chosen = core + self.random.sample(others, ELECTIVES)
+                key = (department, section, year, subjects_hash(chosen))
+                if key not in used:
+                    break
+            else:
+                continue  # No unused elective pair left for this placement
+            used.add(key)
+            self.group_subjects.append(chosen)
+            objects.append(ClassGroup(year=year, department=department, section=section, subjects_hash=key[3]))
+        self.groups = self._bulk(ClassGroup, objects)
+        through = ClassGroup.subjects.through
+        self._bulk(through, [through(classgroup_id=group.id, subject_id=subject_id)
+                             for group, subject_ids in zip(self.groups, self.group_subjects)
+                             for subject_id in subject_ids])
+        return len(self.groups)
+
+    def faculty(self):
+        users = self._users('faculty', self.config.faculty, 'f')
+        self.faculty_ids = [f.id for f in self._bulk(Faculty, [
+            Faculty(user_id=user.id, role=self.random.choice(FACULTY_ROLES)) for user in users
+        ])]
+        # Every subject gets at least one teacher; each teacher takes 3-5 subjects of one or two years
+        all_subjects = [s for ids in self.subjects_by_year.values() for s in ids]
+        teaches = {faculty_id: set() for faculty_id in self.faculty_ids}
+        for n, subject_id in enumerate(all_subjects):
+            teaches[self.faculty_ids[n % len(self.faculty_ids)]].add(subject_id)
+        for faculty_id in self.faculty_ids:
+            year = self.random.choice(YEARS)
+            extra = self.random.randint(3, 5) - len(teaches[faculty_id])
+            if extra > 0:
+                teaches[faculty_id].update(self.random.sample(self.subjects_by_year[year], extra))
+        through = Faculty.subjects.through
+        self._bulk(through, [through(faculty_id=faculty_id, subject_id=subject_id)
+                             for faculty_id, subject_ids in teaches.items() for subject_id in sorted(subject_ids)])
+        self.teachers_of = {}
+        for faculty_id, subject_ids in teaches.items():
+            for subject_id in subject_ids:
+                self.teachers_of.setdefault(subject_id, []).append(faculty_id)
+        return len(self.faculty_ids)
+
+    def students(self):
+        users = self._users('student', self.config.students, 's')
+        objects = []
+        for n, user in enumerate(users):
+            group = self.groups[n % len(self.groups)]
+            objects.append(Student(user_id=user.id, department=group.department, section=group.section,
+                                   year=group.year, class_group_id=group.id, subjects_hash=group.subjects_hash))
+        students = self._bulk(Student, objects)
+        subjects_of_group = {group.id: ids for group, ids in zip(self.groups, self.group_subjects)}
+        through = Student.subjects.through
+        self._bulk(through, [through(student_id=s.id, subject_id=subject_id)
+                             for s in students for subject_id in subjects_of_group[s.class_group_id]])
+        self.members = {}
+        for s in students:
+            self.members.setdefault(s.class_group_id, []).append(s.id)
+        # Per-student attendance rate, so the percentages spread out realistically
+        self.rates = dict(zip(
+            (s.id for s in students),
+            np.clip(self.numpy.normal(self.config.attendance_rate, 0.12, len(students)), 0.2, 1.0),
+        ))
+        return len(students)
+
+    def sessions(self):
+        """Dated sessions for every week of the term, from one clash-free weekly plan"""
+        term_start, term_end = self.term
+        lectures = []
+        load = {}
+        for group, subject_ids in zip(self.groups, self.group_subjects):
+            for subject_id in subject_ids:
+                teacher = min(self.teachers_of[subject_id], key=lambda t: (load.get(t, 0), t))
+                load[teacher] = load.get(teacher, 0) + timetable.lectures_per_week()
+                lectures.extend([(group.id, subject_id, teacher)] * timetable.lectures_per_week())
+        cells = [(day, slot) for day in timetable.weekdays() for slot in range(len(timetable.slots()))]
+        # An attempt cap rather than a time budget keeps the plan a function of the seed
+        plan = timetable.solve('all', lectures, cells, set(), set(), budget=None, seed=self.config.seed,
+                               max_attempts=self.config.solve_attempts)
+        self.unplaced = len(plan['unplaced'])
+
+        grid = timetable.slots()
+        monday = term_start - timedelta(days=term_start.weekday())
+        weeks = -(-(term_end - monday).days // 7)
+        if self.config.weeks:
+            weeks = min(weeks, self.config.weeks)
+        objects = []
+        for week in range(weeks):
+            for group_id, subject_id, teacher_id, day, slot in plan['placed']:
+                date = monday + timedelta(weeks=week, days=day)
+                if term_start <= date < term_end:
+                    objects.append(Session(teacher_id=teacher_id, subject_id=subject_id, class_group_id=group_id,
+                                           date=date, start_time=grid[slot][0], end_time=grid[slot][1]))
+        self.session_rows = [(s.id, s.teacher_id, s.subject_id, s.class_group_id, s.date, s.start_time)
+                             for s in self._bulk(Session, objects)]
+        return len(self.session_rows)
+
+    def attendance(self):
+        tz = timezone.get_current_timezone()
+        pending, total = [], 0
+        for session_id, teacher_id, subject_id, group_id, date, start_time in self.session_rows:
+            members = self.members.get(group_id, [])
+            if not members:
+                continue
+            rates = np.fromiter((self.rates[m] for m in members), dtype=float, count=len(members))
+            present = np.flatnonzero(self.numpy.random(len(members)) < rates)
+            marked = timezone.make_aware(datetime.combine(date, start_time), tz)
+            for index in present:
+                pending.append(Attendance(
+                    student_id=members[index], session_id=session_id, marked_at=marked + timedelta(seconds=int(index)),
+                    subject_id=subject_id, class_group_id=group_id, teacher_id=teacher_id, session_date=date,
+                ))
+            if len(pending) >= self.config.batch_size:
+                self._bulk(Attendance, pending)
+                total += len(pending)
+                pending = []
+        if pending:
+            self._bulk(Attendance, pending)
+            total += len(pending)
+        return total
+
+    def run(self):
+        config = self.config
+        if config.term_start:
+            self.term = term_bounds(config.term_start)
+        else:
+            self.term = term_bounds(term_bounds()[0] - timedelta(days=1))
+        steps = [('subjects', self.subjects), ('class groups', self.class_groups), ('faculty', self.faculty),
+                 ('students', self.students), ('sessions', self.sessions), ('attendance', self.attendance)]
+        counts = {}
+        for step, build in steps:
+            with transaction.atomic():
+                counts[step] = self._timed(step, build)
+        return counts
+
+
+def exists(prefix):
+    return User.objects.filter(username__startswith=f'{prefix}_').exists()
+
+
+def delete(prefix):
+    """Remove a generated dataset; returns the number of users removed"""
+    code = prefix.upper()
+    with transaction.atomic():
+        # Largest tables first, as plain DELETEs rather than cascades
+        Attendance.objects.filter(subject__code__startswith=code).delete()
+        Session.objects.filter(subject__code__startswith=code).delete()
+        ClassGroup.objects.filter(id__in=ClassGroup.subjects.through.objects.filter(
+            subject__code__startswith=code).values('classgroup_id')).delete()
+        Subject.objects.filter(code__startswith=code).delete()
+        return User.objects.filter(username__startswith=f'{prefix}_').delete()[1].get('users.User', 0)
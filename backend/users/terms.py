@@ -0,0 +1,62 @@
+"""Academic term and partition date ranges.
+
+Terms start on the first day of each month listed in
+``settings.ATTENDANCE_TERM_START_MONTHS`` and run until the next one starts.
+All ranges are half-open: ``start <= day < end``.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def _start_months():
+    return sorted(getattr(settings, 'ATTENDANCE_TERM_START_MONTHS', [1, 7]))
+
+
+def term_bounds(day=None):
+    """Return (start, end) of the term containing ``day`` (today by default)"""
+    day = day or timezone.localdate()
+    months = _start_months()
+    earlier = [m for m in months if m <= day.month]
+    if earlier:
+        start = date(day.year, earlier[-1], 1)
+    else:
+        start = date(day.year - 1, months[-1], 1)
+    return start, next_term_start(start)
+
+
+def next_term_start(start):
+    months = _start_months()
+    later = [m for m in months if m > start.month]
+    if later:
+        return date(start.year, later[0], 1)
+    return date(start.year + 1, months[0], 1)
+
+
+def month_bounds(day=None):
+    day = day or timezone.localdate()
+    start = day.replace(day=1)
+    if start.month == 12:
+        return start, date(start.year + 1, 1, 1)
+    return start, date(start.year, start.month + 1, 1)
+
+
+def partition_bounds(day=None, granularity=None):
+    """Bounds of the attendance partition holding ``day``"""
+    granularity = granularity or getattr(settings, 'ATTENDANCE_PARTITION_BY', 'term')
+    if granularity == 'month':
+        return month_bounds(day)
+    if granularity == 'term':
+        return term_bounds(day)
+    raise ValueError(f"Unknown partition granularity '{granularity}'")
+
+
+def upcoming_partitions(day=None, ahead=2, granularity=None):
+    """The partition holding ``day`` followed by the next ``ahead`` ones"""
+    start, end = partition_bounds(day, granularity)
+    bounds = [(start, end)]
+    for _ in range(ahead):
+        start, end = partition_bounds(end, granularity)
+        bounds.append((start, end))
+    return bounds
@@ -1,3 +1,799 @@
-from django.test import TestCase
+import json
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import (admission, archive, conflicts, db_routing, eligibility, events, idempotency, integrity,
+               reference_cache, rollups, scheduler, slow_queries)
+from .models import (User, Student, Faculty, Subject, ClassGroup, Session, Attendance, AttendanceEvent,
+                     AttendanceRollup, TermEligibility)
+from .serializers import (UserSerializer, SubjectSerializer, SessionSerializer, AttendanceSerializer,
+                          CachedPrimaryKeyRelatedField)
+from .terms import term_bounds
+
+
+class ProjectionContractTests(TestCase):
+    """The values()-based list endpoints must render exactly what the ModelSerializers render"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subjects = [Subject.objects.create(name=f'Subject  {i}', code=f'S{i:02d}', year=2) for i in range(9)]
+        cls.subjects.append(Subject.objects.create(name='Other year', code='Y3', year=3))
+
+        faculty_user = User.objects.create_user('faculty', password='pw', role='faculty', first_name='Fé')
+        cls.faculty = Faculty.objects.create(user=faculty_user, role='professor')
+        cls.faculty.subjects.set(cls.subjects[5:0:-2])
+
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.group.subjects.set(cls.subjects[6::-1])
+        cls.group.save()
+
+        cls.students = []
+        for i in range(3):
+            user = User.objects.create_user(f'student{i}', password='pw', role='student')
+            student = Student.objects.create(user=user, department='CSE', section='A', year=2,
+                                             class_group=cls.group if i else None)
+            student.subjects.set(cls.subjects[:7])
+            student.save()
+            cls.students.append(student)
+        User.objects.create_user('admin', password='pw', role='admin')
+
+        today = timezone.localdate()
+        term_start = term_bounds()[0]
+        cls.sessions = [
+            Session.objects.create(teacher=cls.faculty, subject=cls.subjects[i % 3 * 2 + 1], class_group=cls.group,
+                                   start_time=time(9 + i, 0, 0, 1500 * i), end_time=time(10 + i, 30),
+                                   date=max(today - timedelta(days=i % 2), term_start), recurring=bool(i % 2), qr_code=f'qr-{i}')
+            for i in range(4)
+        ]
+        for session in cls.sessions:
+            for student in cls.students[:2]:
+                Attendance.objects.create(student=student, session=session)
+
+    def setUp(self):
+        reference_cache.clear()
+
+    def get(self, username, path):
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username=username))
+        response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_subject_list(self):
+        expected = SubjectSerializer(Subject.objects.order_by('year', 'code'), many=True).data
+        self.assertEqual(self.get('admin', '/api/subjects/'), self.render(expected))
+        expected = SubjectSerializer(Subject.objects.filter(year=3), many=True).data
+        self.assertEqual(self.get('admin', '/api/subjects/?year=3'), self.render(expected))
+
+    def test_session_list(self):
+        sessions = Session.objects.filter(teacher=self.faculty).order_by('-date', '-start_time')
+        expected = SessionSerializer(sessions, many=True).data
+        self.assertEqual(self.get('faculty', '/api/sessions/'), self.render(expected))
+        expected = SessionSerializer(sessions.filter(class_group=self.group), many=True).data
+        self.assertEqual(self.get('student1', '/api/sessions/'), self.render(expected))
+
+    def test_my_attendance(self):
+        for student in self.students[:2]:
+            records = Attendance.objects.filter(student=student).order_by('-session_date', '-session__start_time')
+            expected = AttendanceSerializer(records, many=True).data
+            self.assertEqual(self.get(student.user.username, '/api/attendance/my-attendance/'), self.render(expected))
+
+    def test_my_attendance_with_archive(self):
+        old = Session.objects.create(teacher=self.faculty, subject=self.subjects[1], class_group=self.group,
+                                     start_time=time(8), end_time=time(9), date=date(2020, 1, 6))
+        Attendance.objects.create(student=self.students[1], session=old)
+        archive.compact(date(2021, 1, 1))
+
+        student = self.students[1]
+        records = list(Attendance.objects.filter(student=student)) + archive.archived_attendance_for(student)
+        records.sort(key=lambda a: (a.session.date, a.session.start_time), reverse=True)
+        expected = AttendanceSerializer(records, many=True).data
+        self.assertEqual(self.get('student1', '/api/attendance/my-attendance/?term=all'), self.render(expected))
+        self.assertEqual(self.get('student1', '/api/attendance/my-attendance/'), self.render(expected))
+
+        expected = AttendanceSerializer([record for record in records if record.session_id != old.id], many=True).data
+        self.assertEqual(self.get('student1', '/api/attendance/my-attendance/?term=current'), self.render(expected))
+
+        expected = AttendanceSerializer(archive.archived_attendance_for(student), many=True).data
+        self.assertEqual(self.get('student1', '/api/attendance/my-attendance/?term=2020-01-06'), self.render(expected))
+
+    def test_attendance_list_terms(self):
+        old = Session.objects.create(teacher=self.faculty, subject=self.subjects[1], class_group=self.group,
+                                     start_time=time(8), end_time=time(9), date=date(2020, 1, 6))
+        old_record = Attendance.objects.create(student=self.students[1], session=old)
+        ids = lambda content: {record['id'] for record in json.loads(content)}
+
+        everything = ids(self.get('faculty', '/api/attendance/'))
+        self.assertEqual(everything, set(Attendance.objects.values_list('id', flat=True)))
+        self.assertEqual(ids(self.get('faculty', '/api/attendance/?term=all')), everything)
+        self.assertEqual(ids(self.get('faculty', '/api/attendance/?term=current')), everything - {old_record.id})
+        self.assertEqual(ids(self.get('faculty', '/api/attendance/?term=2020-02-01')), {old_record.id})
+
+        client = APIClient()
+        client.force_authenticate(self.faculty.user)
+        self.assertEqual(client.get('/api/attendance/?term=last').status_code, 400)
+
+    def test_user_management(self):
+        expected = UserSerializer(User.objects.all(), many=True).data
+        self.assertEqual(self.get('admin', '/api/users/'), self.render(expected))
+        self.assertEqual(self.get('faculty', '/api/users/'), b'[]')
+
+
+class MarkAttendanceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='pw', role='student')
+        cls.student = Student.objects.create(user=cls.user, department='CSE', section='A', year=2)
+        subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        cls.student.subjects.set([subject])
+        faculty = Faculty.objects.create(user=User.objects.create_user('faculty', password='pw', role='faculty'),
+                                         role='professor')
+        group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.sessions = [
+            Session.objects.create(teacher=faculty, subject=subject, class_group=group, start_time=time(9 + i),
+                                   end_time=time(10 + i), date=timezone.localdate(), active=True, qr_code=f'qr-{i}')
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bad_session_id(self):
+        for session_id in ('abc', None, [1]):
+            response = self.client.post('/api/mark-attendance/', {'session_id': session_id, 'qr_code': 'x'},
+                                        format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': 'session_id must be a number'})
+
+    def test_check_in_paths(self):
+        # attendance/ takes a check-in too, with the same rules and event log entry as mark-attendance/
+        for path, session in zip(('/api/mark-attendance/', '/api/attendance/'), self.sessions):
+            response = self.client.post(path, {'session_id': session.id, 'qr_code': 'wrong'}, format='json')
+            self.assertEqual(response.status_code, 400)
+            response = self.client.post(path, {'session_id': session.id, 'qr_code': session.qr_code}, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertTrue(AttendanceEvent.objects.filter(
+                kind=AttendanceEvent.CHECK_IN, session_id=session.id, student_id=self.student.id).exists())
+        self.assertEqual(Attendance.objects.filter(student=self.student).count(), 2)
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        faculty_user = User.objects.create_user('faculty', password='pw', role='faculty')
+        cls.faculty = Faculty.objects.create(user=faculty_user, role='professor')
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.group.subjects.set([cls.subject])
+        cls.group.save()
+        user = User.objects.create_user('student', password='pw', role='student')
+        cls.student = Student.objects.create(user=user, department='CSE', section='A', year=2, class_group=cls.group)
+        cls.student.subjects.set([cls.subject])
+
+    def session(self, day, hour=9):
+        return Session.objects.create(teacher=self.faculty, subject=self.subject, class_group=self.group,
+                                      start_time=time(hour), end_time=time(hour + 1), date=day)
+
+    def day_bucket(self, day):
+        return AttendanceRollup.objects.get(period='day', bucket_start=day, subject=self.subject,
+                                            class_group=self.group)
+
+    def test_check_in_and_session_delete(self):
+        today = timezone.localdate()
+        first, second = self.session(today), self.session(today, 11)
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.create(student=self.student, session=first)
+        self.assertEqual((self.day_bucket(today).sessions, self.day_bucket(today).present), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual((self.day_bucket(today).sessions, self.day_bucket(today).present), (1, 1))
+
+    def test_cascaded_delete_skips_deleted_groups(self):
+        today = timezone.localdate()
+        self.session(today)
+        self.session(today - timedelta(days=1))
+        rollups.backfill(today - timedelta(days=1))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ClassGroup.objects.filter(id=self.group.id).delete()
+        self.assertEqual(len(callbacks), 2)
+        self.assertFalse(AttendanceRollup.objects.exists())
+
+    def test_backfill_rebuilds_whole_weeks(self):
+        monday = date(2025, 1, 6)
+        for offset in range(5):
+            self.session(monday + timedelta(days=offset))
+        rollups.backfill(monday, until=monday + timedelta(days=1))
+        week = AttendanceRollup.objects.get(period='week', bucket_start=monday)
+        self.assertEqual(week.sessions, 5)
+
+
+class IdempotencyTests(TestCase):
+    path = '/api/mark-attendance/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='pw', role='student')
+        Student.objects.create(user=cls.user, department='CSE', section='A', year=2)
+
+    def setUp(self):
+        caches['idempotency'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, session_id, key='key-1', token='Bearer a'):
+        return self.client.post(self.path, {'session_id': session_id, 'qr_code': 'x'}, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key, HTTP_AUTHORIZATION=token)
+
+    def test_replay(self):
+        first = self.post('abc')
+        self.assertEqual(first.status_code, 400)
+        self.assertFalse(first.has_header('Idempotent-Replayed'))
+        retry = self.post('abc')
+        self.assertEqual((retry.status_code, retry.content), (400, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+
+    def test_different_body(self):
+        self.post('abc')
+        self.assertEqual(self.post('xyz').status_code, 422)
+
+    def test_in_progress(self):
+        request = RequestFactory().post(self.path, HTTP_IDEMPOTENCY_KEY='key-1', HTTP_AUTHORIZATION='Bearer a')
+        caches['idempotency'].add(idempotency.request_key(request), idempotency._IN_PROGRESS)
+        response = self.post('abc')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_scoped_to_caller(self):
+        self.post('abc')
+        other = self.post('xyz', token='Bearer b')
+        self.assertEqual(other.status_code, 400)
+        self.assertFalse(other.has_header('Idempotent-Replayed'))
+
+
+class AttendanceCorrectionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        faculty_user = User.objects.create_user('faculty', password='pw', role='faculty')
+        cls.faculty = Faculty.objects.create(user=faculty_user, role='professor')
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.group.subjects.set([cls.subject])
+        cls.group.save()
+        cls.students = []
+        for i in range(4):
+            user = User.objects.create_user(f'student{i}', password='pw', role='student')
+            student = Student.objects.create(user=user, department='CSE', section='A', year=2,
+                                             class_group=cls.group if i < 3 else None)
+            student.subjects.set([cls.subject])
+            cls.students.append(student)
+        cls.session = Session.objects.create(teacher=cls.faculty, subject=cls.subject, class_group=cls.group,
+                                             start_time=time(9), end_time=time(10), date=timezone.localdate())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.faculty.user)
+        Attendance.objects.create(student=self.students[0], session=self.session)
+
+    def correct(self, present=(), absent=()):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(f'/api/sessions/{self.session.id}/attendance/',
+                                    {'present': [s.id for s in present], 'absent': [s.id for s in absent]},
+                                    format='json')
+
+    def marked(self):
+        return set(Attendance.objects.filter(session=self.session).values_list('student_id', flat=True))
+
+    def events(self, kind):
+        return set(AttendanceEvent.objects.filter(kind=kind).values_list('student_id', flat=True))
+
+    def present_count(self):
+        return AttendanceRollup.objects.get(period='day', bucket_start=self.session.date, subject=self.subject,
+                                            class_group=self.group).present
+
+    def test_add_and_remove(self):
+        first, second, third = self.students[:3]
+        response = self.correct(present=[first, second], absent=[third])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['marked_present'], [second.id])
+        self.assertEqual(response.data['marked_absent'], [])
+        self.assertEqual(response.data['unchanged'], 2)
+        self.assertEqual(self.marked(), {first.id, second.id})
+        self.assertEqual(self.events(AttendanceEvent.MARKED), {second.id})
+        self.assertEqual(self.present_count(), 2)
+
+        response = self.correct(absent=[first])
+        self.assertEqual(response.data['marked_absent'], [first.id])
+        self.assertEqual(self.marked(), {second.id})
+        self.assertEqual(self.events(AttendanceEvent.UNMARKED), {first.id})
+        self.assertEqual(self.present_count(), 1)
+
+    def test_no_op(self):
+        response = self.correct(present=[self.students[0]], absent=[self.students[1]])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['marked_present'], response.data['marked_absent']), ([], []))
+        self.assertEqual(response.data['unchanged'], 2)
+        self.assertFalse(AttendanceEvent.objects.filter(kind__in=[AttendanceEvent.MARKED,
+                                                                  AttendanceEvent.UNMARKED]).exists())
+
+    def test_not_on_roster(self):
+        response = self.correct(present=[self.students[1], self.students[3]])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.students[3].id), response.data['details'])
+        self.assertEqual(self.marked(), {self.students[0].id})
+        self.assertEqual(self.correct().status_code, 400)
+
+
+class SchedulerTests(TestCase):
+    day = date(2025, 3, 12)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        faculty_user = User.objects.create_user('faculty', password='pw', role='faculty')
+        cls.faculty = Faculty.objects.create(user=faculty_user, role='professor')
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+
+    def session(self, day, recurring=False):
+        return Session.objects.create(teacher=self.faculty, subject=self.subject, class_group=self.group,
+                                      start_time=time(9), end_time=time(10), date=day, recurring=recurring)
+
+    def at(self, hour, minute=0, day=None):
+        return timezone.make_aware(datetime.combine(day or self.day, time(hour, minute)))
+
+    def test_activate_and_close(self):
+        session = self.session(self.day)
+        runner = scheduler.Scheduler()
+        runner.load(self.at(8))
+        self.assertEqual(runner.next_at(), self.at(9))
+
+        self.assertEqual(runner.run_due(self.at(9)), [(scheduler.ACTIVATE, session.id, True)])
+        session.refresh_from_db()
+        self.assertTrue(session.active)
+        self.assertTrue(session.qr_code)
+
+        closes_at = self.at(10) + scheduler.grace()
+        self.assertEqual(runner.run_due(closes_at), [(scheduler.CLOSE, session.id, True)])
+        session.refresh_from_db()
+        self.assertFalse(session.active)
+
+        # Closed for the day: a reload does not reopen it
+        runner.load(self.at(9, 30))
+        self.assertIsNone(runner.next_at())
+
+    def test_recurring_session_opens_every_week(self):
+        session = self.session(self.day - timedelta(days=14), recurring=True)
+        events.append(AttendanceEvent.SESSION_STOPPED, session)
+        AttendanceEvent.objects.update(occurred_at=self.at(10, day=self.day - timedelta(days=7)))
+        runner = scheduler.Scheduler()
+        runner.load(self.at(8))
+        self.assertEqual(runner.run_due(self.at(9)), [(scheduler.ACTIVATE, session.id, True)])
+
+        # Stopped by hand today: not reopened today
+        self.assertTrue(scheduler.close(session.id))
+        AttendanceEvent.objects.filter(occurred_at__gt=self.at(10)).update(occurred_at=self.at(9, 15))
+        runner.load(self.at(9, 30))
+        self.assertIsNone(runner.next_at())
+
+    def test_own_saves_do_not_wake_the_scheduler(self):
+        session = self.session(self.day)
+        runner = scheduler._running = scheduler.Scheduler()
+        self.addCleanup(setattr, scheduler, '_running', None)
+        scheduler.activate(session.id)
+        scheduler.close(session.id)
+        self.assertFalse(runner.wake.is_set())
+        session.save()
+        self.assertTrue(runner.wake.is_set())
+
+
+class ReferenceCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'S{i:02d}', year=2) for i in range(3)]
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.group.subjects.set(cls.subjects[:2])
+        faculty_user = User.objects.create_user('faculty', password='pw', role='faculty')
+        cls.faculty = Faculty.objects.create(user=faculty_user, role='professor')
+        cls.faculty.subjects.set(cls.subjects[:1])
+
+    def setUp(self):
+        reference_cache.clear()
+
+    def test_subject_save_and_delete(self):
+        subject = self.subjects[0]
+        self.assertEqual(reference_cache.get_subject(subject.id).name, 'Subject 0')
+        self.assertEqual(len(reference_cache.get_class_group(self.group.id).subjects.all()), 2)
+        subject.name = 'Renamed'
+        subject.save()
+        self.assertEqual(reference_cache.get_subject(subject.id).name, 'Renamed')
+        self.assertIn('Renamed', [s.name for s in reference_cache.get_class_group(self.group.id).subjects.all()])
+
+        subject.delete()
+        self.assertIsNone(reference_cache.get_subject(subject.id))
+        self.assertEqual(len(reference_cache.get_class_group(self.group.id).subjects.all()), 1)
+        self.assertEqual(reference_cache.faculty_subject_ids(self.faculty.id), frozenset())
+
+    def test_class_group_subjects_changed(self):
+        first, second, third = self.subjects
+        self.assertEqual(reference_cache.class_group_subject_ids(self.group.id), {first.id, second.id})
+        self.assertEqual(reference_cache.subject_class_group_ids([third.id]), frozenset())
+        self.group.subjects.add(third)
+        self.assertEqual(reference_cache.class_group_subject_ids(self.group.id), {first.id, second.id, third.id})
+        self.assertEqual(reference_cache.subject_class_group_ids([third.id]), {self.group.id})
+        first.classgroup_set.remove(self.group)
+        self.assertEqual(reference_cache.class_group_subject_ids(self.group.id), {second.id, third.id})
+        self.group.subjects.clear()
+        self.assertEqual(reference_cache.class_group_subject_ids(self.group.id), frozenset())
+        self.assertEqual(reference_cache.subject_class_group_ids([second.id]), frozenset())
+
+    def test_faculty_subjects_changed(self):
+        first, second, _ = self.subjects
+        self.assertEqual(reference_cache.faculty_id_for_user(self.faculty.user_id), self.faculty.id)
+        self.assertEqual(reference_cache.faculty_subject_ids(self.faculty.id), {first.id})
+        self.faculty.subjects.add(second)
+        self.assertEqual(reference_cache.faculty_subject_ids(self.faculty.id), {first.id, second.id})
+        self.assertEqual(reference_cache.subject_faculty_ids([second.id]), {self.faculty.id})
+        second.faculty_set.clear()
+        self.assertEqual(reference_cache.faculty_subject_ids(self.faculty.id), {first.id})
+        self.assertEqual(reference_cache.subject_faculty_ids([second.id]), frozenset())
+
+        user_id = self.faculty.user_id
+        self.faculty.delete()
+        self.assertIsNone(reference_cache.faculty_id_for_user(user_id))
+
+    def test_cached_primary_key_field(self):
+        field = CachedPrimaryKeyRelatedField(queryset=Subject.objects.all(), loader=reference_cache.get_subject)
+        subject = self.subjects[0]
+        for value in (subject.id, str(subject.id), float(subject.id)):
+            self.assertEqual(field.to_internal_value(value), subject)
+        for value in (True, subject.id + 0.5, 'abc', None, 10 ** 6):
+            with self.assertRaises(serializers.ValidationError):
+                field.to_internal_value(value)
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    # Not TestCase: its wrapping transaction keeps every read on the primary
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('student', password='pw', role='student')
+        student = Student.objects.create(user=self.user, department='CSE', section='A', year=2)
+        subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        student.subjects.set([subject])
+        faculty = Faculty.objects.create(user=User.objects.create_user('faculty', password='pw', role='faculty'),
+                                         role='professor')
+        group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        self.session = Session.objects.create(teacher=faculty, subject=subject, class_group=group,
+                                              start_time=time(9), end_time=time(10), date=timezone.localdate(),
+                                              active=True, qr_code='qr')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request(self, method, path, data=None):
+        """(response, whether any read was routed to a replica); the replica is stood in for by default"""
+        routed = []
+        with override_settings(DATABASE_REPLICAS=['replica1']), mock.patch.object(
+                db_routing.random, 'choice', side_effect=lambda replicas: routed.append(replicas) or 'default'):
+            response = getattr(self.client, method)(path, data, format='json')
+        return response, bool(routed)
+
+    def test_reads_use_replica_until_a_write(self):
+        response, replica = self.request('get', '/api/attendance/')
+        self.assertEqual((response.status_code, replica), (200, True))
+
+        response, replica = self.request('post', '/api/mark-attendance/',
+                                         {'session_id': self.session.id, 'qr_code': 'qr'})
+        self.assertEqual((response.status_code, replica), (201, False))
+        self.assertTrue(db_routing.is_pinned(self.user.id))
+
+        # Reading your own write stays on the primary while pinned
+        response, replica = self.request('get', '/api/attendance/')
+        self.assertEqual((response.status_code, replica), (200, False))
+        self.assertEqual(len(response.data), 1)
+
+        caches['default'].delete(db_routing._pin_key(self.user.id))
+        self.assertTrue(self.request('get', '/api/attendance/')[1])
+
+    def test_failed_write_does_not_pin(self):
+        response, _ = self.request('post', '/api/mark-attendance/', {'session_id': self.session.id, 'qr_code': 'x'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(db_routing.is_pinned(self.user.id))
+
+    def test_router(self):
+        router = db_routing.PrimaryReplicaRouter()
+        with override_settings(DATABASE_REPLICAS=['replica1']):
+            self.assertEqual(router.db_for_read(Attendance), 'default')
+            token = db_routing._read_from_replica.set(True)
+            try:
+                self.assertEqual(router.db_for_read(Attendance), 'replica1')
+                self.assertEqual(router.db_for_write(Attendance), 'default')
+            finally:
+                db_routing._read_from_replica.reset(token)
+
+
+class EligibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'S{i:02d}', year=2) for i in range(2)]
+        faculty = Faculty.objects.create(user=User.objects.create_user('faculty', password='pw', role='faculty'),
+                                         role='professor')
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.students = []
+        for i in range(2):
+            user = User.objects.create_user(f'student{i}', password='pw', role='student')
+            student = Student.objects.create(user=user, department='CSE', section='A', year=2, class_group=cls.group)
+            student.subjects.set(cls.subjects)
+            cls.students.append(student)
+        cls.term_start, cls.term_end = term_bounds()
+        for hour in (9, 10):
+            session = Session.objects.create(teacher=faculty, subject=cls.subjects[0], class_group=cls.group,
+                                             start_time=time(hour), end_time=time(hour + 1), date=cls.term_start)
+            Attendance.objects.create(student=cls.students[0], session=session)
+
+    def test_unheld_subjects_are_not_eligible(self):
+        results = eligibility.compute(self.term_start, self.term_end, 75)
+        self.assertEqual(sum(result['unassessed'] for result in results), 2)
+        eligibility.write(self.term_start, results)
+
+        rows = TermEligibility.objects.filter(term_start=self.term_start).order_by('student_id')
+        self.assertEqual([(row.student_id, row.subject_id, row.held, row.attended, row.eligible) for row in rows], [
+            (self.students[0].id, self.subjects[0].id, 2, 2, True),
+            (self.students[1].id, self.subjects[0].id, 2, 0, False),
+        ])
+
+
+class IntegrityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'S{i:02d}', year=2) for i in range(7)]
+        cls.students = []
+        for i in range(4):
+            user = User.objects.create_user(f'student{i}', password='pw', role='student')
+            student = Student.objects.create(user=user, department='CSE', section='A', year=2)
+            if i < 2:
+                student.subjects.set(cls.subjects)
+                student.save()
+            cls.students.append(student)
+
+    def test_student_hash(self):
+        self.assertEqual(integrity.student_hash(10), (0, []))
+
+        stale, emptied = self.students[1], self.students[2]
+        stale.subjects.remove(self.subjects[0])
+        Student.objects.filter(id=emptied.id).update(subjects_hash=self.students[0].subjects_hash)
+        count, rows = integrity.student_hash(10)
+        self.assertEqual(count, 2)
+        self.assertEqual([row['id'] for row in rows], [stale.id, emptied.id])
+        self.assertEqual(rows[0]['expected'], stale.generate_subjects_hash())
+        self.assertEqual(rows[1]['expected'], '')
+        self.assertEqual(integrity.student_hash(1)[0], 2)
+
+
+class ConflictTests(TestCase):
+    day = date(2025, 3, 12)  # A Wednesday
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        cls.faculty = Faculty.objects.create(user=User.objects.create_user('faculty', password='pw', role='faculty'),
+                                             role='professor')
+        cls.other_faculty = Faculty.objects.create(
+            user=User.objects.create_user('other', password='pw', role='faculty'), role='professor')
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.other_group = ClassGroup.objects.create(year=2, department='CSE', section='B')
+        cls.weekly = Session.objects.create(teacher=cls.faculty, subject=cls.subject, class_group=cls.group,
+                                            start_time=time(9), end_time=time(10), date=cls.day, recurring=True)
+
+    def clashes(self, teacher, group, day, start, end, recurring=False):
+        return [(resource, row['id']) for resource, row in conflicts.find_conflicts(
+            teacher.id, group.id, day, time(*start), time(*end), recurring)]
+
+    def test_find_conflicts(self):
+        next_week = self.day + timedelta(days=7)
+        self.assertEqual(self.clashes(self.faculty, self.other_group, next_week, (9, 30), (11, 0)),
+                         [('teacher', self.weekly.id)])
+        self.assertEqual(self.clashes(self.other_faculty, self.group, next_week, (8, 0), (9, 1)),
+                         [('class_group', self.weekly.id)])
+        # Touching intervals, another weekday, before the first date, another term
+        self.assertEqual(self.clashes(self.faculty, self.group, next_week, (10, 0), (11, 0)), [])
+        self.assertEqual(self.clashes(self.faculty, self.group, next_week + timedelta(days=1), (9, 0), (10, 0)), [])
+        self.assertEqual(self.clashes(self.faculty, self.group, self.day - timedelta(days=7), (9, 0), (10, 0)), [])
+        self.assertEqual(self.clashes(self.faculty, self.group, date(2025, 7, 2), (9, 0), (10, 0)), [])
+        # A new weekly session starting earlier runs into this one's dates
+        self.assertEqual(self.clashes(self.other_faculty, self.group, self.day - timedelta(days=7), (9, 0), (10, 0),
+                                      recurring=True), [('class_group', self.weekly.id)])
+
+    def test_slot_index(self):
+        slots = conflicts.SlotIndex(*term_bounds(self.day))
+        slots.add(Session.objects.values(*conflicts.COLUMNS).get(id=self.weekly.id))
+        row = {'teacher_id': self.other_faculty.id, 'class_group_id': self.group.id, 'recurring': False,
+               'date': self.day + timedelta(days=14), 'start_time': time(9, 30), 'end_time': time(10, 30)}
+        self.assertEqual([(resource, other['id']) for resource, other in slots.clashes(row)],
+                         [('class_group', self.weekly.id)])
+        slots.add({**row, 'id': None})
+        later = {**row, 'class_group_id': self.other_group.id, 'start_time': time(10), 'end_time': time(11)}
+        self.assertEqual([resource for resource, _ in slots.clashes(later)], ['teacher'])
+        self.assertEqual(slots.clashes({**later, 'start_time': time(10, 30)}), [])
+
+    def test_term_conflicts(self):
+        clash = Session.objects.create(teacher=self.other_faculty, subject=self.subject, class_group=self.group,
+                                       start_time=time(9, 30), end_time=time(10, 30),
+                                       date=self.day + timedelta(days=21))
+        self.assertEqual(conflicts.term_conflicts(self.day), [{
+            'resource': 'class_group', 'resource_id': self.group.id, 'sessions': [self.weekly.id, clash.id],
+            'first_date': clash.date, 'dates': 1,
+        }])
+
+    def test_session_create_rejects_clash(self):
+        self.faculty.subjects.set([self.subject])
+        self.other_group.subjects.set([self.subject])
+        client = APIClient()
+        client.force_authenticate(self.faculty.user)
+        reference_cache.clear()
+        data = {'subject_id': self.subject.id, 'class_group_id': self.other_group.id,
+                'date': self.day + timedelta(days=7), 'start_time': '09:30', 'end_time': '10:30'}
+        response = client.post('/api/sessions/', data, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('You already teach', str(response.data))
+        response = client.post('/api/sessions/', {**data, 'start_time': '10:00', 'end_time': '11:00'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+
+class BulkSessionCreateTests(TestCase):
+    day = date(2025, 3, 12)
+    path = '/api/sessions/bulk-create/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subjects = [Subject.objects.create(name=f'Subject {i}', code=f'S{i:02d}', year=2) for i in range(2)]
+        cls.faculty = Faculty.objects.create(user=User.objects.create_user('faculty', password='pw', role='faculty'),
+                                             role='professor')
+        cls.faculty.subjects.set(cls.subjects[:1])
+        cls.group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.group.subjects.set(cls.subjects)
+
+    def setUp(self):
+        reference_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.faculty.user)
+
+    def item(self, hour, subject=None, **fields):
+        return {'subject_id': (subject or self.subjects[0]).id, 'class_group_id': self.group.id,
+                'date': str(self.day), 'start_time': f'{hour:02d}:00', 'end_time': f'{hour + 1:02d}:00', **fields}
+
+    def post(self, items, **options):
+        return self.client.post(self.path, {'sessions': items, **options}, format='json')
+
+    def statuses(self, response):
+        return [result['status'] for result in response.data['results']]
+
+    def test_partial_success(self):
+        response = self.post([
+            self.item(9),
+            self.item(9),  # Duplicate of item 0
+            self.item(11, subject=self.subjects[1]),  # Not taught by this faculty
+            self.item(12, end_time='11:00'),
+            self.item(13),
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 3))
+        self.assertEqual(self.statuses(response), ['created', 'error', 'error', 'error', 'created'])
+        self.assertIn('Duplicate of item 0', str(response.data['results'][1]['errors']))
+        self.assertEqual(Session.objects.count(), 2)
+
+        # Clashes with what the first request created
+        response = self.post([self.item(9)])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('You already teach', str(response.data['results'][0]['errors']))
+
+    def test_atomic(self):
+        response = self.post([self.item(9), self.item(11, subject=self.subjects[1])], atomic=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.statuses(response), ['skipped', 'error'])
+        self.assertFalse(Session.objects.exists())
+
+        response = self.post([self.item(9), self.item(10)], atomic=True)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Session.objects.count(), 2)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        with self.settings(SESSION_BULK_CREATE_MAX=2):
+            self.assertEqual(self.post([self.item(9), self.item(10), self.item(11)]).status_code, 400)
+        student = User.objects.create_user('student', password='pw', role='student')
+        self.client.force_authenticate(student)
+        self.assertEqual(self.post([self.item(9)]).status_code, 403)
+
+
+class SlowQueryTests(TestCase):
+    def test_fingerprint(self):
+        first = slow_queries.normalize('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\'')
+        second = slow_queries.normalize('SELECT "a"."id"  FROM "a"\nWHERE "a"."id" IN (%s) AND "a"."name" = \'it\'\'s\'')
+        self.assertEqual(first, 'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ?')
+        self.assertEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(second))
+        self.assertEqual(slow_queries.normalize('INSERT INTO "a" VALUES (%s, %s), (%s, %s), (%s, %s)'),
+                         'INSERT INTO "a" VALUES (...), ...')
+        self.assertEqual(slow_queries.normalize('SELECT 1 FROM "a" LIMIT 21'), 'SELECT ? FROM "a" LIMIT ?')
+        self.assertNotEqual(slow_queries.fingerprint(first), slow_queries.fingerprint(
+            slow_queries.normalize('SELECT "a"."id" FROM "a" WHERE "a"."id" = %s')))
+
+    def test_record_and_report(self):
+        caches['default'].clear()
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), connection.execute_wrapper(slow_queries.slow_query_wrapper), \
+                self.assertLogs('users.slow_queries', 'WARNING') as logs:
+            list(Subject.objects.filter(id__in=[1, 2, 3]))
+            list(Subject.objects.filter(id__in=[4]))
+        entries = [json.loads(line.split(':', 2)[2]) for line in logs.output]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['fingerprint'], entries[1]['fingerprint'])
+        self.assertTrue(entries[0]['explain'])
+        self.assertIsNone(entries[1]['explain'])  # EXPLAINed once per fingerprint
+
+        [group] = slow_queries.report(entries)
+        self.assertEqual((group['count'], group['fingerprint']), (2, entries[0]['fingerprint']))
+        self.assertEqual(group['explain'], entries[0]['explain'])
+
+
+class AdmissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('student', password='pw', role='student')
+        cls.student = Student.objects.create(user=cls.user, department='CSE', section='A', year=2)
+        subject = Subject.objects.create(name='Subject', code='S01', year=2)
+        cls.student.subjects.set([subject])
+        cls.faculty = Faculty.objects.create(
+            user=User.objects.create_user('faculty', password='pw', role='faculty'), role='professor')
+        group = ClassGroup.objects.create(year=2, department='CSE', section='A')
+        cls.session = Session.objects.create(teacher=cls.faculty, subject=subject, class_group=group,
+                                             start_time=time(9), end_time=time(10), date=timezone.localdate(),
+                                             active=True, qr_code='qr')
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_take_token(self):
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=100.0), 0)
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=100.5), 0)
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=101.0), 1.0)
+        # The previous window still counts in full at the start of the next one, then by half
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=102.0), 2.0)
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=103.0), 0)
+        self.assertEqual(admission.take_token('bucket', rate=1, burst=2, now=103.0), 1.0)
+        self.assertEqual(admission.take_token('bucket', rate=0, burst=2, now=103.0), 0)
+
+    @override_settings(CHECK_IN_SESSION_CONCURRENCY=1)
+    def test_concurrency(self):
+        first = admission.admit(1)
+        self.assertFalse(first.rejected)
+        second = admission.admit(1)
+        self.assertEqual((second.rejected, second.retry_after), (True, 1))
+        self.assertFalse(admission.admit(2).rejected)
+        first.release()
+        self.assertFalse(admission.admit(1).rejected)
+
+    @override_settings(CHECK_IN_RATE_PER_SECOND=0.001, CHECK_IN_BURST=1)
+    def test_mark_attendance_throttled(self):
+        client = APIClient()
+        # Requests that cannot check in use up no tokens
+        client.force_authenticate(self.faculty.user)
+        self.assertEqual(client.post('/api/mark-attendance/', {'session_id': self.session.id}).status_code, 403)
+
+        client.force_authenticate(self.user)
+        data = {'session_id': self.session.id, 'qr_code': 'qr'}
+        self.assertEqual(client.post('/api/mark-attendance/', data, format='json').status_code, 201)
+        response = client.post('/api/mark-attendance/', data, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.data, {'error': 'Too many check-ins right now, please retry shortly'})
+        self.assertGreater(int(response['Retry-After']), 1)
@@ -0,0 +1,260 @@
+"""Weekly timetable generation.
+
+Every (class group, subject) pair needs ``TIMETABLE_LECTURES_PER_WEEK``
+lectures in the weekly grid (``TIMETABLE_WEEKDAYS`` x ``TIMETABLE_SLOTS``),
+taught by one of the subject's faculty. Hard constraints: a teacher or a
+class group is never in two places at once, a class group has a subject at
+most once a day, and slots already taken by existing sessions of the term
+stay taken.
+
+Each department is solved independently (in a process pool when asked) by a
+greedy placement, most constrained lectures first, restarted with the
+unplaced lectures moved to the front until nothing is left or the time
+budget runs out. Departments share teachers, so the parent then merges the
+plans in order and moves any lecture whose teacher was taken by an earlier
+department; lectures that cannot be moved are reported as unplaced.
+"""
+import multiprocessing
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.db import transaction
+
+from .models import ClassGroup, Faculty, Session
+from .terms import term_bounds
+
+
+def weekdays():
+    return list(getattr(settings, 'TIMETABLE_WEEKDAYS', [0, 1, 2, 3, 4]))
+
+
+def slots():
+    """[(start_time, end_time)] of the daily grid"""
+    return [
+        (datetime.strptime(start, '%H:%M').time(), datetime.strptime(end, '%H:%M').time())
+        for start, end in getattr(settings, 'TIMETABLE_SLOTS', [('09:00', '10:00')])
+    ]
+
+
+def lectures_per_week():
+    return getattr(settings, 'TIMETABLE_LECTURES_PER_WEEK', 3)
+
+
+class Grid:
+    """Occupancy of teachers and class groups over (day, slot) cells"""
+
+    def __init__(self, teacher_busy=(), group_busy=()):
+        self.teachers = set(teacher_busy)  # (teacher_id, day, slot)
+        self.groups = set(group_busy)  # (class_group_id, day, slot)
+        self.subject_days = set()  # (class_group_id, subject_id, day)
+        self.group_load = Counter()  # (class_group_id, day) -> lectures
+
+    def free(self, lecture, day, slot):
+        group, subject, teacher = lecture
+        return ((teacher, day, slot) not in self.teachers and (group, day, slot) not in self.groups
+                and (group, subject, day) not in self.subject_days)
+
+    def take(self, lecture, day, slot):
+        group, subject, teacher = lecture
+        self.teachers.add((teacher, day, slot))
+        self.groups.add((group, day, slot))
+        self.subject_days.add((group, subject, day))
+        self.group_load[(group, day)] += 1
+
+    def place(self, lecture, cells):
+        """Take the free cell on the class group's lightest day; returns it or None"""
+        group = lecture[0]
+        best = None
+        for day, slot in cells:
+            if self.free(lecture, day, slot):
+                key = (self.group_load[(group, day)], slot)
+                if best is None or key < best[0]:
+                    best = (key, day, slot)
+        if best is None:
+            return None
+        self.take(lecture, best[1], best[2])
+        return best[1], best[2]
+
+
+def _greedy(lectures, cells, teacher_busy, group_busy):
+    grid = Grid(teacher_busy, group_busy)
+    placed, unplaced = [], []
+    for lecture in lectures:
+        cell = grid.place(lecture, cells)
+        if cell is None:
+            unplaced.append(lecture)
+        else:
+            placed.append((*lecture, *cell))
+    return placed, unplaced
+
+
+def solve(department, lectures, cells, teacher_busy, group_busy, budget, seed=0, max_attempts=None):
+    """Best plan found for one department's lectures within ``budget`` seconds and/or ``max_attempts`` passes.
+
+    With ``budget=None`` the search stops only on ``max_attempts``, so the result depends on ``seed`` alone.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    # Most constrained first: busiest teachers, then busiest class groups
+    teacher_load = Counter(teacher for _, _, teacher in lectures)
+    group_load = Counter(group for group, _, _ in lectures)
+    order = sorted(lectures, key=lambda l: (-teacher_load[l[2]], -group_load[l[0]], l))
+
+    best, attempts = None, 0
+    while True:
+        attempts += 1
+        placed, unplaced = _greedy(order, cells, teacher_busy, group_busy)
+        if best is None or len(unplaced) < len(best[1]):
+            best = (placed, unplaced)
+        if (not best[1] or (max_attempts and attempts >= max_attempts)
+                or (budget is not None and time.perf_counter() - started >= budget)):
+            break
+        # Retry with the lectures that did not fit first and the rest reshuffled
+        left_out = Counter(unplaced)
+        rest = []
+        for lecture in order:
+            if left_out[lecture]:
+                left_out[lecture] -= 1
+            else:
+                rest.append(lecture)
+        rng.shuffle(rest)
+        order = unplaced + rest
+    return {
+        'department': department,
+        'placed': best[0],
+        'unplaced': best[1],
+        'attempts': attempts,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _occupied(sessions, grid_slots):
+    """(teacher cells, class group cells) covered by existing sessions"""
+    teacher_busy, group_busy = set(), set()
+    for teacher_id, class_group_id, day, start, end in sessions:
+        for slot, (slot_start, slot_end) in enumerate(grid_slots):
+            if start < slot_end and slot_start < end:
+                teacher_busy.add((teacher_id, day.weekday(), slot))
+                group_busy.add((class_group_id, day.weekday(), slot))
+    return teacher_busy, group_busy
+
+
+def build_problem(start, departments=None):
+    """Lectures still to schedule per department, plus existing occupancy.
+
+    Existing weekly sessions of the term count towards a pair's lectures.
+    Each remaining pair gets the least loaded teacher of its subject.
+    """
+    term_start, term_end = term_bounds(start)
+    per_week = lectures_per_week()
+    grid_slots = slots()
+
+    existing = list(Session.objects
+                    .filter(date__gte=term_start, date__lt=term_end)
+                    .exclude(recurring=False, date__lt=start)
+                    .values_list('teacher_id', 'class_group_id', 'subject_id', 'date', 'start_time', 'end_time',
+                                 'recurring'))
+    scheduled = Counter((row[1], row[2]) for row in existing if row[6])
+    teacher_busy, group_busy = _occupied(
+        [(teacher, group, day, begin, end) for teacher, group, _, day, begin, end, _ in existing], grid_slots)
+
+    teachers_of = defaultdict(list)
+    for faculty_id, subject_id in Faculty.subjects.through.objects.order_by('faculty_id').values_list(
+            'faculty_id', 'subject_id'):
+        teachers_of[subject_id].append(faculty_id)
+    load = Counter(teacher for teacher, _, _ in teacher_busy)
+
+    groups = ClassGroup.objects.order_by('department', 'year', 'section', 'id')
+    if departments:
+        groups = groups.filter(department__in=departments)
+    pairs = ClassGroup.subjects.through.objects.filter(classgroup__in=groups).values_list(
+        'classgroup_id', 'classgroup__department', 'subject_id').order_by('classgroup_id', 'subject_id')
+
+    lectures = defaultdict(list)
+    no_teacher = []
+    for group, department, subject in pairs:
+        missing = per_week - scheduled[(group, subject)]
+        if missing <= 0:
+            continue
+        if not teachers_of[subject]:
+            no_teacher.append((group, subject, missing))
+            continue
+        teacher = min(teachers_of[subject], key=lambda t: (load[t], t))
+        load[teacher] += missing
+        lectures[department].extend([(group, subject, teacher)] * missing)
+    return lectures, teacher_busy, group_busy, no_teacher
+
+
+def _init_worker():
+    django.setup()
+
+
+def merge(results, cells, teacher_busy, group_busy):
+    """Combine department plans, moving lectures whose teacher is already taken"""
+    grid = Grid(teacher_busy, group_busy)
+    placed, unplaced, moved = [], [], 0
+    for result in results:
+        clashing = []
+        for group, subject, teacher, day, slot in result['placed']:
+            if grid.free((group, subject, teacher), day, slot):
+                grid.take((group, subject, teacher), day, slot)
+                placed.append((group, subject, teacher, day, slot))
+            else:
+                clashing.append((group, subject, teacher))
+        for lecture in clashing + list(result['unplaced']):
+            cell = grid.place(lecture, cells)
+            if cell is None:
+                unplaced.append(lecture)
+            else:
+                placed.append((*lecture, *cell))
+        moved += len(clashing)
+    return placed, unplaced, moved
+
+
+def generate(start, departments=None, budget=10.0, workers=1, seed=0):
+    """Plan the weekly timetable; returns a report dict (nothing is written)"""
+    started = time.perf_counter()
+    lectures, teacher_busy, group_busy, no_teacher = build_problem(start, departments)
+    cells = [(day, slot) for day in weekdays() for slot in range(len(slots()))]
+    jobs = [(department, items, cells, teacher_busy, group_busy, budget, seed)
+            for department, items in sorted(lectures.items())]
+
+    if workers <= 1 or len(jobs) <= 1:
+        results = [solve(*job) for job in jobs]
+    else:
+        method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                                 initializer=_init_worker) as pool:
+            results = list(pool.map(solve, *zip(*jobs)))
+
+    placed, unplaced, moved = merge(results, cells, teacher_busy, group_busy)
+    return {
+        'start': start,
+        'departments': results,
+        'placed': placed,
+        'unplaced': [(group, subject, teacher, count) for (group, subject, teacher), count in Counter(unplaced).items()]
+                    + [(group, subject, None, missing) for group, subject, missing in no_teacher],
+        'moved': moved,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def accept(plan):
+    """Insert the plan's lectures as weekly recurring sessions from its start date"""
+    grid_slots = slots()
+    start = plan['start']
+    sessions = []
+    for group, subject, teacher, day, slot in plan['placed']:
+        slot_start, slot_end = grid_slots[slot]
+        sessions.append(Session(
+            teacher_id=teacher, subject_id=subject, class_group_id=group,
+            date=start + timedelta(days=(day - start.weekday()) % 7),
+            start_time=slot_start, end_time=slot_end, recurring=True,
+        ))
+    with transaction.atomic():
+        return len(Session.objects.bulk_create(sessions, batch_size=1000))
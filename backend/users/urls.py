@@ -6,7 +6,9 @@ from .views import (
     FacultyForClassView, MarkAttendanceView, GenerateQRView, StopAttendanceView, 
     FacultyRegistrationView, UserManagementView, SessionCreateView, SessionDeleteView, 
     AttendanceReportView, UserProfileView, MyAttendanceView, AttendanceStatsView,
-    SubjectListView, FacultySubjectsView, FacultyClassGroupsView
+    SubjectListView, FacultySubjectsView, FacultyClassGroupsView, CacheStatsView,
+    DefaultersView, AttendanceTrendsView, FacultyDashboardView, SessionConflictsView,
+    BulkSessionCreateView, SessionAttendanceCorrectionView
 )
 
 urlpatterns = [
@@ -20,10 +22,15 @@ urlpatterns = [
     path('sessions/', SessionListView.as_view(), name='session_list'),
     path('sessions/<int:pk>/', SessionDetailView.as_view(), name='session_detail'),
     path('sessions/create/', SessionCreateView.as_view(), name='session_create'),
+    path('sessions/bulk-create/', BulkSessionCreateView.as_view(), name='session_bulk_create'),
+    path('sessions/conflicts/', SessionConflictsView.as_view(), name='session_conflicts'),
+    path('sessions/<int:pk>/attendance/', SessionAttendanceCorrectionView.as_view(), name='session_attendance_correct'),
     path('sessions/<int:pk>/delete/', SessionDeleteView.as_view(), name='session_delete'),
     path('attendance/', AttendanceListView.as_view(), name='attendance_list'),
     path('attendance/my-attendance/', MyAttendanceView.as_view(), name='my_attendance'),
     path('attendance/stats/', AttendanceStatsView.as_view(), name='attendance_stats'),
+    path('attendance/defaulters/', DefaultersView.as_view(), name='attendance_defaulters'),
+    path('attendance/trends/', AttendanceTrendsView.as_view(), name='attendance_trends'),
     path('attendance/report/', AttendanceReportView.as_view(), name='attendance_report'),
     path('upcoming-sessions/', UpcomingSessionsView.as_view(), name='upcoming_sessions'),
     path('timetable/', TimetableView.as_view(), name='timetable'),
@@ -33,5 +40,7 @@ urlpatterns = [
     path('stop-attendance/', StopAttendanceView.as_view(), name='stop_attendance'),
     path('subjects/', SubjectListView.as_view(), name='subject_list'),
     path('faculty/my-subjects/', FacultySubjectsView.as_view(), name='faculty_subjects'),
+    path('faculty/dashboard/', FacultyDashboardView.as_view(), name='faculty_dashboard'),
     path('faculty/my-class-groups/', FacultyClassGroupsView.as_view(), name='faculty_class_groups'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache_stats'),
 ]
\ No newline at end of file
@@ -4,23 +4,57 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import authenticate
+from django.http import HttpResponse
 from django.utils import timezone
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from datetime import datetime, timedelta
-import qrcode
+from functools import partial
 import io
+import time
 import base64
-from .models import User, Student, Faculty, Session, Attendance, Subject, ClassGroup
+from .models import (
+    User, Student, Faculty, Session, Attendance, AttendanceEvent, Subject, ClassGroup, ArchivedSessionAttendance
+)
+from . import admission, archive, conflicts, events, metrics, read_serializers, reference_cache, reports, rollups
+from .boot import lazy_import
+from .db_routing import ReplicaReadMixin
+from .terms import term_bounds
 from .serializers import (
     UserSerializer, StudentSerializer, FacultySerializer, 
     SessionSerializer, AttendanceSerializer, 
-    SubjectSerializer, ClassGroupSerializer
+    SubjectSerializer, ClassGroupSerializer, SessionSpecSerializer, AttendanceCorrectionSerializer
 )
 
+qrcode = lazy_import('qrcode')  # Only GenerateQRView needs it (and PIL)
+
+
+def requested_term(request):
+    """(start, end) of the term holding ?term=YYYY-MM-DD or of ?term=current; None (all terms) by default"""
+    value = request.query_params.get('term', 'all')
+    if value == 'all':
+        return None
+    if value == 'current':
+        return term_bounds()
+    try:
+        return term_bounds(datetime.strptime(value, '%Y-%m-%d').date())
+    except ValueError:
+        raise serializers.ValidationError({'error': 'term must be YYYY-MM-DD, current or all'})
+
+
+def in_requested_term(queryset, request):
+    """Attendance limited to the requested term (a partitioned table then scans one partition)"""
+    term = requested_term(request)
+    return queryset if term is None else queryset.filter(session_date__gte=term[0], session_date__lt=term[1])
+
 @method_decorator(csrf_exempt, name='dispatch')
 class CustomTokenObtainPairView(TokenObtainPairView):
     def post(self, request, *args, **kwargs):
+        started = time.perf_counter()
         username = request.data.get('username')
         password = request.data.get('password')
         user = authenticate(username=username, password=password)
@@ -28,7 +62,9 @@ class CustomTokenObtainPairView(TokenObtainPairView):
             response = super().post(request, *args, **kwargs)
             response.data['role'] = user.role
             response.data['user_id'] = user.user_id
+            metrics.record_login(True, time.perf_counter() - started)
             return response
+        metrics.record_login(False, time.perf_counter() - started)
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -51,7 +87,7 @@ class StudentRegistrationView(generics.CreateAPIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-class FacultyListView(generics.ListCreateAPIView):
+class FacultyListView(ReplicaReadMixin, generics.ListCreateAPIView):
     queryset = Faculty.objects.all()
     serializer_class = FacultySerializer
     permission_classes = [IsAuthenticated]
@@ -61,10 +97,13 @@ class FacultyListView(generics.ListCreateAPIView):
             return Faculty.objects.all()
         return Faculty.objects.none()
 
-class SessionListView(generics.ListCreateAPIView):
+class SessionListView(ReplicaReadMixin, generics.ListCreateAPIView):
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        return Response(read_serializers.session_rows(self.get_queryset()))
+
     def get_queryset(self):
         user = self.request.user
         if user.role == 'faculty':
@@ -80,12 +119,80 @@ class SessionListView(generics.ListCreateAPIView):
                 return Session.objects.none()
         return Session.objects.none()
 
-class SessionDetailView(generics.RetrieveAPIView):
+class SessionDetailView(ReplicaReadMixin, generics.RetrieveAPIView):
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
     queryset = Session.objects.all()
 
-class AttendanceListView(generics.ListCreateAPIView):
+class CheckInMixin:
+    """Student check-in: admission, QR and enrollment checks, then the row and its event"""
+
+    def create(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = self.admit_and_mark(request)
+        metrics.record_check_in(response, time.perf_counter() - started)
+        return response
+
+    def admit_and_mark(self, request):
+        # Checked before admission so requests that cannot succeed use up no session's budget
+        if request.user.role != 'student':
+            return Response({'error': 'Only students can mark attendance'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            session_id = int(request.data.get('session_id'))
+        except (TypeError, ValueError):
+            return Response({'error': 'session_id must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Pace scan bursts so the database is not hit by a whole hall at once
+        ticket = admission.admit(session_id)
+        if ticket.rejected:
+            response = Response({'error': 'Too many check-ins right now, please retry shortly'},
+                                status=status.HTTP_429_TOO_MANY_REQUESTS)
+            response['Retry-After'] = str(ticket.retry_after)
+            return response
+        try:
+            return self.mark(request, session_id)
+        finally:
+            ticket.release()
+
+    def mark(self, request, session_id):
+        qr_code = request.data.get('qr_code')
+        
+        try:
+            # Verify session is active
+            session = Session.objects.get(id=session_id, active=True)
+            
+            # Verify QR code
+            if session.qr_code != qr_code:
+                return Response({'error': 'Invalid QR code'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Use serializer for validation and creation
+            serializer = self.get_serializer(data=request.data, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            try:
+                with transaction.atomic():
+                    attendance = serializer.save()
+                    events.append(AttendanceEvent.CHECK_IN, session, attendance.student_id, request.user)
+            except IntegrityError:
+                # A concurrent request for the same student and session got past validation first
+                raise serializers.ValidationError({
+                    'error': 'Attendance already marked',
+                    'details': f"You have already marked attendance for this {session.subject.name} session.",
+                    'suggestion': 'You can only mark attendance once per session.'
+                })
+            
+            return Response({
+                'message': 'Attendance marked successfully',
+                'session': attendance.session.id,
+                'marked_at': attendance.marked_at
+            }, status=status.HTTP_201_CREATED)
+            
+        except Session.DoesNotExist:
+            return Response({'error': 'Session not found or not active'}, status=status.HTTP_404_NOT_FOUND)
+        except serializers.ValidationError as e:
+            return Response({'error': serializers.as_serializer_error(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+class AttendanceListView(ReplicaReadMixin, CheckInMixin, generics.ListCreateAPIView):
+    # POST checks in like mark-attendance/, so it is admitted, validated and logged the same way
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
 
@@ -94,18 +201,18 @@ class AttendanceListView(generics.ListCreateAPIView):
         if user.role == 'student':
             try:
                 student = Student.objects.get(user=user)
-                return Attendance.objects.filter(student=student)
+                return in_requested_term(Attendance.objects.filter(student=student), self.request)
             except Student.DoesNotExist:
                 return Attendance.objects.none()
         elif user.role == 'faculty':
             try:
                 faculty = Faculty.objects.get(user=user)
-                return Attendance.objects.filter(session__teacher=faculty)
+                return in_requested_term(Attendance.objects.filter(teacher=faculty), self.request)
             except Faculty.DoesNotExist:
                 return Attendance.objects.none()
         return Attendance.objects.none()
 
-class FacultyForClassView(generics.ListAPIView):
+class FacultyForClassView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = FacultySerializer
     permission_classes = [IsAuthenticated]
 
@@ -115,47 +222,14 @@ class FacultyForClassView(generics.ListAPIView):
             student = Student.objects.get(user=user)
             # Get faculty teaching subjects in student's class_group
             class_group = ClassGroup.objects.get(year=student.year, department=student.department, section=student.section)
-            subjects = class_group.subjects.all()
-            return Faculty.objects.filter(subjects__in=subjects).distinct()
+            subject_ids = reference_cache.class_group_subject_ids(class_group.id)
+            return Faculty.objects.filter(id__in=reference_cache.subject_faculty_ids(subject_ids))
         return Faculty.objects.none()
 
-class MarkAttendanceView(generics.CreateAPIView):
+class MarkAttendanceView(CheckInMixin, generics.CreateAPIView):
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
 
-    def create(self, request, *args, **kwargs):
-        if request.user.role != 'student':
-            return Response({'error': 'Only students can mark attendance'}, status=status.HTTP_403_FORBIDDEN)
-        
-        qr_code = request.data.get('qr_code')
-        session_id = request.data.get('session_id')
-        
-        try:
-            # Verify session is active
-            session = Session.objects.get(id=session_id, active=True)
-            
-            # Verify QR code
-            if session.qr_code != qr_code:
-                return Response({'error': 'Invalid QR code'}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Use serializer for validation and creation
-            serializer = self.get_serializer(data=request.data, context={'request': request})
-            serializer.is_valid(raise_exception=True)
-            attendance = serializer.save()
-            
-            return Response({
-                'message': 'Attendance marked successfully',
-                'session': attendance.session.id,
-                'marked_at': attendance.marked_at
-            }, status=status.HTTP_201_CREATED)
-            
-        except Session.DoesNotExist:
-            return Response({'error': 'Session not found or not active'}, status=status.HTTP_404_NOT_FOUND)
-        except serializers.ValidationError as e:
-            return Response({'error': e.detail}, status=status.HTTP_400_BAD_REQUEST)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-
 class GenerateQRView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
@@ -167,20 +241,25 @@ class GenerateQRView(generics.UpdateAPIView):
         session_id = request.data.get('session_id')
         try:
             session = Session.objects.get(id=session_id, teacher__user=user)
+            if ArchivedSessionAttendance.objects.filter(session=session).exists():
+                return Response({'error': 'Attendance for this session has been archived'}, status=status.HTTP_400_BAD_REQUEST)
             # Generate QR code data (e.g., session_id + timestamp)
             qr_data = f"{session.id}-{timezone.now().timestamp()}"
             session.qr_code = qr_data
             session.active = True
-            session.save()
+            with transaction.atomic():
+                session.save(update_fields=['qr_code', 'active'])
+                events.append(AttendanceEvent.SESSION_STARTED, session, actor=user)
             
             # Generate QR image
-            qr = qrcode.QRCode(version=1, box_size=10, border=5)
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            img = qr.make_image(fill='black', back_color='white')
-            buffer = io.BytesIO()
-            img.save(buffer, format='PNG')
-            img_str = base64.b64encode(buffer.getvalue()).decode()
+            with metrics.QR_SECONDS.time():
+                qr = qrcode.QRCode(version=1, box_size=10, border=5)
+                qr.add_data(qr_data)
+                qr.make(fit=True)
+                img = qr.make_image(fill='black', back_color='white')
+                buffer = io.BytesIO()
+                img.save(buffer, format='PNG')
+                img_str = base64.b64encode(buffer.getvalue()).decode()
             
             return Response({'qr_code': qr_data, 'qr_image': img_str}, status=status.HTTP_200_OK)
         except Session.DoesNotExist:
@@ -198,11 +277,84 @@ class StopAttendanceView(generics.UpdateAPIView):
         try:
             session = Session.objects.get(id=session_id, teacher__user=user)
             session.active = False
-            session.save()
+            with transaction.atomic():
+                session.save(update_fields=['active'])
+                events.append(AttendanceEvent.SESSION_STOPPED, session, actor=user)
             return Response({'message': 'Attendance stopped'}, status=status.HTTP_200_OK)
         except Session.DoesNotExist:
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
 
+class SessionAttendanceCorrectionView(APIView):
+    """Mark students present or absent for one of the faculty's sessions.
+
+    Every id is checked against the session's roster (students of its class
+    group enrolled in its subject), loaded with one query. The changes are
+    one bulk insert and one bulk delete in a transaction, and each real
+    change is recorded in the event log with the faculty as actor.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        if request.user.role != 'faculty':
+            return Response({'error': 'Only faculty can correct attendance'}, status=status.HTTP_403_FORBIDDEN)
+        session = Session.objects.filter(id=pk, teacher__user=request.user).first()
+        if session is None:
+            return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
+        if ArchivedSessionAttendance.objects.filter(session=session).exists():
+            return Response({'error': 'Attendance for this session has been archived'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = AttendanceCorrectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        present = set(serializer.validated_data['present'])
+        absent = set(serializer.validated_data['absent'])
+
+        roster = set(Student.subjects.through.objects.filter(
+            student__class_group_id=session.class_group_id, subject_id=session.subject_id,
+        ).values_list('student_id', flat=True))
+        not_enrolled = (present | absent) - roster
+        if not_enrolled:
+            return Response({
+                'error': 'Subject not enrolled',
+                'details': f"Not on the roster of this session: {sorted(not_enrolled)}",
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Compaction locks the sessions it archives: wait for it, then look again
+            if Session.objects.select_for_update().filter(id=session.id).exclude(
+                    id__in=ArchivedSessionAttendance.objects.values('session_id')).first() is None:
+                return Response({'error': 'Attendance for this session has been archived'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Read under the session lock, so the events match what changes here.
+            # Also locks the rows about to be deleted
+            marked = set(Attendance.objects.select_for_update().filter(
+                session=session, student_id__in=present | absent).values_list('student_id', flat=True))
+            added = present - marked
+            removed = absent & marked
+            new_rows = []
+            for student_id in sorted(added):
+                attendance = Attendance(student_id=student_id, session=session, marked_at=now)
+                attendance.copy_session_facts(session)
+                new_rows.append(attendance)
+            # A check-in committing meanwhile keeps its own row
+            Attendance.objects.bulk_create(new_rows, ignore_conflicts=True)
+            if removed:
+                Attendance.objects.filter(session=session, student_id__in=removed).delete()
+
+            events.append_many(AttendanceEvent.MARKED, session, sorted(added), actor=request.user)
+            events.append_many(AttendanceEvent.UNMARKED, session, sorted(removed), actor=request.user)
+            if len(added) != len(removed):
+                # Bulk writes skip the signals that keep the rollups current
+                transaction.on_commit(partial(rollups.add_present, session.subject_id, session.class_group_id,
+                                              session.date, len(added) - len(removed)), robust=True)
+
+        return Response({
+            'session': session.id,
+            'marked_present': sorted(added),
+            'marked_absent': sorted(removed),
+            'unchanged': len(present | absent) - len(added) - len(removed),
+        }, status=status.HTTP_200_OK)
+
 class FacultyRegistrationView(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
 
@@ -231,7 +383,7 @@ class FacultyRegistrationView(generics.CreateAPIView):
         
         return Response({'message': 'Faculty registered', 'user_id': user.user_id}, status=status.HTTP_201_CREATED)
 
-class UserManagementView(generics.ListAPIView):
+class UserManagementView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
@@ -240,6 +392,9 @@ class UserManagementView(generics.ListAPIView):
             return User.objects.all()
         return User.objects.none()
 
+    def list(self, request, *args, **kwargs):
+        return Response(read_serializers.user_rows(self.get_queryset()))
+
 class SessionCreateView(generics.CreateAPIView):
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
@@ -248,22 +403,131 @@ class SessionCreateView(generics.CreateAPIView):
         if request.user.role != 'faculty':
             return Response({'error': 'Only faculty can create sessions'}, status=status.HTTP_403_FORBIDDEN)
         
-        data = request.data
-        faculty = Faculty.objects.get(user=request.user)
-        subject = Subject.objects.get(id=data['subject_id'])
-        class_group = ClassGroup.objects.get(id=data['class_group_id'])
-        
-        session = Session.objects.create(
-            teacher=faculty,
-            subject=subject,
-            class_group=class_group,
-            start_time=data['start_time'],
-            end_time=data['end_time'],
-            date=data['date'],
-            recurring=data.get('recurring', False)
-        )
+        # Same validation as sessions/, including the teacher/class group clash check
+        serializer = SessionSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
         return Response(SessionSerializer(session).data, status=status.HTTP_201_CREATED)
 
+class BulkSessionCreateView(APIView):
+    """Create many sessions in one request.
+
+    Every item is checked against sets loaded once for the whole batch
+    (faculty subjects, class group subjects, existing sessions) and against
+    the items before it; valid items are inserted with a single bulk_create.
+    With ``"atomic": true`` nothing is created unless every item is valid.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != 'faculty':
+            return Response({'error': 'Only faculty can create sessions'}, status=status.HTTP_403_FORBIDDEN)
+        faculty_id = reference_cache.faculty_id_for_user(request.user.id)
+        if faculty_id is None:
+            return Response({'error': 'Faculty profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        items = request.data.get('sessions')
+        limit = getattr(settings, 'SESSION_BULK_CREATE_MAX', 1000)
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'sessions must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > limit:
+            return Response({'error': f'At most {limit} sessions per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [{'index': index} for index in range(len(items))]
+        specs = {}
+        for index, item in enumerate(items):
+            spec = SessionSpecSerializer(data=item)
+            if spec.is_valid():
+                specs[index] = spec.validated_data
+            else:
+                results[index].update(status='error', errors=spec.errors)
+
+        # Everything the checks need, loaded once
+        subject_ids = {spec['subject_id'] for spec in specs.values()}
+        class_group_ids = {spec['class_group_id'] for spec in specs.values()}
+        subjects = {s.id: s for s in reference_cache.get_subjects(subject_ids)}
+        class_groups = {g.id: g for g in reference_cache.get_class_groups(class_group_ids)}
+        teaches = reference_cache.faculty_subject_ids(faculty_id)
+        curriculum = set(ClassGroup.subjects.through.objects.filter(
+            classgroup_id__in=class_group_ids).values_list('classgroup_id', 'subject_id'))
+        if specs:
+            window_start = min(term_bounds(spec['date'])[0] for spec in specs.values())
+            window_end = max(term_bounds(spec['date'])[1] for spec in specs.values())
+            slots = conflicts.SlotIndex(window_start, window_end)
+            for row in Session.objects.filter(
+                    Q(teacher_id=faculty_id) | Q(class_group_id__in=class_group_ids),
+                    date__gte=window_start, date__lt=window_end).values(*conflicts.COLUMNS):
+                slots.add(row)
+
+        new_sessions = {}
+        for index, spec in specs.items():
+            subject = subjects.get(spec['subject_id'])
+            class_group = class_groups.get(spec['class_group_id'])
+            if subject is None or class_group is None:
+                error = 'Unknown subject' if subject is None else 'Unknown class group'
+            elif subject.id not in teaches:
+                error = f"You are not assigned to teach '{subject.code} - {subject.name}'"
+            elif (class_group.id, subject.id) not in curriculum:
+                error = f"Class group '{class_group.name}' does not have subject '{subject.code} - {subject.name}'"
+            elif subject.year != class_group.year:
+                error = f"Subject '{subject.name}' is for year {subject.year}, but '{class_group.name}' is year {class_group.year}"
+            else:
+                row = {**spec, 'teacher_id': faculty_id, 'item': index}
+                clashes = slots.clashes(row)
+                if not clashes:
+                    slots.add(row)
+                    new_sessions[index] = Session(teacher_id=faculty_id, **spec)
+                    continue
+                resource, other = clashes[0]
+                if 'item' in other:
+                    same = all(other[field] == row[field] for field in ('subject_id', 'class_group_id', 'date',
+                                                                        'start_time', 'end_time'))
+                    error = f"{'Duplicate of' if same else 'Overlaps'} item {other['item']}"
+                else:
+                    error = conflicts.describe(resource, other)
+            results[index].update(status='error', errors={'non_field_errors': [error]})
+
+        failed = len(items) - len(new_sessions)
+        if failed and request.data.get('atomic'):
+            for index in new_sessions:
+                results[index]['status'] = 'skipped'
+            return Response({'created': 0, 'failed': failed, 'results': results},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            created = Session.objects.bulk_create(new_sessions.values())
+        for index, session in zip(new_sessions, created):
+            results[index].update(status='created', id=session.id)
+        return Response({'created': len(created), 'failed': failed, 'results': results},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+class SessionConflictsView(ReplicaReadMixin, APIView):
+    """Teacher and class group clashes across a term (admin: all, faculty: involving their sessions)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.role not in ('admin', 'faculty'):
+            return Response({'error': 'Only admin and faculty can view conflicts'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            day = datetime.strptime(request.query_params['date'], '%Y-%m-%d').date() \
+                if request.query_params.get('date') else None
+        except ValueError:
+            return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        term_start, term_end = term_bounds(day)
+        clashes = conflicts.term_conflicts(day)
+        if user.role == 'faculty':
+            own = set(Session.objects.filter(
+                teacher__user=user, date__gte=term_start, date__lt=term_end).values_list('id', flat=True))
+            clashes = [c for c in clashes if own.intersection(c['sessions'])]
+        return Response({
+            'term_start': term_start,
+            'term_end': term_end,
+            'count': len(clashes),
+            'conflicts': clashes,
+        }, status=status.HTTP_200_OK)
+
 class SessionDeleteView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
@@ -279,7 +543,7 @@ class SessionDeleteView(generics.DestroyAPIView):
         except Session.DoesNotExist:
             return Response({'error': 'Session not found'}, status=status.HTTP_404_NOT_FOUND)
 
-class AttendanceReportView(generics.ListAPIView):
+class AttendanceReportView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
 
@@ -287,12 +551,12 @@ class AttendanceReportView(generics.ListAPIView):
         user = self.request.user
         if user.role == 'faculty':
             faculty = Faculty.objects.get(user=user)
-            return Attendance.objects.filter(session__teacher=faculty)
+            return in_requested_term(Attendance.objects.filter(teacher=faculty), self.request)
         elif user.role == 'admin':
-            return Attendance.objects.all()
+            return in_requested_term(Attendance.objects.all(), self.request)
         return Attendance.objects.none()
 
-class UserProfileView(generics.RetrieveAPIView):
+class UserProfileView(ReplicaReadMixin, generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
@@ -335,22 +599,33 @@ class UserProfileView(generics.RetrieveAPIView):
         
         return Response(profile_data, status=status.HTTP_200_OK)
 
-class MyAttendanceView(generics.ListAPIView):
+class MyAttendanceView(ReplicaReadMixin, generics.ListAPIView):
     """View for students to see their own attendance records"""
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
-        if user.role == 'student':
-            try:
-                student = Student.objects.get(user=user)
-                return Attendance.objects.filter(student=student).order_by('-session__date', '-session__start_time')
-            except Student.DoesNotExist:
-                return Attendance.objects.none()
-        return Attendance.objects.none()
-
-class AttendanceStatsView(APIView):
+    def list(self, request, *args, **kwargs):
+        user = request.user
+        if user.role != 'student':
+            return Response([])
+        try:
+            student = Student.objects.get(user=user)
+        except Student.DoesNotExist:
+            return Response([])
+
+        # The current term unless ?term= asks for another one (or all)
+        term = requested_term(request)
+        in_term = {} if term is None else {'session_date__gte': term[0], 'session_date__lt': term[1]}
+        live = Attendance.objects.filter(student=student, **in_term).order_by('-session_date', '-session__start_time')
+        records = read_serializers.attendance_rows(live)
+        # Closed sessions from finished terms live in the bitmap archive
+        archived = archive.archived_attendance_for(student, **in_term)
+        if archived:
+            records += AttendanceSerializer(archived, many=True).data
+            records.sort(key=lambda a: (a['session']['date'], a['session']['start_time']), reverse=True)
+        return Response(records)
+
+class AttendanceStatsView(ReplicaReadMixin, APIView):
     """View to get attendance statistics for a student"""
     permission_classes = [IsAuthenticated]
 
@@ -361,8 +636,12 @@ class AttendanceStatsView(APIView):
         
         try:
             student = Student.objects.get(user=user)
-            # Get all attendance records for this student
-            attended = Attendance.objects.filter(student=student).count()
+            # Stats cover the current term only, which keeps this on one partition
+            term_start, term_end = term_bounds()
+            attended = Attendance.objects.filter(student=student).in_term().count()
+            attended += len(archive.attended_sessions(
+                student, session_date__gte=term_start, session_date__lt=term_end
+            ))
             
             # Get total sessions for student's class group
             try:
@@ -371,7 +650,9 @@ class AttendanceStatsView(APIView):
                     department=student.department,
                     section=student.section
                 )
-                total_classes = Session.objects.filter(class_group=class_group).count()
+                total_classes = Session.objects.filter(
+                    class_group=class_group, date__gte=term_start, date__lt=term_end
+                ).count()
             except ClassGroup.DoesNotExist:
                 total_classes = attended  # If no class group, use attended as total
             
@@ -391,7 +672,80 @@ class AttendanceStatsView(APIView):
                 'percentage': 0
             }, status=status.HTTP_200_OK)
 
-class UpcomingSessionsView(generics.ListAPIView):
+class DefaultersView(ReplicaReadMixin, APIView):
+    """Students below the attendance threshold per subject, from the refreshed summary table"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        user = request.user
+        if user.role not in ('admin', 'faculty'):
+            return Response({'error': 'Only admin and faculty can view defaulters'}, status=status.HTTP_403_FORBIDDEN)
+
+        params = request.query_params
+        try:
+            threshold = float(params.get('threshold', reports.default_threshold()))
+            filters = {
+                field: int(params[param]) for param, field in
+                (('year', 'year'), ('subject_id', 'subject_id'), ('class_group_id', 'class_group_id'))
+                if params.get(param)
+            }
+        except ValueError:
+            return Response({'error': 'threshold, year, subject_id and class_group_id must be numbers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if params.get('department'):
+            filters['department'] = params['department']
+
+        # Faculty only see the subjects they teach
+        subject_ids = None
+        if user.role == 'faculty':
+            subject_ids = reference_cache.faculty_subject_ids(reference_cache.faculty_id_for_user(user.id))
+
+        rows = list(reports.defaulters(threshold, subject_ids, **filters))
+        return Response({
+            'threshold': threshold,
+            'refreshed_at': reports.last_refreshed(),
+            'count': len(rows),
+            'results': rows,
+        }, status=status.HTTP_200_OK)
+
+class AttendanceTrendsView(ReplicaReadMixin, APIView):
+    """Daily or weekly attendance totals from the rollup table"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admin can view attendance trends'}, status=status.HTTP_403_FORBIDDEN)
+
+        params = request.query_params
+        period = params.get('period', 'week')
+        group_by = params.get('group_by') or None
+        if period not in rollups.PERIODS:
+            return Response({'error': 'period must be day or week'}, status=status.HTTP_400_BAD_REQUEST)
+        if group_by is not None and group_by not in rollups.GROUP_BY_FIELDS:
+            return Response({'error': 'group_by must be subject, class_group or department'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Default to the current term so far
+            start = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else term_bounds()[0]
+            end = (datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end')
+                   else timezone.localdate() + timedelta(days=1))
+            filters = {
+                field: int(params[field]) for field in ('subject_id', 'class_group_id') if params.get(field)
+            }
+        except ValueError:
+            return Response({'error': 'Invalid date or id'}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('department'):
+            filters['department'] = params['department']
+
+        return Response({
+            'period': period,
+            'start': start,
+            'end': end,
+            'group_by': group_by,
+            'results': list(rollups.series(period, start, end, group_by, **filters)),
+        }, status=status.HTTP_200_OK)
+
+class UpcomingSessionsView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -415,7 +769,7 @@ class UpcomingSessionsView(generics.ListAPIView):
             ).order_by('date', 'start_time')
         return Session.objects.none()
 
-class TimetableView(generics.ListAPIView):
+class TimetableView(ReplicaReadMixin, generics.ListAPIView):
     serializer_class = SessionSerializer
     permission_classes = [IsAuthenticated]
 
@@ -435,19 +789,19 @@ class TimetableView(generics.ListAPIView):
             return Session.objects.filter(teacher__user=user).order_by('date', 'start_time')
         return Session.objects.none()
 
-class SubjectListView(generics.ListAPIView):
+class SubjectListView(ReplicaReadMixin, generics.ListAPIView):
     """List all subjects, optionally filtered by year"""
     serializer_class = SubjectSerializer
     permission_classes = []  # Allow unauthenticated access for registration
     
-    def get_queryset(self):
-        queryset = Subject.objects.all().order_by('year', 'code')
-        year = self.request.query_params.get('year', None)
+    def list(self, request, *args, **kwargs):
+        subjects = reference_cache.all_subject_rows()
+        year = request.query_params.get('year', None)
         if year is not None:
-            queryset = queryset.filter(year=year)
-        return queryset
+            subjects = [s for s in subjects if str(s['year']) == year.strip()]
+        return Response(subjects)
 
-class FacultySubjectsView(generics.ListAPIView):
+class FacultySubjectsView(ReplicaReadMixin, generics.ListAPIView):
     """Get subjects assigned to the logged-in faculty"""
     serializer_class = SubjectSerializer
     permission_classes = [IsAuthenticated]
@@ -456,13 +810,12 @@ class FacultySubjectsView(generics.ListAPIView):
         if self.request.user.role != 'faculty':
             return Subject.objects.none()
         
-        try:
-            faculty = Faculty.objects.get(user=self.request.user)
-            return faculty.subjects.all().order_by('year', 'code')
-        except Faculty.DoesNotExist:
+        faculty_id = reference_cache.faculty_id_for_user(self.request.user.id)
+        if faculty_id is None:
             return Subject.objects.none()
+        return reference_cache.get_subjects(reference_cache.faculty_subject_ids(faculty_id))
 
-class FacultyClassGroupsView(generics.ListAPIView):
+class FacultyClassGroupsView(ReplicaReadMixin, generics.ListAPIView):
     """Get class groups where faculty teaches at least one subject"""
     serializer_class = ClassGroupSerializer
     permission_classes = [IsAuthenticated]
@@ -471,20 +824,127 @@ class FacultyClassGroupsView(generics.ListAPIView):
         if self.request.user.role != 'faculty':
             return ClassGroup.objects.none()
         
-        try:
-            faculty = Faculty.objects.get(user=self.request.user)
-            faculty_subjects = faculty.subjects.all()
-            
-            # Get class groups that have at least one subject the faculty teaches
-            class_groups = ClassGroup.objects.filter(
-                subjects__in=faculty_subjects
-            ).distinct()
-            
-            # Filter by subject if provided
-            subject_id = self.request.query_params.get('subject_id', None)
-            if subject_id:
-                class_groups = class_groups.filter(subjects__id=subject_id)
-            
-            return class_groups.order_by('year', 'department', 'section')
-        except Faculty.DoesNotExist:
+        faculty_id = reference_cache.faculty_id_for_user(self.request.user.id)
+        if faculty_id is None:
             return ClassGroup.objects.none()
+
+        # Get class groups that have at least one subject the faculty teaches
+        class_group_ids = reference_cache.subject_class_group_ids(reference_cache.faculty_subject_ids(faculty_id))
+
+        # Filter by subject if provided
+        subject_id = self.request.query_params.get('subject_id', None)
+        if subject_id:
+            if not subject_id.isdigit():
+                return ClassGroup.objects.none()
+            class_group_ids &= reference_cache.subject_class_group_ids([int(subject_id)])
+
+        class_groups = reference_cache.get_class_groups(class_group_ids)
+        return sorted(class_groups, key=lambda g: (g.year, g.department, g.section))
+
+class FacultyDashboardView(ReplicaReadMixin, APIView):
+    """Faculty sessions with present/roster counts plus per-subject and per-class-group totals.
+
+    One annotated query for the sessions; subjects and class groups come
+    from the reference cache, so the query count does not grow with the
+    number of sessions.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'faculty':
+            return Response({'error': 'Only faculty can view the dashboard'}, status=status.HTTP_403_FORBIDDEN)
+        faculty_id = reference_cache.faculty_id_for_user(request.user.id)
+        if faculty_id is None:
+            return Response({'error': 'Faculty profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Current term by default
+        try:
+            start, end = term_bounds()
+            if request.query_params.get('start'):
+                start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date()
+            if request.query_params.get('end'):
+                end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date()
+        except ValueError:
+            return Response({'error': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        roster = Student.subjects.through.objects.filter(
+            student__class_group_id=OuterRef('class_group_id'), subject_id=OuterRef('subject_id'),
+        ).order_by().values('subject_id').annotate(n=Count('id')).values('n')
+        sessions = (Session.objects
+                    .filter(teacher_id=faculty_id, date__gte=start, date__lt=end)
+                    .order_by('-date', '-start_time')
+                    .annotate(
+                        live_present=Count('attendance'),
+                        archived_present=Coalesce('archived_attendance__present_count', 0),
+                        roster=Coalesce(Subquery(roster, output_field=IntegerField()), 0),
+                    )
+                    .values_list('id', 'subject_id', 'class_group_id', 'date', 'start_time', 'end_time',
+                                 'active', 'live_present', 'archived_present', 'roster'))
+
+        session_rows = []
+        totals = {'subject': {}, 'class_group': {}}
+        for (session_id, subject_id, class_group_id, day, start_time, end_time,
+             active, live_present, archived_present, roster_size) in sessions:
+            present = live_present + archived_present
+            session_rows.append({
+                'id': session_id,
+                'subject_id': subject_id,
+                'class_group_id': class_group_id,
+                'date': day,
+                'start_time': start_time,
+                'end_time': end_time,
+                'active': active,
+                'present': present,
+                'roster': roster_size,
+            })
+            for kind, key in (('subject', subject_id), ('class_group', class_group_id)):
+                counts = totals[kind].setdefault(key, [0, 0, 0])
+                counts[0] += 1
+                counts[1] += present
+                counts[2] += roster_size
+
+        def summary(kind, key):
+            held, present, roster_total = totals[kind].get(key, (0, 0, 0))
+            return {
+                'sessions': held,
+                'present': present,
+                'roster': roster_total,
+                'percentage': round(present * 100 / roster_total, 2) if roster_total else None,
+            }
+
+        subject_ids = reference_cache.faculty_subject_ids(faculty_id)
+        class_group_ids = reference_cache.subject_class_group_ids(subject_ids) | set(totals['class_group'])
+        class_groups = sorted(reference_cache.get_class_groups(class_group_ids),
+                              key=lambda g: (g.year, g.department, g.section))
+        return Response({
+            'start': start,
+            'end': end,
+            'sessions': session_rows,
+            'subjects': [
+                {'id': s.id, 'code': s.code, 'name': s.name, **summary('subject', s.id)}
+                for s in reference_cache.get_subjects(subject_ids | set(totals['subject']))
+            ],
+            'class_groups': [
+                {'id': g.id, 'name': g.name, **summary('class_group', g.id)} for g in class_groups
+            ],
+        }, status=status.HTTP_200_OK)
+
+class MetricsView(APIView):
+    """Prometheus scrape endpoint, open to METRICS_ALLOWED_IPS only"""
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        if not metrics.allowed(request):
+            return Response({'error': 'Metrics are not available from this address'}, status=status.HTTP_403_FORBIDDEN)
+        body, content_type = metrics.exposition()
+        return HttpResponse(body, content_type=content_type)
+
+class CacheStatsView(APIView):
+    """Reference cache hit/miss counters for this worker process"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != 'admin':
+            return Response({'error': 'Only admin can view cache stats'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(reference_cache.stats(), status=status.HTTP_200_OK)